@@ -0,0 +1,4 @@
+"""benchmarks on synthetic data, run from the project root, e.g.
+
+    PYTHONPATH=./src python -m benchmarks.bench_dao --edges 10000
+"""
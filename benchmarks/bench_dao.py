@@ -0,0 +1,237 @@
+"""benchmark hot paths of `Dao` on synthetic power-law follower graphs
+
+every graph size runs in a fresh process against a fresh SQLite file, so
+that the `Dao` singleton and peak RSS of one size do not leak into another
+"""
+import importlib.util
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+from typing import List
+from typing import Sequence
+
+import click
+
+from app import cfg
+from app.models.dao import ENGINES
+from app.models.dao import EXPORT_ENGINES
+from app.models.dao import Dao
+from app.models.export import FORMATS
+from app.models.tables import Tweeter
+
+from .common import Probe
+from .common import compare
+from .common import power_law_graph
+from .common import save_report
+from .common import synthetic_user
+
+# users or IDs per page, as returned by the twitter paged API
+PAGE = 200
+
+
+def _chunks(seq: list, size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _available_engines() -> List[str]:
+    missing = {
+        e
+        for e, module in (('sparse', 'scipy'), ('duckdb', 'duckdb'))
+        if importlib.util.find_spec(module) is None
+    }
+    return [e for e in ENGINES if e not in missing]
+
+
+def _available_formats() -> List[str]:
+    if importlib.util.find_spec('pyarrow') is None:
+        return [f for f in FORMATS if f != 'parquet']
+    return list(FORMATS)
+
+
+def run(n_edges: int,
+        degree: float,
+        wumao_density: float,
+        engines: Sequence[str],
+        seed: int,
+        profile: str,
+        workers: Sequence[int] = ()) -> dict:
+    """benchmark one graph size
+
+    :param n_edges: number of edges of the synthetic graph
+    :param degree: average number of friends per user
+    :param wumao_density: fraction of users that are wumaos
+    :param engines: scoring engines to benchmark
+    :param seed: random seed
+    :param profile: SQLite storage profile
+    :param workers: pool sizes of the 'parallel' engine, each measured as
+    engine 'parallel:N', default the number of CPUs, measured as 'parallel'
+    :return: dict of graph size, storage profile and per-step results
+    """
+    graph = power_law_graph(n_edges, degree, wumao_density, seed=seed)
+    users = [synthetic_user(i) for i in graph.user_ids]
+    with tempfile.TemporaryDirectory() as tmp:
+        dao = Dao(os.path.join(tmp, 'app.db'), profile=profile)
+        probe = Probe(dao.session.get_bind())
+
+        with probe.measure('bulk_save_tweeter'):
+            for page in _chunks(users, PAGE):
+                dao.bulk_save_tweeter(page, return_all=True)
+        pk = dict(dao.session.query(Tweeter.user_id, Tweeter.id).all())
+        with probe.measure('bulk_save_wumao'):
+            dao.bulk_save_wumao([pk[i] for i in graph.wumao_user_ids],
+                                new=True)
+
+        # half of the edges found as friends of their followers, the other
+        # half as followers of their authors
+        half = len(graph.edges) // 2
+        following: Dict[int, List[int]] = defaultdict(list)
+        for follower, author in graph.edges[:half]:
+            following[pk[follower]].append(pk[author])
+        followers: Dict[int, List[int]] = defaultdict(list)
+        for follower, author in graph.edges[half:]:
+            followers[pk[author]].append(pk[follower])
+        with probe.measure('bulk_follow'):
+            for tweeter_id, authors in following.items():
+                for page in _chunks(authors, PAGE):
+                    dao.bulk_follow(tweeter_id, page)
+        with probe.measure('bulk_attract'):
+            for tweeter_id, seq in followers.items():
+                for page in _chunks(seq, PAGE):
+                    dao.bulk_attract(tweeter_id, page)
+
+        for engine in engines:
+            sizes = workers if engine == 'parallel' and workers else (None, )
+            for n in sizes:
+                name = engine
+                if n is not None:
+                    # restart the pool, scoring then keeps it
+                    dao.parallel_scorer(n)
+                    name = f'{engine}:{n}'
+                with probe.measure(f'score[{name}]'):
+                    dao.score(engine)
+                with probe.measure(f'center_score[{name}]'):
+                    dao.center_score(engine)
+                with probe.measure(f'refresh_wumao_score[{name}]'):
+                    dao.refresh_wumao_score(engine)
+
+        for engine in EXPORT_ENGINES:
+            if engine in engines or engine == 'sql':
+                with probe.measure(f'wumao_to_csv[{engine}]'):
+                    dao.wumao_to_csv(os.path.join(tmp, 'wumao.csv'),
+                                     weight=0,
+                                     engine=engine)
+        for fmt in _available_formats():
+            with probe.measure(f'export_wumao[{fmt}]'):
+                dao.export_wumao(os.path.join(tmp, f'wumao.{fmt}'),
+                                 fmt,
+                                 weight=0)
+        if 'parallel' in engines:
+            # a pool left running blocks the exit of this worker process
+            dao.parallel_scorer().close()
+        dao.session.close()
+
+    for res in probe.results.values():
+        res['seconds'] = round(res['seconds'], 6)
+    return {
+        'edges': n_edges,
+        'profile': profile,
+        'users': len(graph.user_ids),
+        'wumaos': len(graph.wumao_user_ids),
+        'results': probe.results,
+    }
+
+
+@click.command()
+@click.option('--edges',
+              type=click.IntRange(min=1),
+              multiple=True,
+              default=(10000, 100000),
+              show_default=True,
+              help='number of edges of a synthetic graph, repeat to run '
+              'several sizes, e.g. up to 10000000')
+@click.option('--degree',
+              type=click.FloatRange(min=1),
+              default=10,
+              show_default=True,
+              help='average number of friends per user')
+@click.option('--wumao-density',
+              type=click.FloatRange(0, 1),
+              default=0.01,
+              show_default=True,
+              help='fraction of users that are wumaos')
+@click.option('--engine',
+              type=click.Choice(ENGINES),
+              multiple=True,
+              help='scoring engine, repeatable, default every engine whose '
+              'dependencies are installed')
+@click.option('--profile',
+              type=click.Choice(list(cfg.STORAGE_PROFILES)),
+              multiple=True,
+              help='SQLite storage profile, repeat to compare ingest '
+              'throughput, default the configured one')
+@click.option('--workers',
+              type=click.IntRange(min=1),
+              multiple=True,
+              help='processes of the "parallel" engine, repeat to compare '
+              'pool sizes, default the number of CPUs')
+@click.option('--seed', type=click.INT, default=0, show_default=True)
+@click.option('--output',
+              type=click.Path(dir_okay=False),
+              default='bench_dao.json',
+              show_default=True,
+              help='JSON result path')
+@click.option('--baseline',
+              type=click.Path(exists=True, dir_okay=False),
+              help='JSON result of a previous run to compare against')
+@click.option('--tolerance',
+              type=click.FloatRange(min=0),
+              default=0.2,
+              show_default=True,
+              help='relative slowdown to the baseline reported as regression')
+def main(edges, degree, wumao_density, engine, profile, workers, seed, output,
+         baseline, tolerance):
+    """benchmark Dao on synthetic power-law follower graphs"""
+    engines = list(engine) or _available_engines()
+    profiles = list(profile) or [cfg.STORAGE_PROFILE]
+    runs = []
+    for n_edges, storage in itertools.product(edges, profiles):
+        with ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context('spawn')) as pool:
+            res = pool.submit(run, n_edges, degree, wumao_density, engines,
+                              seed, storage, workers).result()
+        runs.append(res)
+        click.echo(f"edges={res['edges']} profile={res['profile']} "
+                   f"users={res['users']} wumaos={res['wumaos']}")
+        for name, r in res['results'].items():
+            click.echo(f"  {name:32} {r['seconds']:10.3f}s "
+                       f"{r['queries']:8d} queries "
+                       f"{r['max_rss_kb'] / 1024:8.1f} MiB max RSS so far")
+    params = {
+        'degree': degree,
+        'wumao_density': wumao_density,
+        'engines': engines,
+        'workers': list(workers),
+        'seed': seed,
+    }
+    report = save_report(output, params, runs)
+    click.echo(f'results saved to {output}')
+    if baseline is None:
+        return
+    with open(baseline, encoding='utf8') as f:
+        regressions = compare(report, json.load(f), tolerance)
+    for key, name, ratio in regressions:
+        click.echo(f'REGRESSION {key} {name}: {ratio:.2f}x baseline')
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
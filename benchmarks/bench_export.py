@@ -0,0 +1,129 @@
+"""benchmark peak memory of `Dao.wumao_to_csv` as table 'wumao' grows
+
+the table is populated in one process and every export runs in a fresh one,
+so that peak RSS measures the export alone; 'stream' exports `--batch-size`
+rows at a time, 'materialize' holds the whole result at once as a baseline
+"""
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import click
+
+from app import cfg
+from app.models.dao import Dao
+from app.models.records import TweeterRecord
+
+from .common import Probe
+from .common import save_report
+
+# rows per upsert while populating
+CHUNK = 10000
+
+
+def populate(db_path: str, n_wumaos: int, profile: str):
+    """save `n_wumaos` tweeters, all of them wumaos"""
+    dao = Dao(db_path, profile=profile)
+    for start in range(0, n_wumaos, CHUNK):
+        records = [
+            TweeterRecord(user_id=10**10 + i,
+                          screen_name=f'user_{i}',
+                          name=f'name {i}',
+                          description=f'description of user {i}, ' * 4,
+                          created_at='2020-03-29',
+                          follower_count=i,
+                          friend_count=i)
+            for i in range(start, min(start + CHUNK, n_wumaos))
+        ]
+        tweeter_ids = dao.bulk_save_tweeter_records(records, return_all=True)
+        dao.bulk_save_wumao(list(tweeter_ids))
+    dao.session.close()
+
+
+def export(db_path: str, csv_path: str, batch: int, compression: str,
+           profile: str) -> dict:
+    """export all wumaos of an existing database
+
+    :return: dict of rows, seconds, statements and peak RSS in KiB
+    """
+    dao = Dao(db_path, profile=profile)
+    probe = Probe(dao.session.get_bind())
+    with probe.measure('export'):
+        rows = dao.wumao_to_csv(csv_path,
+                                weight=0,
+                                compression=compression,
+                                batch=batch)
+    dao.session.close()
+    return dict(probe.results['export'], rows=rows)
+
+
+def _spawn(fn, *args):
+    with ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
+
+
+@click.command()
+@click.option('--wumaos',
+              type=click.IntRange(min=1),
+              multiple=True,
+              default=(10000, 100000, 1000000),
+              show_default=True,
+              help='number of rows of table wumao, repeat to run several '
+              'sizes')
+@click.option('--batch-size',
+              type=click.IntRange(min=1),
+              default=10000,
+              show_default=True,
+              help='rows held in memory by the streamed export')
+@click.option('--compression',
+              type=click.Choice(['gzip', 'bz2', 'xz']),
+              help='compress the csv on the fly')
+@click.option('--profile',
+              type=click.Choice(list(cfg.STORAGE_PROFILES)),
+              default='safe',
+              show_default=True,
+              help='SQLite storage profile; memory-mapped I/O of "bulk" '
+              'counts the database file into RSS')
+@click.option('--output',
+              type=click.Path(dir_okay=False),
+              default='bench_export.json',
+              show_default=True,
+              help='JSON result path')
+def main(wumaos, batch_size, compression, profile, output):
+    """benchmark peak RSS of the wumao csv export"""
+    runs: List[dict] = []
+    for n_wumaos in wumaos:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'app.db')
+            csv_path = os.path.join(tmp, 'wumao.csv')
+            _spawn(populate, db_path, n_wumaos, profile)
+            results = {
+                mode:
+                _spawn(export, db_path, csv_path, batch, compression, profile)
+                for mode, batch in (('stream', batch_size), ('materialize',
+                                                             n_wumaos))
+            }
+            file_bytes = os.path.getsize(csv_path)
+        runs.append({
+            'wumaos': n_wumaos,
+            'file_bytes': file_bytes,
+            'results': results
+        })
+        click.echo(f'wumaos={n_wumaos}')
+        for mode, r in results.items():
+            click.echo(f"  {mode:12} {r['seconds']:10.3f}s "
+                       f"{r['max_rss_kb'] / 1024:8.1f} MiB peak RSS")
+    save_report(output, {
+        'batch_size': batch_size,
+        'compression': compression,
+        'profile': profile
+    }, runs)
+    click.echo(f'results saved to {output}')
+
+
+if __name__ == '__main__':
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,194 @@
+"""synthetic graph generator and measurement helpers shared by benchmarks"""
+import itertools
+import json
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Set
+from typing import Tuple
+
+import sqlalchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from twitter.models import User
+
+__all__ = [
+    'SocialGraph', 'Probe', 'compare', 'environment', 'peak_rss_kb',
+    'power_law_graph', 'save_report', 'synthetic_user'
+]
+
+
+class SocialGraph(NamedTuple):
+    """synthetic follower graph of twitter user IDs"""
+    user_ids: List[int]
+    # (follower user_id, author user_id) pairs
+    edges: List[Tuple[int, int]]
+    wumao_user_ids: List[int]
+
+
+def synthetic_user(user_id: int) -> User:
+    """a twitter user passing `Saver._is_potential_wumao`"""
+    return User(id=user_id,
+                screen_name=f'user_{user_id}',
+                name=f'name {user_id}',
+                description='',
+                created_at='Tue Mar 29 08:11:25 +0000 2020',
+                followers_count=10,
+                friends_count=10,
+                protected=False)
+
+
+def power_law_graph(n_edges: int,
+                    degree: float = 10,
+                    wumao_density: float = 0.01,
+                    alpha: float = 1.0,
+                    seed: int = 0) -> SocialGraph:
+    """generate a directed graph whose in- and out-degrees follow a Zipf-like
+    power law, as celebrity accounts attract most followers on twitter, with
+    a randomly picked cluster of wumaos following each other
+
+    :param n_edges: number of distinct edges
+    :param degree: average number of friends per user
+    :param wumao_density: fraction of users that are wumaos
+    :param alpha: power law exponent, rank r is drawn with weight r ** -alpha
+    :param seed: random seed
+    :return: a `SocialGraph`
+    """
+    rand = random.Random(seed)
+    n_users = max(int(n_edges / degree), 2)
+    if n_edges > n_users * (n_users - 1):
+        raise ValueError('too many edges for the number of users')
+    user_ids = rand.sample(range(10**6, 10**6 + 100 * n_users), n_users)
+    wumao_user_ids = rand.sample(user_ids, max(int(n_users * wumao_density),
+                                               2))
+    # wumaos form a cluster, each follows up to `degree` other wumaos
+    edges: Set[Tuple[int, int]] = set()
+    for follower in wumao_user_ids:
+        authors = rand.sample(wumao_user_ids,
+                              min(int(degree) + 1, len(wumao_user_ids)))
+        edges.update((follower, a) for a in authors if a != follower)
+    cum_weights = list(
+        itertools.accumulate((r + 1)**-alpha for r in range(n_users)))
+    # hubs of followers and of authors are different accounts
+    followers = user_ids[:]
+    rand.shuffle(followers)
+    while len(edges) < n_edges:
+        k = n_edges - len(edges)
+        edges.update((f, a) for f, a in zip(
+            rand.choices(followers, cum_weights=cum_weights, k=k),
+            rand.choices(user_ids, cum_weights=cum_weights, k=k)) if f != a)
+    return SocialGraph(user_ids, list(edges), wumao_user_ids)
+
+
+def peak_rss_kb() -> int:
+    """peak resident set size of the current process in KiB"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB on Linux
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+class Probe:
+    """wall time, number of SQL statements and RSS high-water mark of
+    measured steps
+
+    `max_rss_kb` is the peak of the whole process up to the end of the step,
+    not of the step alone; run a step in a fresh process to get its own peak
+    """
+
+    def __init__(self, engine: Engine):
+        self.statements = 0
+        self.results: Dict[str, dict] = {}
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *_):
+        self.statements += 1
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        """record a step
+
+        :param name: step name, a repeated name accumulates time and
+        statements
+        """
+        statements = self.statements
+        start = time.perf_counter()
+        yield
+        res = self.results.setdefault(name, {'seconds': 0.0, 'queries': 0})
+        res['seconds'] += time.perf_counter() - start
+        res['queries'] += self.statements - statements
+        res['max_rss_kb'] = peak_rss_kb()
+
+
+def environment() -> dict:
+    """versions and revision the results are produced with"""
+    try:
+        revision = subprocess.run(['git', 'describe', '--always', '--dirty'],
+                                  capture_output=True,
+                                  check=True,
+                                  text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'revision': revision,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'sqlalchemy': sqlalchemy.__version__,
+        'platform': platform.platform(),
+    }
+
+
+def save_report(path: str, params: dict, runs: List[dict]) -> dict:
+    """write benchmark results as JSON
+
+    :param path: output file path
+    :param params: benchmark parameters
+    :param runs: list of per-size results
+    :return: the report
+    """
+    report = {'environment': environment(), 'params': params, 'runs': runs}
+    with open(path, 'w', encoding='utf8') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def compare(report: dict,
+            baseline: dict,
+            tolerance: float,
+            min_seconds: float = 0.05) -> List[Tuple[str, str, float]]:
+    """find steps slower than the baseline, matching runs by graph size and
+    storage profile
+
+    :param report: current results
+    :param baseline: results of a previous release
+    :param tolerance: allowed relative slowdown, e.g. 0.2 for 20%
+    :param min_seconds: steps faster than this in the baseline are too noisy
+    to compare
+    :return: list of 1. run key; 2. step name; 3. time ratio to baseline
+    """
+    baseline_runs = {
+        (r['edges'], r.get('profile')): r['results']
+        for r in baseline['runs']
+    }
+    regressions = []
+    for run in report['runs']:
+        base = baseline_runs.get((run['edges'], run.get('profile')), {})
+        for name, res in run['results'].items():
+            if name not in base or base[name]['seconds'] < min_seconds:
+                continue
+            ratio = res['seconds'] / base[name]['seconds']
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    (f"edges={run['edges']} profile={run.get('profile')}",
+                     name, ratio))
+    return regressions
@@ -15,6 +15,16 @@ EXTRAS_REQUIRE = {
     'ipy': [
         'jupyter>=1.0.0',
     ],
+    'graph': [
+        'numpy>=1.22.0',
+        'scipy>=1.8.0',
+    ],
+    'duckdb': [
+        'duckdb>=0.9.0',
+    ],
+    'parquet': [
+        'pyarrow>=8.0.0',
+    ],
 }
 ENTRY_POINTS = {
     'console_scripts': [
@@ -5,6 +5,7 @@ from .serv import add_seed
 from .serv import calculate
 from .serv import export
 from .serv import reset
+from .serv import stats
 from .serv import update_params
 
 
@@ -17,4 +18,5 @@ cli.add_command(add_seed)
 cli.add_command(calculate)
 cli.add_command(export)
 cli.add_command(reset)
+cli.add_command(stats)
 cli.add_command(update_params)
@@ -15,6 +15,32 @@ class Config:
     LOG_LEVEL = "WARNING"
     LOG_LINE_FORMAT = "%(asctime)s %(levelname)-5s %(threadName)s: %(message)s"
     LOG_DATETIME_FORMAT = "%Y/%m/%d %H:%M:%S"
+    # SQLite pragmas applied to every connection, by storage profile name
+    STORAGE_PROFILES = {
+        # every commit is synced to disk
+        "safe": {
+            "journal_mode": "WAL",
+            "synchronous": "FULL",
+            "cache_size": -16 * 1024,  # KiB
+            "mmap_size": 0,
+            "temp_store": "DEFAULT",
+            "busy_timeout": 5000,  # ms
+        },
+        # commits are not synced until checkpoints: a power loss may lose the
+        # last pages saved, but never corrupts the database
+        "bulk": {
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "cache_size": -256 * 1024,
+            "mmap_size": 1024**3,
+            "temp_store": "MEMORY",
+            "busy_timeout": 5000,
+        },
+    }
+    # profile of normal use
+    STORAGE_PROFILE = "safe"
+    # profile while crawling friends & followers
+    CRAWL_STORAGE_PROFILE = "bulk"
 
     @classmethod
     def configure_logger(cls, root_module_name):
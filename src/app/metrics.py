@@ -0,0 +1,394 @@
+"""in-process counters and histograms of the crawler and DAO hot paths
+
+snapshots are written in the Prometheus text exposition format, e.g. for the
+textfile collector of node_exporter, by `TextfileExporter`, and read back by
+the `stats` command
+"""
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+__all__ = [
+    'API_CALLS', 'API_CALL_SECONDS', 'API_RATE_LIMITED', 'COMMIT_SECONDS',
+    'Counter', 'EDGES_INSERTED', 'Gauge', 'Histogram', 'PAGES_FETCHED',
+    'REGISTRY', 'Registry', 'SCORE_SECONDS', 'SLEEP_SECONDS',
+    'SNAPSHOT_TIMESTAMP', 'Sample', 'TWEETERS_INSERTED', 'TextfileExporter',
+    'USERS_FILTERED', 'parse_text', 'summarize'
+]
+
+# seconds, from a commit of a few rows to a scoring pass of a large graph
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300)
+
+SNAPSHOT_TIMESTAMP = 'tweeter_analyzer_snapshot_timestamp_seconds'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r'\\(.)', lambda m: '\n'
+                  if m.group(1) == 'n' else m.group(1), value)
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """metric family with a fixed set of label names"""
+    __slots__ = ['name', 'help', 'label_names', '_values', '_lock']
+
+    TYPE = ''
+
+    def __init__(self, name: str, help_: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help_
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f'labels of {self.name} are {self.label_names}, '
+                             f'not {tuple(labels)}')
+        return tuple(str(labels[k]) for k in self.label_names)
+
+    def _samples(self) -> Iterator[Tuple[str, List[Tuple[str, str]], float]]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        """HELP / TYPE lines and samples of the family"""
+        lines = [
+            f'# HELP {self.name} {self.help}', f'# TYPE {self.name} '
+            f'{self.TYPE}'
+        ]
+        with self._lock:
+            lines.extend(f'{name}{_format_labels(labels)} '
+                         f'{_format_value(value)}'
+                         for name, labels, value in self._samples())
+        return '\n'.join(lines) + '\n'
+
+
+class Counter(_Metric):
+    """monotonically increasing value per label set"""
+    __slots__ = []
+
+    TYPE = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        """add a non-negative amount"""
+        if amount < 0:
+            raise ValueError('counters only increase')
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        """current value, 0 if never increased"""
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def _samples(self):
+        # a family without labels is exposed as 0 before any update, so that
+        # an idle crawler reports no throughput rather than no series
+        values = self._values or ({} if self.label_names else {(): 0})
+        for key, value in sorted(values.items()):
+            yield self.name, list(zip(self.label_names, key)), value
+
+
+class Gauge(Counter):
+    """value per label set that may go up and down"""
+    __slots__ = []
+
+    TYPE = 'gauge'
+
+    def set(self, value: float, **labels):
+        """replace the value"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Histogram(_Metric):
+    """observations per label set counted into cumulative buckets, along
+    with their sum and count
+    """
+    __slots__ = ['buckets']
+
+    TYPE = 'histogram'
+
+    def __init__(self,
+                 name: str,
+                 help_: str,
+                 label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf, )
+
+    def observe(self, value: float, **labels):
+        """count one observation"""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # per-bucket counts, sum, count
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """observe the seconds the block takes, even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        """number of observations, 0 if none"""
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            return 0 if state is None else state[2]
+
+    def _samples(self):
+        empty = [[0] * len(self.buckets), 0.0, 0]
+        values = self._values or ({} if self.label_names else {(): empty})
+        for key, (counts, total, count) in sorted(values.items()):
+            labels = list(zip(self.label_names, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                yield (f'{self.name}_bucket',
+                       labels + [('le', _format_value(bound))], cumulative)
+            yield f'{self.name}_sum', labels, total
+            yield f'{self.name}_count', labels, count
+
+
+class Registry:
+    """metric families by name, rendered together"""
+    __slots__ = ['_metrics', '_lock']
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls: type, name: str, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif metric.TYPE != cls.TYPE:
+                raise ValueError(f'{name} is already a {metric.TYPE}')
+            return metric
+
+    def counter(self, name: str, help_: str,
+                label_names: Sequence[str] = ()) -> Counter:
+        """the counter of a name, created on first use"""
+        return self._register(Counter, name, help_, label_names)
+
+    def gauge(self, name: str, help_: str,
+              label_names: Sequence[str] = ()) -> Gauge:
+        """the gauge of a name, created on first use"""
+        return self._register(Gauge, name, help_, label_names)
+
+    def histogram(self,
+                  name: str,
+                  help_: str,
+                  label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """the histogram of a name, created on first use"""
+        return self._register(Histogram, name, help_, label_names, buckets)
+
+    def render(self) -> str:
+        """all families in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        return ''.join(m.render() for m in metrics)
+
+
+REGISTRY = Registry()
+
+API_CALLS = REGISTRY.counter('tweeter_analyzer_api_calls_total',
+                             'twitter API requests sent', ['endpoint'])
+API_RATE_LIMITED = REGISTRY.counter(
+    'tweeter_analyzer_api_rate_limited_total',
+    'twitter API requests refused for exceeding the rate limit', ['endpoint'])
+API_CALL_SECONDS = REGISTRY.histogram('tweeter_analyzer_api_call_seconds',
+                                      'twitter API request latency',
+                                      ['endpoint'])
+PAGES_FETCHED = REGISTRY.counter(
+    'tweeter_analyzer_pages_fetched_total',
+    'friends & followers pages fetched, cached ones included', ['function'])
+USERS_FILTERED = REGISTRY.counter(
+    'tweeter_analyzer_users_filtered_total',
+    'users of fetched pages checked for potential wumaos', ['result'])
+TWEETERS_INSERTED = REGISTRY.counter(
+    'tweeter_analyzer_tweeters_inserted_total',
+    'rows inserted into table tweeter')
+EDGES_INSERTED = REGISTRY.counter('tweeter_analyzer_edges_inserted_total',
+                                  'rows inserted into table friendship')
+SLEEP_SECONDS = REGISTRY.counter(
+    'tweeter_analyzer_sleep_seconds_total',
+    'seconds slept on connection errors or exhausted rate limits', ['reason'])
+COMMIT_SECONDS = REGISTRY.histogram('tweeter_analyzer_commit_seconds',
+                                    'SQLite commit latency')
+SCORE_SECONDS = REGISTRY.histogram('tweeter_analyzer_score_seconds',
+                                   'scoring pass duration',
+                                   ['method', 'engine'])
+
+
+class Sample(NamedTuple):
+    """a sample line of the text exposition format"""
+    name: str
+    labels: Dict[str, str]
+    value: float
+
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_text(text: str) -> Tuple[Dict[str, str], List[Sample]]:
+    """parse the text exposition format
+
+    :param text: content of a snapshot
+    :return: tuple of dict of family name -> type, list of samples
+    """
+    types, samples = {}, []
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, type_ = line.split(maxsplit=3)
+            types[name] = type_
+            continue
+        match = _SAMPLE.match(line)
+        if line.startswith('#') or match is None:
+            continue
+        name, labels, value = match.groups()
+        samples.append(
+            Sample(name, {
+                k: _unescape(v)
+                for k, v in _LABEL.findall(labels or '')
+            }, float(value)))
+    return types, samples
+
+
+def summarize(text: str, now: Optional[float] = None) -> List[str]:
+    """human readable lines of a snapshot: age, counter and gauge values,
+    and count / sum / mean of histograms
+
+    :param text: content of a snapshot
+    :param now: current epoch seconds, default the current time
+    :return: list of lines
+    """
+    types, samples = parse_text(text)
+    now = time.time() if now is None else now
+    lines, histograms = [], {}
+    for s in samples:
+        if s.name == SNAPSHOT_TIMESTAMP:
+            lines.insert(0, f'snapshot taken {now - s.value:.0f}s ago')
+            continue
+        family, _, suffix = s.name.rpartition('_')
+        if types.get(family) != 'histogram':
+            lines.append(f'{s.name}{_format_labels(list(s.labels.items()))} '
+                         f'{_format_value(s.value)}')
+        elif suffix in ('sum', 'count'):
+            key = family + _format_labels(list(s.labels.items()))
+            histograms.setdefault(key, {})[suffix] = s.value
+    for key, h in histograms.items():
+        count, total = h.get('count', 0), h.get('sum', 0)
+        mean = total / count if count else 0
+        lines.append(f'{key} count={_format_value(count)} sum={total:.3f} '
+                     f'mean={mean:.6f}')
+    return lines
+
+
+class TextfileExporter:
+    """write snapshots of a registry to a file every `interval` seconds from
+    a daemon thread, and once more when stopped; files are replaced
+    atomically, so readers never see a partial snapshot
+    """
+    __slots__ = ['path', 'interval', 'registry', '_stop', '_thread']
+
+    def __init__(self,
+                 path: str,
+                 interval: float = 15,
+                 registry: Registry = REGISTRY):
+        """
+        :param path: snapshot file path, e.g. ending with '.prom'
+        :param interval: seconds between snapshots
+        :param registry: metrics to write
+        """
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def write(self):
+        """write a snapshot now"""
+        self.registry.gauge(SNAPSHOT_TIMESTAMP,
+                            'epoch seconds of the snapshot').set(time.time())
+        tmp = f'{self.path}.tmp'
+        with open(tmp, mode='w', encoding='utf8') as f:
+            f.write(self.registry.render())
+        os.replace(tmp, self.path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self):
+        """start writing snapshots"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='metrics-exporter',
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """stop the thread and write the last snapshot"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.write()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
@@ -1,59 +1,286 @@
 """data access object"""
-import csv
-import shutil
+from contextlib import contextmanager
+from datetime import date
 from datetime import datetime
 from functools import wraps
+from itertools import chain
+from typing import Dict
 from typing import Iterable
+from typing import Iterator
 from typing import List
+from typing import NamedTuple
 from typing import NoReturn
 from typing import Optional
+from typing import Sequence
 from typing import Set
+from typing import Tuple
 
 import twitter
+from sqlalchemy import BigInteger
+from sqlalchemy import Column
+from sqlalchemy import MetaData
+from sqlalchemy import Table
 from sqlalchemy import create_engine
+from sqlalchemy import event
 from sqlalchemy import func
 from sqlalchemy import literal
 from sqlalchemy import or_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Query
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import aliased
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
+from .. import cfg
+from .. import metrics
 from ..singleton import SingletonMeta
 from .base import Base
+from .export import Field
+from .export import batched
+from .export import edges_path
+from .export import write_table
+from .lru import LruCache
+from .parallel import ParallelScorer
+from .records import EdgeRecord
+from .records import FrontierRecord
+from .records import TweeterRecord
+from .records import WumaoRecord
 from .tables import Friendship
+from .tables import Sample
+from .tables import ScoreCard
 from .tables import Track
 from .tables import Tweeter
 from .tables import Wumao
 
 __all__ = ['Dao']
 
+ENGINES = ('sql', 'sparse', 'incremental', 'duckdb', 'parallel')
+EXPORT_ENGINES = ('sql', 'duckdb')
+
+# cache value of a missing key, as None is cached for absent tracks
+_MISSING = object()
+
+_MONTHS = {
+    m: i
+    for i, m in enumerate(('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul',
+                           'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), 1)
+}
+
+# connection-local table holding large ID collections to join against
+_temp_id = Table('temp_id',
+                 MetaData(),
+                 Column('value', BigInteger, primary_key=True),
+                 prefixes=['TEMPORARY'])
+
 
 def session_factory(sqlite_db: str, echo: bool) -> Session:
-    """session factory"""
-    engine = create_engine(f'sqlite:///{sqlite_db}', echo=echo)
+    """session factory; connections are pooled, so that pragmas and the page
+    cache of a connection outlive its transactions
+    """
+    engine = create_engine(f'sqlite:///{sqlite_db}',
+                           echo=echo,
+                           poolclass=QueuePool,
+                           connect_args={'check_same_thread': False})
     _SessionFactory = sessionmaker(bind=engine)
     Base.metadata.create_all(engine)
     return _SessionFactory()
 
 
+def _chunks(seq: list, size: int) -> Iterator[list]:
+    """split a list into fixed-size chunks"""
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
 def _commit(fn):
 
     @wraps(fn)
     def helper(*args, **kwargs):
-        res = fn(*args, **kwargs)
-        args[0].session.commit()
+        try:
+            res = fn(*args, **kwargs)
+            # committed at the end of `Dao.transaction` instead
+            if not args[0].in_transaction:
+                with metrics.COMMIT_SECONDS.time():
+                    args[0].session.commit()
+        except Exception:
+            # cached identities may refer to rows never committed
+            args[0].clear_cache()
+            raise
         return res
 
     return helper
 
 
+def _timed(fn):
+    """observe the duration of a scoring method per engine"""
+
+    @wraps(fn)
+    def helper(self, engine: str = 'sql', *args, **kwargs):
+        with metrics.SCORE_SECONDS.time(method=fn.__name__, engine=engine):
+            return fn(self, engine, *args, **kwargs)
+
+    return helper
+
+
 class Dao(metaclass=SingletonMeta):
     """DAO"""
 
-    __slots__ = ['session']
+    __slots__ = [
+        'session', '_tweeters', '_user_ids', '_tracks', '_profile', '_depth',
+        '_scorer', '_graph', '_duck'
+    ]
 
-    def __init__(self, sqlite_db: str, echo=False):
+    # stay below SQLite's default limit of 999 bound variables per statement
+    IN_CHUNK = 500
+    # join against a temp table instead of chunked IN lists beyond this size
+    TEMP_TABLE_SIZE = 10000
+    # rows per multi-row upsert statement, 7 columns * 100 < 999 variables
+    UPSERT_CHUNK = 100
+    # entries of the 'tweeter' identity caches and of the 'track' cache
+    IDENTITY_CACHE_SIZE = 100000
+    TRACK_CACHE_SIZE = 1000
+
+    def __init__(self,
+                 sqlite_db: str,
+                 echo=False,
+                 profile: Optional[str] = None):
+        """
+        :param profile: storage profile, one of `Config.STORAGE_PROFILES`,
+        default `Config.STORAGE_PROFILE`
+        """
         self.session: Session = session_factory(sqlite_db, echo)
+        self._profile = self._check_profile(profile or cfg.STORAGE_PROFILE)
+        # nesting level of `Dao.transaction`
+        self._depth = 0
+        event.listen(self.session.get_bind(), 'checkout', self._on_checkout)
+        # 'tweeter' primary key -> user_id, and user_id -> primary key
+        self._tweeters = LruCache(self.IDENTITY_CACHE_SIZE)
+        self._user_ids = LruCache(self.IDENTITY_CACHE_SIZE)
+        # 'tweeter' primary key -> (method, cursor) of 'track', None if absent
+        self._tracks = LruCache(self.TRACK_CACHE_SIZE)
+        # process pool of the 'parallel' scoring engine, started on demand
+        self._scorer: Optional[ParallelScorer] = None
+        # in-memory copies of 'friendship' of the 'sparse' and 'duckdb'
+        # engines, loaded on demand
+        self._graph = None
+        self._duck = None
+
+    @staticmethod
+    def _check_profile(profile: str) -> str:
+        if profile not in cfg.STORAGE_PROFILES:
+            raise ValueError('invalid storage profile')
+        return profile
+
+    def _on_checkout(self, dbapi_conn, conn_record, _):
+        """set the pragmas of the current storage profile on a pooled
+        connection, unless they are already set
+        """
+        if conn_record.info.get('storage_profile') == self._profile:
+            return
+        cursor = dbapi_conn.cursor()
+        for pragma, value in cfg.STORAGE_PROFILES[self._profile].items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+        cursor.close()
+        conn_record.info['storage_profile'] = self._profile
+
+    @contextmanager
+    def storage_profile(self, profile: str) -> Iterator[None]:
+        """switch to another storage profile within the block, from the next
+        transaction on, e.g. 'bulk' while crawling
+
+        :param profile: one of `Config.STORAGE_PROFILES`
+        """
+        previous, self._profile = self._profile, self._check_profile(profile)
+        try:
+            yield
+        finally:
+            self._profile = previous
+
+    @property
+    def in_transaction(self) -> bool:
+        """whether writes are grouped by `Dao.transaction`"""
+        return self._depth > 0
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        """group the writes of all DAO methods called within the block into
+        one atomic commit at its end, or roll all of them back if it raises;
+        nested blocks join the outermost one
+
+        :return:
+        """
+        self._depth += 1
+        try:
+            yield
+        except BaseException:
+            self._depth -= 1
+            if not self._depth:
+                self.session.rollback()
+                # cached identities may refer to rows rolled back
+                self.clear_cache()
+            raise
+        self._depth -= 1
+        if not self._depth:
+            with metrics.COMMIT_SECONDS.time():
+                self.session.commit()
+
+    def _cache_tweeters(self, rows: Iterable[Tuple[int, int]]) -> NoReturn:
+        """remember identities of 'tweeter' records
+
+        :param rows: (primary key, user_id) pairs
+        """
+        for tweeter_id, user_id in rows:
+            self._tweeters.put(tweeter_id, user_id)
+            self._user_ids.put(user_id, tweeter_id)
+
+    def _forget_tweeter(self, tweeter_id: int) -> NoReturn:
+        """drop cached identity and track of a deleted 'tweeter' record"""
+        user_id = self._tweeters.pop(tweeter_id)
+        if user_id is None:
+            # evicted from one cache but maybe not from the other
+            self._user_ids.clear()
+        else:
+            self._user_ids.pop(user_id)
+        self._tracks.pop(tweeter_id)
+
+    def clear_cache(self) -> NoReturn:
+        """drop all cached identities, tracks and edges, e.g. after the DB is
+        modified outside of `Dao`
+        """
+        self._tweeters.clear()
+        self._user_ids.clear()
+        self._tracks.clear()
+        self._forget_edges()
+
+    def _add_edges(self, edges: List[Tuple[int, int]]) -> NoReturn:
+        """keep in-memory copies of 'friendship' up to date with new edges
+
+        :param edges: inserted (author_id, follower_id) pairs
+        """
+        if self._graph is not None:
+            self._graph.add_edges(edges)
+        if self._duck is not None:
+            self._duck.add_edges(edges)
+
+    def _forget_edges(self) -> NoReturn:
+        """reload in-memory copies of 'friendship' on next use, e.g. after
+        edges are deleted
+        """
+        self._graph = None
+        if self._duck is not None:
+            self._duck.forget_edges()
+
+    def cache_stats(self) -> Dict[str, dict]:
+        """hit / miss counters of the 'tweeter' and 'track' caches
+
+        :return: dict of cache name to stats, refer to `LruCache.stats`
+        """
+        return {
+            'tweeter_id': self._tweeters.stats(),
+            'user_id': self._user_ids.stats(),
+            'track': self._tracks.stats(),
+        }
 
     @staticmethod
     def _is_new(flag: bool):
@@ -66,8 +293,13 @@ class Dao(metaclass=SingletonMeta):
         :param timestamp: "created_at" format string
         :return: datetime.date object
         """
-        ts = datetime.strptime(timestamp, '%a %b %d %H:%M:%S +0000 %Y')
-        return ts.date()
+        # fixed format '%a %b %d %H:%M:%S +0000 %Y', faster than strptime
+        try:
+            _, month, day, _, _, year = timestamp.split()
+            return date(int(year), _MONTHS[month], int(day))
+        except (KeyError, ValueError):
+            ts = datetime.strptime(timestamp, '%a %b %d %H:%M:%S +0000 %Y')
+            return ts.date()
 
     @staticmethod
     def _twitter_user_mapper(user: twitter.models.User):
@@ -80,7 +312,56 @@ class Dao(metaclass=SingletonMeta):
                        Dao._parse_date(user.created_at), user.followers_count,
                        user.friends_count)
 
+    @staticmethod
+    def _twitter_user_record(user: twitter.models.User) -> TweeterRecord:
+        """convert a twitter.User instance to a 'tweeter' row record
+
+        :param user: a twitter.User instance
+        :return: a `TweeterRecord`
+        """
+        return TweeterRecord(user.id, user.screen_name, user.name,
+                             user.description,
+                             Dao._parse_date(user.created_at).isoformat(),
+                             user.followers_count, user.friends_count)
+
+    def _upsert_returning(self, table: Table, records: Sequence[NamedTuple],
+                          conflict: str, updates: Sequence[str]) -> list:
+        """INSERT ... ON CONFLICT DO UPDATE ... RETURNING, one multi-row
+        statement per `Dao.UPSERT_CHUNK` records, executed on the DB-API
+        cursor with positional parameters
+
+        :param table: table to upsert into
+        :param records: list of records of the same type, fields named after
+        columns
+        :param conflict: name of the unique column
+        :param updates: columns to overwrite on conflict; the conflict column
+        is re-assigned if empty, so that existing rows are still returned
+        :return: list of (id, conflict column value) of all upserted rows
+        """
+        if not records:
+            return []
+        columns = records[0]._fields
+        assignments = ', '.join(f'{c} = excluded.{c}'
+                                for c in updates or [conflict])
+        row = '(' + ', '.join('?' * len(columns)) + ')'
+        conn = self.session.connection()
+        res = []
+        for chunk in _chunks(records, self.UPSERT_CHUNK):
+            res.extend(
+                tuple(t) for t in conn.exec_driver_sql(
+                    f'INSERT INTO {table.name} ({", ".join(columns)}) '
+                    f'VALUES {", ".join([row] * len(chunk))} '
+                    f'ON CONFLICT({conflict}) DO UPDATE SET {assignments} '
+                    f'RETURNING id, {conflict}',
+                    tuple(chain.from_iterable(chunk))))
+        return res
+
     def _delete_tweeter_cascade(self, tweeter_id: int) -> int:
+        self._forget_tweeter(tweeter_id)
+        self._forget_edges()
+        self._score_card_edges(self._incident_edges([tweeter_id]), -1)
+        self.session.query(ScoreCard).filter(
+            ScoreCard.tweeter_id == tweeter_id).delete()
         self.session.query(Friendship).filter(
             or_(Friendship.author_id == tweeter_id,
                 Friendship.follower_id == tweeter_id)).delete()
@@ -88,6 +369,63 @@ class Dao(metaclass=SingletonMeta):
             Wumao.tweeter_id == tweeter_id).delete()
         self.session.query(Track).filter(
             Track.tweeter_id == tweeter_id).delete()
+        self.session.query(Sample).filter(
+            Sample.tweeter_id == tweeter_id).delete()
+
+    def _in_queries(self, qry: Query, column,
+                    values: Iterable[int]) -> Iterator[Query]:
+        """restrict a query to rows of which the column value is in the
+        provided collection, split into as many queries as needed: a single
+        IN list, chunked IN lists, or a join against a temp table for very
+        large collections
+
+        :param qry: query to restrict
+        :param column: column to match
+        :param values: collection of values
+        :return: queries of which the results together cover the collection
+        """
+        values = list(set(values))
+        if len(values) > self.TEMP_TABLE_SIZE:
+            _temp_id.create(self.session.connection(), checkfirst=True)
+            self.session.execute(_temp_id.delete())
+            self.session.execute(_temp_id.insert(), [{
+                'value': v
+            } for v in values])
+            yield qry.join(_temp_id, column == _temp_id.c.value)
+            return
+        for chunk in _chunks(values, self.IN_CHUNK):
+            yield qry.filter(column.in_(chunk))
+
+    def _in_all(self, qry: Query, column, values: Iterable[int]) -> list:
+        """all rows of the query restricted by `Dao._in_queries`"""
+        return [
+            row for chunk_qry in self._in_queries(qry, column, values)
+            for row in chunk_qry.all()
+        ]
+
+    def _in_count(self, qry: Query, column, values: Iterable[int]) -> int:
+        """sum of a COUNT query restricted by `Dao._in_queries`"""
+        return sum(chunk_qry.scalar() or 0
+                   for chunk_qry in self._in_queries(qry, column, values))
+
+    def constrain_tweeters_exist(self, tweeter_ids: Iterable[int]) -> NoReturn:
+        """check provided primary keys of table 'tweeter' in one pass, and
+        raise value error if any of them does NOT exist
+
+        :param tweeter_ids: 'tweeter' primary keys
+        :return:
+        """
+        missing = [
+            i for i in set(tweeter_ids)
+            if self._tweeters.get(i, _MISSING) is _MISSING
+        ]
+        if not missing:
+            return
+        found = self._in_all(self.session.query(Tweeter.id, Tweeter.user_id),
+                             Tweeter.id, missing)
+        self._cache_tweeters(found)
+        if len(found) != len(missing):
+            raise ValueError('PK ID provided does NOT Exist!')
 
     def constrain_tweeter_exist(self, tweeter_id: int) -> NoReturn:
         """check provided primary key of table 'tweeter', and raise value error
@@ -96,24 +434,144 @@ class Dao(metaclass=SingletonMeta):
         :param tweeter_id:
         :return:
         """
-        if self.lookup_tweeter(tweeter_id) is None:
-            raise ValueError('PK ID provided does NOT Exist!')
+        self.constrain_tweeters_exist([tweeter_id])
+
+    def _incident_edges(self, tweeter_ids: List[int]) -> List[Tuple[int, int]]:
+        """'friendship' records of which the author or follower is one of
+        the provided tweeters
+
+        :param tweeter_ids: 'tweeter' primary keys
+        :return: list of (author_id, follower_id)
+        """
+        qry = self.session.query(Friendship.author_id, Friendship.follower_id)
+        return list(
+            set(self._in_all(qry, Friendship.author_id, tweeter_ids)).union(
+                self._in_all(qry, Friendship.follower_id, tweeter_ids)))
+
+    def _wumao_weights(self, tweeter_ids: Iterable[int]) -> Dict[int, float]:
+        """weights of wumaos among the provided tweeters
+
+        :param tweeter_ids: 'tweeter' primary keys
+        :return: dict of 'tweeter' ID to wumao weight
+        """
+        return dict(
+            self._in_all(
+                self.session.query(Wumao.tweeter_id,
+                                   func.coalesce(Wumao.weight, 0)),
+                Wumao.tweeter_id, tweeter_ids))
+
+    def _bump_score_card(self, deltas: Dict[int, List[float]]) -> NoReturn:
+        """add deltas to table 'score_card', insert if not exist
+
+        :param deltas: dict of 'tweeter' ID to list of friend count, follower
+        count, friend score and follower score deltas
+        :return:
+        """
+        if not deltas:
+            return
+        stmt = sqlite_insert(ScoreCard)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ScoreCard.tweeter_id],
+            set_={
+                c: getattr(ScoreCard, c) + getattr(stmt.excluded, c)
+                for c in ('friend_count', 'follower_count', 'friend_score',
+                          'follower_score')
+            })
+        self.session.execute(stmt, [{
+            'tweeter_id': tweeter_id,
+            'friend_count': delta[0],
+            'follower_count': delta[1],
+            'friend_score': delta[2],
+            'follower_score': delta[3],
+        } for tweeter_id, delta in deltas.items()])
+
+    def _score_card_edges(self, edges: List[Tuple[int, int]],
+                          sign: int) -> NoReturn:
+        """maintain 'score_card' for added (sign 1) or removed (sign -1)
+        edges, by the current wumao weights
+
+        :param edges: list of (author_id, follower_id)
+        :param sign: 1 or -1
+        :return:
+        """
+        weights = self._wumao_weights(i for edge in edges for i in edge)
+        deltas = {}
+        for author_id, follower_id in edges:
+            if author_id in weights:
+                delta = deltas.setdefault(follower_id, [0, 0, 0.0, 0.0])
+                delta[0] += sign
+                delta[2] += sign * weights[author_id]
+            if follower_id in weights:
+                delta = deltas.setdefault(author_id, [0, 0, 0.0, 0.0])
+                delta[1] += sign
+                delta[3] += sign * weights[follower_id]
+        self._bump_score_card(deltas)
+
+    def _score_card_wumaos(self, changes: Dict[int, Tuple[int,
+                                                          float]]) -> NoReturn:
+        """maintain 'score_card' for wumaos added or re-weighted, by the
+        current edges
+
+        :param changes: dict of 'tweeter' ID to tuple of 1. count delta: 1 if
+        newly added, else 0; 2. weight delta
+        :return:
+        """
+        if not changes:
+            return
+        deltas = {}
+        for author_id, follower_id in self._incident_edges(list(changes)):
+            if author_id in changes:
+                count, weight = changes[author_id]
+                delta = deltas.setdefault(follower_id, [0, 0, 0.0, 0.0])
+                delta[0] += count
+                delta[2] += weight
+            if follower_id in changes:
+                count, weight = changes[follower_id]
+                delta = deltas.setdefault(author_id, [0, 0, 0.0, 0.0])
+                delta[1] += count
+                delta[3] += weight
+        self._bump_score_card(deltas)
+
+    def _insert_edges(self, edges: List[EdgeRecord]) -> List[EdgeRecord]:
+        """INSERT OR IGNORE into 'friendship', relying on its composite
+        primary key, one multi-row statement per `Dao.UPSERT_CHUNK` edges
+
+        :param edges: list of edge records
+        :return: list of edge records actually inserted
+        """
+        conn = self.session.connection()
+        res = []
+        for chunk in _chunks(edges, self.UPSERT_CHUNK):
+            res.extend(
+                EdgeRecord(*t) for t in conn.exec_driver_sql(
+                    'INSERT OR IGNORE INTO friendship (author_id, follower_id) '
+                    f'VALUES {", ".join(["(?, ?)"] * len(chunk))} '
+                    'RETURNING author_id, follower_id',
+                    tuple(chain.from_iterable(chunk))))
+        self._add_edges(res)
+        return res
 
     @_commit
     def reset_db(self) -> NoReturn:
         """reset DB"""
+        self.clear_cache()
         self.session.query(Track).delete()
+        self.session.query(Sample).delete()
+        self.session.query(ScoreCard).delete()
         self.session.query(Friendship).delete()
         self.session.query(Wumao).delete()
         self.session.query(Tweeter).delete()
 
     @_commit
     def bulk_save(self, objects: Iterable) -> NoReturn:
-        """Perform a bulk save of the given sequence of objects
+        """Perform a bulk save of the given sequence of objects; table
+        'score_card' is NOT maintained for `Friendship` and `Wumao` objects
+        saved this way
 
         :param objects: a sequence of mapped object instances
         :return:
         """
+        self.clear_cache()
         self.session.bulk_save_objects(objects)
 
     def bulk_save_tweeter(
@@ -121,28 +579,42 @@ class Dao(metaclass=SingletonMeta):
         users: List[twitter.models.User],
         return_all: bool = False,
     ) -> Set[int]:
-        """bulk save on table 'tweeter'
-        refer to dao.bulk_save
+        """bulk upsert on table 'tweeter': insert new users, refresh profile
+        and follower / following counts of existing ones
 
         :param users:
         :param return_all: whether return all primary keys of the input list,
         or only inserted ones, default False
         :return: a set of primary keys
         """
-        existing_tweeter_ids = self.all_tweeter_id([u.id for u in users])
-        if not existing_tweeter_ids:
-            new_tweeters = set(self._twitter_user_mapper(u) for u in users)
-        else:
-            existing_tweeter_user_ids = set(
-                self.lookup_tweeter(i).user_id for i in existing_tweeter_ids)
-            new_tweeters = set(
-                self._twitter_user_mapper(u) for u in users
-                if u.id not in existing_tweeter_user_ids)
+        return self.bulk_save_tweeter_records(
+            [self._twitter_user_record(u) for u in users], return_all)
 
-        self.bulk_save(new_tweeters)
-        if return_all:
-            return self.all_tweeter_id([u.id for u in users])
-        return self.all_tweeter_id([u.user_id for u in new_tweeters])
+    @_commit
+    def bulk_save_tweeter_records(
+        self,
+        records: Iterable[TweeterRecord],
+        return_all: bool = False,
+    ) -> Set[int]:
+        """bulk upsert on table 'tweeter' from row records, refer to
+        `Dao.bulk_save_tweeter`
+
+        :param records: `TweeterRecord` instances, the last one wins if a
+        user_id repeats
+        :param return_all: whether return all primary keys of the input list,
+        or only inserted ones, default False
+        :return: a set of primary keys
+        """
+        rows = list({r.user_id: r for r in records}.values())
+        last_id = self.session.query(func.max(Tweeter.id)).scalar() or 0
+        res = self._upsert_returning(Tweeter.__table__, rows, 'user_id',
+                                     ('screen_name', 'name', 'description',
+                                      'follower_count', 'friend_count'))
+        self._cache_tweeters(res)
+        # rowid primary keys of new records always exceed the current maximum
+        new_ids = set(t[0] for t in res if t[0] > last_id)
+        metrics.TWEETERS_INSERTED.inc(len(new_ids))
+        return set(t[0] for t in res) if return_all else new_ids
 
     def lookup_tweeter(self, tweeter_id: int) -> Optional[Tweeter]:
         """get `Tweeter` instance by primary key
@@ -153,6 +625,20 @@ class Dao(metaclass=SingletonMeta):
         return self.session.query(Tweeter).filter(
             Tweeter.id == tweeter_id).first()
 
+    def lookup_user_id(self, tweeter_id: int) -> Optional[int]:
+        """get twitter user ID by primary key, cached
+
+        :param tweeter_id: table 'tweeter' primary key
+        :return: user_id, None if no match
+        """
+        user_id = self._tweeters.get(tweeter_id)
+        if user_id is None:
+            user_id = self.session.query(
+                Tweeter.user_id).filter(Tweeter.id == tweeter_id).scalar()
+            if user_id is not None:
+                self._cache_tweeters([(tweeter_id, user_id)])
+        return user_id
+
     def all_tweeter_id(self, user_ids: Optional[List[int]] = None) -> Set[int]:
         """get matched `Tweeter` primary keys by user_id list provided, or
         all PKIDs
@@ -160,11 +646,48 @@ class Dao(metaclass=SingletonMeta):
         :param user_ids: user_id `list`
         :return: set of table 'tweeter' primary keys
         """
-        qry = self.session.query(Tweeter.id)
         if user_ids is None:
-            return set(t[0] for t in qry.all())
-        return set(t[0]
-                   for t in qry.filter(Tweeter.user_id.in_(user_ids)).all())
+            return set(t[0] for t in self.session.query(Tweeter.id).all())
+        return set(self.lookup_tweeter_ids(user_ids).values())
+
+    def lookup_tweeter_ids(self, user_ids: Iterable[int]) -> Dict[int, int]:
+        """`Tweeter` primary keys of the saved ones of the user_ids provided
+
+        :param user_ids: twitter user IDs
+        :return: dict of user_id -> 'tweeter' primary key
+        """
+        res, missing = {}, []
+        for user_id in set(user_ids):
+            tweeter_id = self._user_ids.get(user_id)
+            if tweeter_id is None:
+                missing.append(user_id)
+            else:
+                res[user_id] = tweeter_id
+        if missing:
+            rows = self._in_all(
+                self.session.query(Tweeter.id, Tweeter.user_id),
+                Tweeter.user_id, missing)
+            self._cache_tweeters(rows)
+            res.update((t[1], t[0]) for t in rows)
+        return res
+
+    def read_tweeter_ids(self, user_ids: Iterable[int]) -> Dict[int, int]:
+        """like `Dao.lookup_tweeter_ids`, but safe to call from any thread:
+        a short-lived session on another pooled connection reads the rows
+        committed so far, without the identity caches; WAL lets it read while
+        the DAO thread holds a write transaction
+
+        :param user_ids: twitter user IDs
+        :return: dict of user_id -> 'tweeter' primary key
+        """
+        session = Session(bind=self.session.get_bind())
+        try:
+            qry = session.query(Tweeter.user_id, Tweeter.id)
+            return dict(
+                row for chunk in _chunks(list(set(user_ids)), self.IN_CHUNK)
+                for row in qry.filter(Tweeter.user_id.in_(chunk)))
+        finally:
+            session.close()
 
     @_commit
     def delete_tweeter(self, tweeter_id: int) -> int:
@@ -206,15 +729,11 @@ class Dao(metaclass=SingletonMeta):
         follower_ids: Optional[List[int]] = None,
     ) -> int:
         """followers count"""
-        qry = self.session.query(func.count(Friendship.follower_id))
+        qry = self.session.query(func.count(
+            Friendship.follower_id)).filter(Friendship.author_id == tweeter_id)
         if not follower_ids:
-            res = qry.filter(Friendship.author_id == tweeter_id).first()
-        else:
-            res = qry.filter(Friendship.author_id == tweeter_id,
-                             Friendship.follower_id.in_(follower_ids)).first()
-        if not res:
-            return 0
-        return res[0]
+            return qry.scalar() or 0
+        return self._in_count(qry, Friendship.follower_id, follower_ids)
 
     def friend_count(
         self,
@@ -222,38 +741,126 @@ class Dao(metaclass=SingletonMeta):
         author_ids: Optional[List[int]] = None,
     ) -> int:
         """followings count"""
-        qry = self.session.query(func.count(Friendship.author_id))
+        qry = self.session.query(func.count(
+            Friendship.author_id)).filter(Friendship.follower_id == tweeter_id)
         if not author_ids:
-            res = qry.filter(Friendship.follower_id == tweeter_id).first()
-        else:
-            res = qry.filter(Friendship.follower_id == tweeter_id,
-                             Friendship.author_id.in_(author_ids)).first()
-        if not res:
-            return 0
-        return res[0]
+            return qry.scalar() or 0
+        return self._in_count(qry, Friendship.author_id, author_ids)
+
+    @staticmethod
+    def _check_engine(engine: str) -> NoReturn:
+        if engine not in ENGINES:
+            raise ValueError('invalid scoring engine')
+
+    def sparse_graph(self):
+        """in-memory sparse graph of 'friendship' and 'wumao', requires
+        `numpy` and `scipy`; 'friendship' is read once and then kept in sync
+        with the edges inserted through `Dao`, refer to `graph.GraphCache`
+
+        :return: a `graph.SparseGraph` instance
+        """
+        if self._graph is None:
+            # pylint: disable=import-outside-toplevel
+            from .graph import GraphCache
+            self._graph = GraphCache(self.session)
+        return self._graph.graph(self.session)
+
+    def parallel_scorer(self, workers: Optional[int] = None) -> ParallelScorer:
+        """process pool aggregating ranges of 'friendship' on the SQLite file,
+        so it scores committed rows only
 
-    def score(self):
+        :param workers: number of processes, default the number of CPUs; the
+        pool is restarted if it differs from the running one
+        :return: a `parallel.ParallelScorer` instance
+        """
+        if self._scorer is not None and workers not in (None,
+                                                        self._scorer.workers):
+            self._scorer.close()
+            self._scorer = None
+        if self._scorer is None:
+            self._scorer = ParallelScorer(self.session.get_bind().url.database,
+                                          workers)
+        return self._scorer
+
+    def duck_analytics(self, *tables: str):
+        """mirror tables into an embedded in-memory DuckDB database, requires
+        `duckdb`; the database is kept, and 'friendship' is mirrored once and
+        then kept in sync with the edges inserted through `Dao`
+
+        :param tables: table names, default 'friendship' and 'wumao'
+        :return: a `duck.DuckAnalytics` instance, shared until the next call
+        """
+        if self._duck is None:
+            # pylint: disable=import-outside-toplevel
+            from .duck import DuckAnalytics
+            self._duck = DuckAnalytics.load(self.session, ())
+        self._duck.sync(self.session, tables or ('friendship', 'wumao'))
+        return self._duck
+
+    @_timed
+    def score(self, engine: str = 'sql', estimate: bool = False):
         """scoring a twitter account by measuring its wumao friends & followers
         WEIGHTED count, refer to `Dao.refresh_wumao_score`
 
+        :param engine: 'sql' to aggregate in SQLite, 'sparse' to aggregate
+        in memory via `Dao.sparse_graph`, 'incremental' to read table
+        'score_card', 'duckdb' to aggregate in DuckDB via
+        `Dao.duck_analytics`, or 'parallel' to aggregate ranges of
+        'friendship' in worker processes via `Dao.parallel_scorer`; all
+        return the same records
+        :param estimate: whether to scale the weight of a wumao friend or
+        follower by the inverse of the fraction of that wumao's followers or
+        friends seen, refer to table 'sample', i.e. a Horvitz-Thompson
+        estimate of the score had every wumao been completely crawled;
+        engine 'sql' only
         :return: list of 1. tweeter_id; 2. score
         """
+        self._check_engine(engine)
+        if estimate and engine != 'sql':
+            raise ValueError('estimates are only supported by engine "sql"')
+        if engine == 'sparse':
+            return self.sparse_graph().score()
+        if engine == 'parallel':
+            return self.parallel_scorer().score()
+        if engine == 'duckdb':
+            return self.duck_analytics().score()
+        if engine == 'incremental':
+            return self.session.query(
+                ScoreCard.tweeter_id,
+                (ScoreCard.friend_score +
+                 ScoreCard.follower_score).label('score')).outerjoin(
+                     Wumao, ScoreCard.tweeter_id == Wumao.tweeter_id).filter(
+                         Wumao.tweeter_id.is_(None),
+                         ScoreCard.friend_count > 0,
+                         ScoreCard.follower_count > 0).all()
         a1 = aliased(Wumao)
         a2 = aliased(Wumao)
+        friend_weight = follower_weight = a1.weight
+        if estimate:
+            # friends are found among the followers of wumaos, and vice versa
+            friend_weight = a1.weight / func.coalesce(Sample.follower_fraction,
+                                                      1)
+            follower_weight = a1.weight / func.coalesce(
+                Sample.friend_fraction, 1)
         sub_friend = self.session.query(
             Friendship.follower_id,
-            func.sum(a1.weight).label('friend_score')).join(
+            func.sum(friend_weight).label('friend_score')).join(
                 a1, Friendship.author_id == a1.tweeter_id).outerjoin(
-                    a2, Friendship.follower_id == a2.tweeter_id).filter(
-                        a2.tweeter_id.is_(None)).group_by(
-                            Friendship.follower_id).subquery()
+                    a2, Friendship.follower_id == a2.tweeter_id)
         sub_follower = self.session.query(
             Friendship.author_id,
-            func.sum(a1.weight).label('follower_score')).join(
+            func.sum(follower_weight).label('follower_score')).join(
                 a1, Friendship.follower_id == a1.tweeter_id).outerjoin(
-                    a2, Friendship.author_id == a2.tweeter_id).filter(
-                        a2.tweeter_id.is_(None)).group_by(
-                            Friendship.author_id).subquery()
+                    a2, Friendship.author_id == a2.tweeter_id)
+        if estimate:
+            sub_friend = sub_friend.outerjoin(
+                Sample, Sample.tweeter_id == a1.tweeter_id)
+            sub_follower = sub_follower.outerjoin(
+                Sample, Sample.tweeter_id == a1.tweeter_id)
+        sub_friend = sub_friend.filter(a2.tweeter_id.is_(None)).group_by(
+            Friendship.follower_id).subquery()
+        sub_follower = sub_follower.filter(a2.tweeter_id.is_(None)).group_by(
+            Friendship.author_id).subquery()
         return self.session.query(
             sub_friend.c.follower_id.label('tweeter_id'),
             (sub_friend.c.friend_score +
@@ -261,8 +868,27 @@ class Dao(metaclass=SingletonMeta):
                  sub_follower,
                  sub_friend.c.follower_id == sub_follower.c.author_id).all()
 
-    def center_score(self):
-        """center score"""
+    @_timed
+    def center_score(self, engine: str = 'sql'):
+        """center score
+
+        :param engine: scoring engine, refer to `Dao.score`
+        :return: list of 1. wumao id; 2. tweeter_id; 3. score
+        """
+        self._check_engine(engine)
+        if engine == 'sparse':
+            return self.sparse_graph().center_score()
+        if engine == 'parallel':
+            return self.parallel_scorer().center_score()
+        if engine == 'duckdb':
+            return self.duck_analytics().center_score()
+        if engine == 'incremental':
+            internal = ScoreCard.friend_count + ScoreCard.follower_count
+            return self.session.query(
+                Wumao.id, Wumao.tweeter_id, internal.label('score')).join(
+                    ScoreCard,
+                    Wumao.tweeter_id == ScoreCard.tweeter_id).filter(
+                        internal > 0).all()
         a1 = aliased(Wumao)
         a2 = aliased(Wumao)
         query_friend = self.session.query(
@@ -291,6 +917,62 @@ class Dao(metaclass=SingletonMeta):
             Wumao.id, Wumao.tweeter_id, sub_score.c.score).join(
                 sub_score, Wumao.tweeter_id == sub_score.c.tweeter_id).all()
 
+    @_commit
+    def rebuild_score_card(self) -> NoReturn:
+        """recompute table 'score_card' from scratch"""
+        self.session.query(ScoreCard).delete()
+        query_friend = self.session.query(
+            Friendship.follower_id.label('tweeter_id'),
+            literal(1).label('friend_count'),
+            literal(0).label('follower_count'),
+            func.coalesce(Wumao.weight, 0).label('friend_score'),
+            literal(0.0).label('follower_score')).join(
+                Wumao, Friendship.author_id == Wumao.tweeter_id)
+        query_follower = self.session.query(
+            Friendship.author_id.label('tweeter_id'),
+            literal(0).label('friend_count'),
+            literal(1).label('follower_count'),
+            literal(0.0).label('friend_score'),
+            func.coalesce(Wumao.weight, 0).label('follower_score')).join(
+                Wumao, Friendship.follower_id == Wumao.tweeter_id)
+        sub_union = query_friend.union_all(query_follower).subquery()
+        columns = ('tweeter_id', 'friend_count', 'follower_count',
+                   'friend_score', 'follower_score')
+        self.session.execute(ScoreCard.__table__.insert().from_select(
+            columns,
+            self.session.query(
+                sub_union.c.tweeter_id,
+                *(func.sum(sub_union.c[c]) for c in columns[1:])).group_by(
+                    sub_union.c.tweeter_id).statement))
+
+    def ensure_score_card(self) -> NoReturn:
+        """rebuild table 'score_card' if it is not populated yet while
+        friendship with wumaos exists, e.g. a database created before it was
+        maintained incrementally
+        """
+        if self.session.query(ScoreCard.tweeter_id).first() is not None:
+            return
+        if self.session.query(Friendship.author_id).join(
+                Wumao, Friendship.author_id == Wumao.tweeter_id).first():
+            self.rebuild_score_card()
+
+    def check_score_card(self, tolerance: float = 1e-6) -> Set[int]:
+        """compare the incrementally maintained scores against the full SQL
+        recomputation
+
+        :param tolerance: maximum absolute difference of scores
+        :return: 'tweeter' IDs of which the scores differ, empty if consistent
+        """
+        mismatches = set()
+        for method in (self.score, self.center_score):
+            expected = {r.tweeter_id: r.score for r in method('sql')}
+            actual = {r.tweeter_id: r.score for r in method('incremental')}
+            mismatches.update(expected.keys() ^ actual.keys())
+            mismatches.update(
+                i for i in expected.keys() & actual.keys()
+                if abs(expected[i] - actual[i]) > tolerance)
+        return mismatches
+
     @_commit
     def follow(self, tweeter_id: int, author_id: int) -> NoReturn:
         """add following-ship"""
@@ -298,6 +980,8 @@ class Dao(metaclass=SingletonMeta):
         self.constrain_tweeter_exist(author_id)
         if not self.is_following(tweeter_id, author_id):
             self.session.add(Friendship(author_id, tweeter_id))
+            self._score_card_edges([(author_id, tweeter_id)], 1)
+            self._add_edges([(author_id, tweeter_id)])
 
     @_commit
     def un_follow(self, tweeter_id: int, author_id: int) -> NoReturn:
@@ -308,26 +992,37 @@ class Dao(metaclass=SingletonMeta):
             self.session.query(Friendship).filter(
                 Friendship.author_id == author_id,
                 Friendship.follower_id == tweeter_id).delete()
+            self._score_card_edges([(author_id, tweeter_id)], -1)
+            self._forget_edges()
 
-    def bulk_follow(self, tweeter_id: int, authors: List[int]) -> NoReturn:
-        """follow authors"""
-        self.constrain_tweeter_exist(tweeter_id)
-        for author in authors:
-            self.constrain_tweeter_exist(author)
-        new_authors = [
-            i for i in authors if i not in self.friends_id(tweeter_id)
-        ]
-        self.bulk_save((Friendship(i, tweeter_id) for i in new_authors))
+    @_commit
+    def ingest_edges(self, edges: Iterable[Tuple[int, int]]) -> int:
+        """insert a page of edges, skipping the existing ones without reading
+        them first, and maintain 'score_card' for the new ones
 
-    def bulk_attract(self, tweeter_id: int, followers: List[int]) -> NoReturn:
-        """add followers"""
-        self.constrain_tweeter_exist(tweeter_id)
-        for follower in followers:
-            self.constrain_tweeter_exist(follower)
-        new_followers = [
-            i for i in followers if i not in self.followers_id(tweeter_id)
-        ]
-        self.bulk_save((Friendship(tweeter_id, i) for i in new_followers))
+        :param edges: (author_id, follower_id) pairs of 'tweeter' primary keys
+        :return: number of new edges
+        """
+        edges = list(set(map(EdgeRecord._make, edges)))
+        self.constrain_tweeters_exist(chain.from_iterable(edges))
+        new_edges = self._insert_edges(edges)
+        self._score_card_edges(new_edges, 1)
+        metrics.EDGES_INSERTED.inc(len(new_edges))
+        return len(new_edges)
+
+    def bulk_follow(self, tweeter_id: int, authors: Iterable[int]) -> int:
+        """follow authors
+
+        :return: number of new edges
+        """
+        return self.ingest_edges(EdgeRecord(i, tweeter_id) for i in authors)
+
+    def bulk_attract(self, tweeter_id: int, followers: Iterable[int]) -> int:
+        """add followers
+
+        :return: number of new edges
+        """
+        return self.ingest_edges(EdgeRecord(tweeter_id, i) for i in followers)
 
     def any_wumao(self, new: bool = False) -> Optional[Wumao]:
         """get a new wumao if exists"""
@@ -338,6 +1033,7 @@ class Dao(metaclass=SingletonMeta):
         """query wumao"""
         return self.session.query(Wumao).filter(Wumao.id == wumao_id).first()
 
+    @_commit
     def bulk_save_wumao(self,
                         tweeter_ids: List[int],
                         new: bool = False,
@@ -351,22 +1047,14 @@ class Dao(metaclass=SingletonMeta):
         or only inserted ones, default False
         :return: set of primary keys
         """
-        for tid in tweeter_ids:
-            self.constrain_tweeter_exist(tid)
+        self.constrain_tweeters_exist(tweeter_ids)
         is_new = self._is_new(new)
-        existing_wumao_ids = self.all_wumao_id(tweeter_ids)
-        if not existing_wumao_ids:
-            new_wumaos = set(Wumao(i, is_new) for i in tweeter_ids)
-        else:
-            existing_wumao_tweeter_ids = set(
-                self.lookup_wumao(i).tweeter_id for i in existing_wumao_ids)
-            new_wumaos = set(
-                Wumao(i, is_new) for i in tweeter_ids
-                if i not in existing_wumao_tweeter_ids)
-        self.bulk_save(new_wumaos)
-        if return_all:
-            return self.all_wumao_id(tweeter_ids)
-        return self.all_wumao_id([n.tweeter_id for n in new_wumaos])
+        rows = [WumaoRecord(i, is_new, 1.0) for i in set(tweeter_ids)]
+        last_id = self.session.query(func.max(Wumao.id)).scalar() or 0
+        res = self._upsert_returning(Wumao.__table__, rows, 'tweeter_id', ())
+        new_wumaos = [t for t in res if t[0] > last_id]
+        self._score_card_wumaos({t[1]: (1, 1.0) for t in new_wumaos})
+        return set(t[0] for t in (res if return_all else new_wumaos))
 
     def all_wumao_id(self,
                      tweeter_ids: Optional[List[int]] = None) -> Set[int]:
@@ -378,8 +1066,8 @@ class Dao(metaclass=SingletonMeta):
         qry = self.session.query(Wumao.id)
         if tweeter_ids is None:
             return set(t[0] for t in qry.all())
-        return set(
-            t[0] for t in qry.filter(Wumao.tweeter_id.in_(tweeter_ids)).all())
+        return set(t[0]
+                   for t in self._in_all(qry, Wumao.tweeter_id, tweeter_ids))
 
     def all_wumao_tweeter_id(self) -> Set[int]:
         """get all wumao tweeters' ID"""
@@ -392,21 +1080,113 @@ class Dao(metaclass=SingletonMeta):
         is_new = self._is_new(new)
         qry = self.session.query(Wumao).filter(Wumao.tweeter_id == tweeter_id)
         if qry.first() is None:
-            self.session.add(Wumao(tweeter_id, is_new))
+            wumao = Wumao(tweeter_id, is_new)
+            self.session.add(wumao)
+            self._score_card_wumaos({tweeter_id: (1, wumao.weight)})
         else:
             qry.update({Wumao.is_new: is_new})
 
     @_commit
-    def refresh_wumao_score(self):
-        """refresh wumao score"""
-        scores = self.center_score()
+    def refresh_wumao_score(self, engine: str = 'sql'):
+        """refresh wumao score
+
+        :param engine: scoring engine, refer to `Dao.score`
+        """
+        scores = self.center_score(engine)
         avg = sum(t.score for t in scores) / len(scores)
-        mappings = ({
+        mappings = [{
             'id': t.id,
             'weight': round(t.score / avg, 2),
-        } for t in scores)
+        } for t in scores]
+        old_weights = dict(
+            self.session.query(Wumao.id, func.coalesce(Wumao.weight, 0)).all())
+        tweeter_ids = {t.id: t.tweeter_id for t in scores}
+        self._score_card_wumaos({
+            tweeter_ids[m['id']]: (0, m['weight'] - old_weights[m['id']])
+            for m in mappings if m['weight'] != old_weights[m['id']]
+        })
         return self.session.bulk_update_mappings(Wumao, mappings)
 
+    @_commit
+    def upsert_sample(self, tweeter_id: int, friend_fraction: float,
+                      follower_fraction: float) -> NoReturn:
+        """record fractions of friends & followers seen of a wumao crawled
+        with a page cap
+
+        :param tweeter_id: 'tweeter' primary key
+        :param friend_fraction: fraction of friends seen, in (0, 1]
+        :param follower_fraction: fraction of followers seen, in (0, 1]
+        """
+        self.session.merge(
+            Sample(tweeter_id, friend_fraction, follower_fraction))
+
+    def sampled_tweeter_ids(self) -> Set[int]:
+        """'tweeter' IDs of wumaos crawled with a page cap"""
+        return set(t[0] for t in self.session.query(Sample.tweeter_id).all())
+
+    @_commit
+    def requeue_sampled_wumao(self) -> int:
+        """mark wumaos crawled with a page cap as new, to be crawled
+        completely, and forget their fractions
+
+        :return: number of wumaos marked
+        """
+        sampled = self.session.query(Sample.tweeter_id)
+        count = self.session.query(Wumao).filter(
+            Wumao.tweeter_id.in_(sampled)).update(
+                {Wumao.is_new: self._is_new(True)}, synchronize_session=False)
+        self.session.query(Sample).delete()
+        return count
+
+    def tracked_tweeter_ids(
+        self, limit: int, exclude: Iterable[int] = ()) -> List[int]:
+        """'tweeter' IDs of which friendship is partially saved, i.e. with a
+        'track' cursor
+
+        :param limit: maximum number of IDs to return
+        :param exclude: 'tweeter' IDs to skip, e.g. those being searched
+        :return: list of 'tweeter' primary keys
+        """
+        if limit <= 0:
+            return []
+        return [
+            t[0] for t in self.session.query(Track.tweeter_id).filter(
+                Track.tweeter_id.notin_(set(exclude))).limit(limit).all()
+        ]
+
+    def frontier_candidates(self) -> List[FrontierRecord]:
+        """new wumaos not tracked yet, along with their friends & followers
+        counts reported by twitter, weight, and number of saved friendship
+        with other wumaos
+
+        :return: list of `FrontierRecord`
+        """
+        wumao = aliased(Wumao)
+        friends = self.session.query(
+            Friendship.follower_id.label('tweeter_id'),
+            func.count().label('n')).join(
+                wumao, Friendship.author_id == wumao.tweeter_id).group_by(
+                    Friendship.follower_id).subquery()
+        followers = self.session.query(
+            Friendship.author_id.label('tweeter_id'),
+            func.count().label('n')).join(
+                wumao, Friendship.follower_id == wumao.tweeter_id).group_by(
+                    Friendship.author_id).subquery()
+        qry = self.session.query(
+            Wumao.tweeter_id, Tweeter.friend_count, Tweeter.follower_count,
+            Wumao.weight,
+            func.coalesce(friends.c.n, 0) +
+            func.coalesce(followers.c.n, 0)).join(
+                Tweeter, Tweeter.id == Wumao.tweeter_id).outerjoin(
+                    friends,
+                    friends.c.tweeter_id == Wumao.tweeter_id).outerjoin(
+                        followers,
+                        followers.c.tweeter_id == Wumao.tweeter_id).filter(
+                            Wumao.is_new == self._is_new(True),
+                            Wumao.tweeter_id.notin_(
+                                self.session.query(Track.tweeter_id)))
+        return [FrontierRecord(*row) for row in qry.all()]
+
     def any_track(self) -> Track:
         """any track"""
         return self.session.query(Track).first()
@@ -416,6 +1196,21 @@ class Dao(metaclass=SingletonMeta):
         return self.session.query(Track).filter(
             Track.tweeter_id == tweeter_id).first()
 
+    def track_cursor(self, tweeter_id: int) -> Optional[Tuple[str, int]]:
+        """get method and cursor of 'track' by 'tweeter' ID, cached
+
+        :param tweeter_id: 'tweeter' primary key
+        :return: tuple of search function name, cursor; None if no track
+        """
+        res = self._tracks.get(tweeter_id, _MISSING)
+        if res is _MISSING:
+            row = self.session.query(
+                Track.method,
+                Track.cursor).filter(Track.tweeter_id == tweeter_id).first()
+            res = None if row is None else tuple(row)
+            self._tracks.put(tweeter_id, res)
+        return res
+
     @_commit
     def delete_track(self, tweeter_id: int) -> int:
         """delete from 'track' records by providing 'tweeter' ID
@@ -424,6 +1219,7 @@ class Dao(metaclass=SingletonMeta):
         :param tweeter_id: 'tweeter' primary key
         :return: deleted number of records
         """
+        self._tracks.put(tweeter_id, None)
         return self.session.query(Track).filter(
             Track.tweeter_id == tweeter_id).delete()
 
@@ -437,32 +1233,113 @@ class Dao(metaclass=SingletonMeta):
         :return:
         """
         self.constrain_tweeter_exist(tweeter_id)
-        qry = self.session.query(Track).filter(Track.tweeter_id == tweeter_id)
-        if qry.first() is None:
+        if self.track_cursor(tweeter_id) is None:
             self.session.add(Track(tweeter_id, method, cur))
         else:
-            qry.update({Track.method: method, Track.cursor: cur})
+            self.session.query(Track).filter(
+                Track.tweeter_id == tweeter_id).update({
+                    Track.method: method,
+                    Track.cursor: cur
+                })
+        self._tracks.put(tweeter_id, (method, cur))
 
-    def wumao_to_csv(self, csv_path: str, weight: float = 1.0) -> NoReturn:
-        """export wumao account data to csv
+    def _wumao_query(self, weight: float) -> Query:
+        return self.session.query(Tweeter.user_id.label('ID'),
+                                  Tweeter.screen_name.label('Screen Name'),
+                                  Tweeter.name.label('Nick Name'),
+                                  Tweeter.description.label('Description'),
+                                  Tweeter.created_at.label('Creation Date'),
+                                  Tweeter.follower_count.label('#Follower'),
+                                  Tweeter.friend_count.label('#Following'),
+                                  Wumao.weight.label('Wumao Score')).join(
+                                      Wumao,
+                                      Tweeter.id == Wumao.tweeter_id).filter(
+                                          Wumao.weight >= weight).order_by(
+                                              Wumao.weight.desc(), Tweeter.id)
+
+    def _wumao_edge_query(self, weight: float) -> Query:
+        author = aliased(Tweeter)
+        follower = aliased(Tweeter)
+        author_wumao = aliased(Wumao)
+        follower_wumao = aliased(Wumao)
+        qry = self.session.query(
+            author.user_id.label('Author ID'),
+            follower.user_id.label('Follower ID')).select_from(Friendship)
+        qry = qry.join(author_wumao,
+                       Friendship.author_id == author_wumao.tweeter_id).join(
+                           follower_wumao,
+                           Friendship.follower_id == follower_wumao.tweeter_id)
+        qry = qry.join(author, Friendship.author_id == author.id).join(
+            follower, Friendship.follower_id == follower.id)
+        return qry.filter(author_wumao.weight >= weight, follower_wumao.weight
+                          >= weight).order_by(Friendship.author_id,
+                                              Friendship.follower_id)
+
+    @staticmethod
+    def _fields(qry: Query) -> List[Field]:
+        return [Field(d['name'], d['type']) for d in qry.column_descriptions]
+
+    def wumao_to_csv(self,
+                     csv_path: str,
+                     weight: float = 1.0,
+                     engine: str = 'sql',
+                     compression: Optional[str] = None,
+                     batch: int = 10000) -> int:
+        """export wumao account data to csv, streamed `batch` rows at a time,
+        so that memory does not grow with table 'wumao'; only the header is
+        written if no wumao matches
 
         :param weight: filter, lower bound of `Wumao`.weight, default 1.0
-        :return:
+        :param engine: 'sql' to query SQLite, or 'duckdb' to query DuckDB via
+        `Dao.duck_analytics`; both write the same file
+        :param compression: 'gzip', 'bz2' or 'xz' to compress on the fly
+        :param batch: number of rows held in memory
+        :return: number of exported wumaos
+        """
+        if engine not in EXPORT_ENGINES:
+            raise ValueError('invalid export engine')
+        qry = self._wumao_query(weight)
+        if engine == 'duckdb':
+            duck = self.duck_analytics('tweeter', 'wumao')
+            return write_table(csv_path, 'csv', self._fields(qry),
+                               duck.wumao_export(weight, batch), compression)
+        return write_table(csv_path, 'csv', self._fields(qry),
+                           batched(qry.yield_per(batch), batch), compression)
+
+    def export_wumao(self,
+                     path: str,
+                     fmt: str = 'csv',
+                     compression: Optional[str] = None,
+                     weight: float = 1.0,
+                     engine: str = 'sql',
+                     batch: int = 10000) -> Tuple[int, int]:
+        """export wumao accounts and the friendship among them, streamed in
+        batches of rows so that memory does not grow with the graph
+
+        :param path: path of the account table, the edge list is written
+        next to it, refer to `export.edges_path`
+        :param fmt: 'csv', 'jsonl' or 'parquet', refer to `export.write_table`
+        :param compression: refer to `export.write_table`
+        :param weight: filter, lower bound of `Wumao`.weight of accounts and
+        of both ends of edges
+        :param engine: 'sql' to query SQLite, or 'duckdb' to query DuckDB via
+        `Dao.duck_analytics`
+        :param batch: number of rows per batch, i.e. per parquet row group
+        :return: number of accounts, number of edges
         """
-        shutil.rmtree(csv_path, ignore_errors=True)
-        records = self.session.query(
-            Tweeter.user_id.label('ID'),
-            Tweeter.screen_name.label('Screen Name'),
-            Tweeter.name.label('Nick Name'),
-            Tweeter.description.label('Description'),
-            Tweeter.created_at.label('Creation Date'),
-            Tweeter.follower_count.label('#Follower'),
-            Tweeter.friend_count.label('#Following'),
-            Wumao.weight.label('Wumao Score')).join(
-                Wumao, Tweeter.id == Wumao.tweeter_id).filter(
-                    Wumao.weight >= weight).order_by(
-                        Wumao.weight.desc()).all()
-        with open(csv_path, mode='w', encoding='UTF-8') as outfile:
-            csv_writer = csv.writer(outfile)
-            csv_writer.writerow(records[0].keys())
-            csv_writer.writerows(records)
+        if engine not in EXPORT_ENGINES:
+            raise ValueError('invalid export engine')
+        queries = (self._wumao_query(weight), self._wumao_edge_query(weight))
+        paths = (path, edges_path(path))
+        if engine == 'duckdb':
+            duck = self.duck_analytics('tweeter', 'wumao', 'friendship')
+            # generators, each query runs once the previous one is written
+            streams = (duck.wumao_export(weight, batch),
+                       duck.wumao_edge_export(weight, batch))
+            return tuple(
+                write_table(out, fmt, self._fields(qry), stream, compression)
+                for out, qry, stream in zip(paths, queries, streams))
+        return tuple(
+            write_table(out, fmt, self._fields(qry),
+                        batched(qry.yield_per(batch), batch), compression)
+            for out, qry in zip(paths, queries))
@@ -0,0 +1,279 @@
+"""embedded DuckDB analytics engine
+
+requires the optional dependency `duckdb`; tables are mirrored into an
+in-memory DuckDB database through temporary CSV files rather than attached,
+since attaching SQLite downloads DuckDB's 'sqlite' extension at run time and
+would miss writes of the DAO session not committed yet; 'friendship' is
+mirrored once and then only appended to
+"""
+import csv
+import os
+import tempfile
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import duckdb
+from sqlalchemy import Column
+from sqlalchemy import Table
+from sqlalchemy import select
+from sqlalchemy import types
+from sqlalchemy.orm import Session
+
+from .base import Base
+from .records import CenterScore
+from .records import TweeterScore
+
+__all__ = ['DuckAnalytics']
+
+# written unquoted as 'nan', unlike any quoted string; SQLite has no NaN
+_NULL = float('nan')
+
+# same aggregation as the SQL path of `Dao.score`
+_SCORE = '''
+WITH friend AS (
+    SELECT f.follower_id AS tweeter_id, SUM(a1.weight) AS friend_score
+    FROM friendship f
+    JOIN wumao a1 ON f.author_id = a1.tweeter_id
+    LEFT JOIN wumao a2 ON f.follower_id = a2.tweeter_id
+    WHERE a2.tweeter_id IS NULL
+    GROUP BY f.follower_id
+), follower AS (
+    SELECT f.author_id AS tweeter_id, SUM(a1.weight) AS follower_score
+    FROM friendship f
+    JOIN wumao a1 ON f.follower_id = a1.tweeter_id
+    LEFT JOIN wumao a2 ON f.author_id = a2.tweeter_id
+    WHERE a2.tweeter_id IS NULL
+    GROUP BY f.author_id
+)
+SELECT tweeter_id, friend_score + follower_score AS score
+FROM friend JOIN follower USING (tweeter_id)
+ORDER BY tweeter_id
+'''
+
+# same aggregation as the SQL path of `Dao.center_score`: an edge between two
+# wumaos counts for both of them
+_CENTER_SCORE = '''
+WITH internal AS (
+    SELECT f.author_id, f.follower_id
+    FROM friendship f
+    JOIN wumao a1 ON f.author_id = a1.tweeter_id
+    JOIN wumao a2 ON f.follower_id = a2.tweeter_id
+), degree AS (
+    SELECT tweeter_id, COUNT(*) AS score
+    FROM (SELECT follower_id AS tweeter_id FROM internal
+          UNION ALL
+          SELECT author_id AS tweeter_id FROM internal)
+    GROUP BY tweeter_id
+)
+SELECT w.id, w.tweeter_id, d.score
+FROM wumao w JOIN degree d ON w.tweeter_id = d.tweeter_id
+ORDER BY w.tweeter_id
+'''
+
+# same query as the SQL path of `Dao.wumao_to_csv`
+_WUMAO_EXPORT = '''
+SELECT t.user_id AS "ID",
+       t.screen_name AS "Screen Name",
+       t.name AS "Nick Name",
+       t.description AS "Description",
+       t.created_at AS "Creation Date",
+       t.follower_count AS "#Follower",
+       t.friend_count AS "#Following",
+       w.weight AS "Wumao Score"
+FROM tweeter t JOIN wumao w ON t.id = w.tweeter_id
+WHERE w.weight >= ?
+ORDER BY w.weight DESC, t.id
+'''
+
+# same query as the SQL path of `Dao.export_wumao`
+_WUMAO_EDGE_EXPORT = '''
+SELECT a.user_id AS "Author ID", f.user_id AS "Follower ID"
+FROM friendship e
+JOIN wumao wa ON e.author_id = wa.tweeter_id
+JOIN wumao wf ON e.follower_id = wf.tweeter_id
+JOIN tweeter a ON e.author_id = a.id
+JOIN tweeter f ON e.follower_id = f.id
+WHERE wa.weight >= ? AND wf.weight >= ?
+ORDER BY e.author_id, e.follower_id
+'''
+
+
+def _duck_type(column: Column) -> str:
+    if isinstance(column.type, types.Integer):
+        return 'BIGINT'
+    if isinstance(column.type, types.Float):
+        return 'DOUBLE'
+    if isinstance(column.type, types.Date):
+        return 'DATE'
+    return 'VARCHAR'
+
+
+def _copy(conn: duckdb.DuckDBPyConnection, table: Table, rows: Iterable[tuple],
+          csv_path: str, append: bool):
+    """write rows of a table into DuckDB
+
+    every string is quoted, so that NULL can be told from an empty string by
+    an unquoted marker
+
+    :param append: whether to insert into the existing table, instead of
+    creating or replacing it
+    """
+    if any(c.nullable for c in table.columns):
+        rows = (tuple(_NULL if v is None else v for v in row) for row in rows)
+    with open(csv_path, mode='w', encoding='UTF-8', newline='') as outfile:
+        csv.writer(outfile, quoting=csv.QUOTE_NONNUMERIC,
+                   lineterminator='\n').writerows(rows)
+    columns = ', '.join(f"'{c.name}': '{_duck_type(c)}'"
+                        for c in table.columns)
+    target = (f'INSERT INTO {table.name}'
+              if append else f'CREATE OR REPLACE TABLE {table.name} AS')
+    conn.execute(
+        f'{target} SELECT * FROM read_csv(?, '
+        f"header = false, delim = ',', quote = '\"', escape = '\"', "
+        f"new_line = '\\n', nullstr = 'nan', allow_quoted_nulls = false, "
+        f'columns = {{{columns}}})', [csv_path])
+
+
+def _mirror(session: Session, conn: duckdb.DuckDBPyConnection, table: Table,
+            csv_path: str):
+    """copy a table of the DAO session into DuckDB, reading the rows from the
+    DBAPI cursor rather than as SQLAlchemy rows
+    """
+    session.flush()
+    res = session.connection().execute(select(*table.columns))
+    try:
+        _copy(conn, table, res.cursor, csv_path, False)
+    finally:
+        res.close()
+
+
+class DuckAnalytics:
+    """tables of the DAO session mirrored into an in-memory DuckDB database,
+    running the analytical queries of `Dao` on its columnar engine
+
+    'friendship' is mirrored by the first `DuckAnalytics.sync`, and then
+    appended the edges recorded by `DuckAnalytics.add_edges`; the other
+    tables are mirrored again on every sync
+
+    usable as a context manager closing the DuckDB connection
+    """
+    __slots__ = ['conn', '_edges']
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection):
+        self.conn = conn
+        # (author_id, follower_id) inserted since 'friendship' was mirrored,
+        # None if it is not mirrored
+        self._edges: Optional[List[Tuple[int, int]]] = None
+
+    def __enter__(self) -> 'DuckAnalytics':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @classmethod
+    def load(cls, session: Session, tables: Iterable[str]) -> 'DuckAnalytics':
+        """mirror tables into a new in-memory DuckDB database
+
+        :param session: DAO session
+        :param tables: table names, e.g. 'friendship', 'wumao', 'tweeter'
+        :return: a `DuckAnalytics` instance
+        """
+        duck = cls(duckdb.connect())
+        try:
+            duck.sync(session, tables)
+        except BaseException:
+            duck.close()
+            raise
+        return duck
+
+    def sync(self, session: Session, tables: Iterable[str]):
+        """bring mirrored tables up to date with the DAO session
+
+        :param session: DAO session
+        :param tables: table names, e.g. 'friendship', 'wumao', 'tweeter'
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in tables:
+                table = Base.metadata.tables[name]
+                csv_path = os.path.join(tmp, f'{name}.csv')
+                if name != 'friendship' or self._edges is None:
+                    _mirror(session, self.conn, table, csv_path)
+                elif self._edges:
+                    _copy(self.conn, table, self._edges, csv_path, True)
+                if name == 'friendship':
+                    self._edges = []
+
+    def add_edges(self, edges: Iterable[Tuple[int, int]]):
+        """record edges inserted into 'friendship', appended by the next
+        `DuckAnalytics.sync`
+
+        :param edges: new (author_id, follower_id) pairs
+        """
+        if self._edges is not None:
+            self._edges.extend(edges)
+
+    def forget_edges(self):
+        """mirror 'friendship' again on the next `DuckAnalytics.sync`, e.g.
+        after edges are deleted
+        """
+        self._edges = None
+
+    def close(self):
+        """close the DuckDB connection"""
+        self.conn.close()
+
+    def score(self) -> List[TweeterScore]:
+        """`Dao.score` on tables 'friendship' and 'wumao'
+
+        :return: list of `TweeterScore`, ordered by tweeter ID
+        """
+        return [
+            TweeterScore(*row) for row in self.conn.execute(_SCORE).fetchall()
+        ]
+
+    def center_score(self) -> List[CenterScore]:
+        """`Dao.center_score` on tables 'friendship' and 'wumao'
+
+        :return: list of `CenterScore`, ordered by tweeter ID
+        """
+        return [
+            CenterScore(*row)
+            for row in self.conn.execute(_CENTER_SCORE).fetchall()
+        ]
+
+    def _batches(self, sql: str, params: list,
+                 size: int) -> Iterator[List[tuple]]:
+        """run a query once iterated, fetching `size` rows at a time"""
+        cursor = self.conn.execute(sql, params)
+        while True:
+            batch = cursor.fetchmany(size)
+            if not batch:
+                return
+            yield batch
+
+    def wumao_export(self,
+                     weight: float,
+                     batch: int = 10000) -> Iterator[List[tuple]]:
+        """`Dao.wumao_to_csv` query on tables 'tweeter' and 'wumao'
+
+        :param weight: lower bound of `Wumao`.weight
+        :param batch: number of rows fetched at a time
+        :return: iterator of row lists
+        """
+        return self._batches(_WUMAO_EXPORT, [weight], batch)
+
+    def wumao_edge_export(self,
+                          weight: float,
+                          batch: int = 10000) -> Iterator[List[tuple]]:
+        """`Dao.export_wumao` edge query on tables 'friendship', 'tweeter' and
+        'wumao'
+
+        :param weight: lower bound of `Wumao`.weight of both ends
+        :param batch: number of rows fetched at a time
+        :return: iterator of row lists
+        """
+        return self._batches(_WUMAO_EDGE_EXPORT, [weight, weight], batch)
@@ -0,0 +1,177 @@
+"""streaming writers of exported tables, one batch of rows at a time
+
+'parquet' requires the optional dependency `pyarrow`
+"""
+import bz2
+import csv
+import gzip
+import json
+import lzma
+import os
+from datetime import date
+from itertools import islice
+from typing import IO
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+from sqlalchemy import types
+from sqlalchemy.types import TypeEngine
+
+__all__ = [
+    'COMPRESSIONS', 'FORMATS', 'FORMAT_COMPRESSIONS', 'Field', 'batched',
+    'edges_path', 'write_table'
+]
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+_TEXT_OPENERS = {
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+_PARQUET_COMPRESSIONS = ('snappy', 'gzip', 'zstd', 'brotli', 'lz4')
+
+COMPRESSIONS = ('none', 'gzip', 'bz2', 'xz', 'snappy', 'zstd', 'brotli', 'lz4')
+# codecs available per format
+FORMAT_COMPRESSIONS = {
+    'csv': ('none', *_TEXT_OPENERS),
+    'jsonl': ('none', *_TEXT_OPENERS),
+    'parquet': ('none', *_PARQUET_COMPRESSIONS),
+}
+
+
+class Field(NamedTuple):
+    """column of an exported table"""
+    name: str
+    type: TypeEngine
+
+
+def batched(rows: Iterable[tuple], size: int) -> Iterator[List[tuple]]:
+    """split rows into lists of at most `size` rows"""
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def edges_path(path: str) -> str:
+    """path of the edge list written next to an account table, e.g.
+    'out/wumao.csv.gz' -> 'out/wumao_edges.csv.gz'
+    """
+    head, tail = os.path.split(path)
+    stem, dot, ext = tail.partition('.')
+    return os.path.join(head, f'{stem}_edges{dot}{ext}')
+
+
+def _open_text(path: str, compression: Optional[str]) -> IO[str]:
+    if compression in (None, 'none'):
+        return open(path, mode='w', encoding='UTF-8', newline='')
+    try:
+        opener = _TEXT_OPENERS[compression]
+    except KeyError:
+        raise ValueError(
+            f'invalid compression of text formats: {compression}') from None
+    return opener(path, mode='wt', encoding='UTF-8', newline='')
+
+
+def _write_csv(path: str, fields: List[Field], batches: Iterable[List[tuple]],
+               compression: Optional[str]) -> int:
+    count = 0
+    with _open_text(path, compression) as outfile:
+        csv_writer = csv.writer(outfile)
+        csv_writer.writerow(f.name for f in fields)
+        for batch in batches:
+            csv_writer.writerows(batch)
+            count += len(batch)
+    return count
+
+
+def _json_default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _write_jsonl(path: str, fields: List[Field],
+                 batches: Iterable[List[tuple]],
+                 compression: Optional[str]) -> int:
+    names = [f.name for f in fields]
+    count = 0
+    with _open_text(path, compression) as outfile:
+        for batch in batches:
+            outfile.writelines(
+                json.dumps(dict(zip(names, row)),
+                           ensure_ascii=False,
+                           default=_json_default) + '\n' for row in batch)
+            count += len(batch)
+    return count
+
+
+def _write_parquet(path: str, fields: List[Field],
+                   batches: Iterable[List[tuple]],
+                   compression: Optional[str]) -> int:
+    """every batch is written as one row group"""
+    # pylint: disable=import-outside-toplevel
+    import pyarrow as pa
+    from pyarrow import parquet as pq
+
+    if compression is None:
+        compression = 'snappy'
+    elif compression not in FORMAT_COMPRESSIONS['parquet']:
+        raise ValueError(f'invalid compression of parquet: {compression}')
+
+    def arrow_type(sql_type: TypeEngine):
+        if isinstance(sql_type, types.Integer):
+            return pa.int64()
+        if isinstance(sql_type, types.Float):
+            return pa.float64()
+        if isinstance(sql_type, types.Date):
+            return pa.date32()
+        return pa.string()
+
+    schema = pa.schema([(f.name, arrow_type(f.type)) for f in fields])
+    count = 0
+    with pq.ParquetWriter(path, schema, compression=compression) as writer:
+        for batch in batches:
+            arrays = [
+                pa.array(column, type=field.type)
+                for column, field in zip(zip(*batch), schema)
+            ]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            count += len(batch)
+    return count
+
+
+_WRITERS = {
+    'csv': _write_csv,
+    'jsonl': _write_jsonl,
+    'parquet': _write_parquet,
+}
+
+
+def write_table(path: str,
+                fmt: str,
+                fields: List[Field],
+                batches: Iterable[List[tuple]],
+                compression: Optional[str] = None) -> int:
+    """write batches of rows to a file, holding one batch in memory at a time
+
+    :param path: output file path
+    :param fmt: one of `FORMATS`
+    :param fields: columns of the rows
+    :param batches: lists of rows
+    :param compression: 'gzip', 'bz2' or 'xz' for 'csv' / 'jsonl'; 'snappy',
+    'gzip', 'zstd', 'brotli' or 'lz4' for 'parquet'; 'none' to disable, None
+    for the default of the format, i.e. uncompressed text or snappy parquet
+    :return: number of rows written
+    """
+    try:
+        writer = _WRITERS[fmt]
+    except KeyError:
+        raise ValueError(f'invalid export format: {fmt}') from None
+    return writer(path, fields, batches, compression)
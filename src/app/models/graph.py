@@ -0,0 +1,268 @@
+"""in-memory sparse graph scoring engine
+
+requires the optional dependencies `numpy` and `scipy`
+"""
+from itertools import chain
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy.orm import Session
+
+from .records import CenterScore
+from .records import TweeterScore
+
+__all__ = ['CenterScore', 'GraphCache', 'SparseGraph', 'TweeterScore']
+
+_EDGES_SQL = 'SELECT author_id, follower_id FROM friendship'
+_WUMAOS_SQL = 'SELECT id, tweeter_id, coalesce(weight, 0) FROM wumao'
+
+
+def _fetch(session: Session, sql: str, columns: int,
+           dtype: type) -> np.ndarray:
+    """rows of a query read from its DBAPI cursor straight into an array,
+    without building a SQLAlchemy row per record
+
+    :param session: DAO session, pending changes are flushed first
+    :param sql: SELECT statement
+    :param columns: number of columns it selects
+    :param dtype: array data type
+    :return: array of shape (rows, columns)
+    """
+    session.flush()
+    res = session.connection().exec_driver_sql(sql)
+    try:
+        return np.fromiter(chain.from_iterable(res.cursor),
+                           dtype=dtype).reshape(-1, columns)
+    finally:
+        res.close()
+
+
+def _load_wumaos(
+        session: Session) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """IDs, 'tweeter' IDs and weights of table 'wumao'"""
+    wumaos = _fetch(session, _WUMAOS_SQL, 3, np.float64)
+    ids, tweeter_ids = wumaos[:, :2].astype(np.int64).T
+    return ids, tweeter_ids, wumaos[:, 2]
+
+
+class SparseGraph:
+    """friendship graph loaded into a CSR adjacency matrix
+
+    row `i` / column `j` is the i-th / j-th smallest 'tweeter' ID appearing in
+    either 'friendship' or 'wumao'; `adj[i, j] == 1` if tweeter `i` follows
+    tweeter `j`
+    """
+    __slots__ = ['nodes', 'adj', 'weight', 'is_wumao', 'wumao_id']
+
+    def __init__(self, authors: np.ndarray, followers: np.ndarray,
+                 wumao_ids: np.ndarray, wumao_tweeter_ids: np.ndarray,
+                 weights: np.ndarray):
+        self.nodes = np.unique(
+            np.concatenate([authors, followers, wumao_tweeter_ids]))
+        size = len(self.nodes)
+        self.adj = sparse.csr_matrix(
+            (np.ones(len(authors)), (self._index(followers),
+                                     self._index(authors))),
+            shape=(size, size),
+        )
+        self.set_wumaos(wumao_ids, wumao_tweeter_ids, weights)
+
+    def _index(self, tweeter_ids: np.ndarray) -> np.ndarray:
+        return np.searchsorted(self.nodes, tweeter_ids)
+
+    def set_wumaos(self, wumao_ids: np.ndarray, wumao_tweeter_ids: np.ndarray,
+                   weights: np.ndarray) -> bool:
+        """replace wumaos and their weights, keeping the adjacency matrix
+
+        :return: False, leaving the graph unchanged, if a wumao is not a node
+        """
+        wumao_idx = self._index(wumao_tweeter_ids)
+        known = wumao_idx < len(self.nodes)
+        known[known] = self.nodes[wumao_idx[known]] == wumao_tweeter_ids[known]
+        if not known.all():
+            return False
+        size = len(self.nodes)
+        self.weight = np.zeros(size)
+        self.weight[wumao_idx] = weights
+        self.is_wumao = np.zeros(size)
+        self.is_wumao[wumao_idx] = 1
+        self.wumao_id = np.zeros(size, dtype=np.int64)
+        self.wumao_id[wumao_idx] = wumao_ids
+        return True
+
+    @classmethod
+    def load(cls, session: Session) -> 'SparseGraph':
+        """load tables 'friendship' and 'wumao' in one query each
+
+        :param session: DAO session
+        :return: a `SparseGraph` instance
+        """
+        edges = _fetch(session, _EDGES_SQL, 2, np.int64)
+        return cls(edges[:, 0], edges[:, 1], *_load_wumaos(session))
+
+    def score(self) -> List[TweeterScore]:
+        """vectorized `Dao.score`: non-wumao tweeters following AND followed
+        by wumaos, scored by the weighted count of these wumaos
+
+        :return: list of `TweeterScore`, ordered by tweeter ID
+        """
+        adj_t = self.adj.T
+        mask = ((self.is_wumao == 0) & (self.adj @ self.is_wumao > 0) &
+                (adj_t @ self.is_wumao > 0))
+        scores = self.adj @ self.weight + adj_t @ self.weight
+        return [
+            TweeterScore(*row) for row in zip(self.nodes[mask].tolist(),
+                                              scores[mask].tolist())
+        ]
+
+    def center_score(self) -> List[CenterScore]:
+        """vectorized `Dao.center_score`: wumaos scored by the count of their
+        wumao friends and followers
+
+        :return: list of `CenterScore`, ordered by tweeter ID
+        """
+        internal = self.is_wumao * (self.adj @ self.is_wumao +
+                                    self.adj.T @ self.is_wumao)
+        mask = internal > 0
+        return [
+            CenterScore(*row)
+            for row in zip(self.wumao_id[mask].tolist(),
+                           self.nodes[mask].tolist(),
+                           internal[mask].astype(np.int64).tolist())
+        ]
+
+    def _walk(self) -> Tuple[sparse.csr_matrix, np.ndarray]:
+        """undirected adjacency, a mutual following counting twice, and
+        degrees
+        """
+        walk = (self.adj + self.adj.T).tocsr()
+        return walk, np.asarray(walk.sum(axis=1)).ravel()
+
+    def personalized_pagerank(self,
+                              alpha: float = 0.85,
+                              tol: float = 1e-10,
+                              max_iter: int = 100) -> Tuple[np.ndarray, int]:
+        """power iteration of PageRank restarting at wumaos in proportion to
+        their weight, walking friendship in both directions
+
+        :param alpha: probability of following an edge instead of restarting
+        :param tol: stop once an iteration changes the ranks by less than this
+        L1 distance
+        :param max_iter: maximum number of iterations
+        :return: ranks indexed like `SparseGraph.nodes`, summing up to 1 if
+        there is any wumao, and number of iterations
+        """
+        seed = self.weight * self.is_wumao
+        if seed.sum() <= 0:
+            seed = self.is_wumao.copy()
+        if seed.sum() <= 0:
+            return np.zeros(len(self.nodes)), 0
+        seed /= seed.sum()
+        walk, degree = self._walk()
+        inv_degree = np.divide(1.0,
+                               degree,
+                               out=np.zeros_like(degree),
+                               where=degree > 0)
+        dangling = degree == 0
+        rank = seed
+        for i in range(1, max_iter + 1):
+            # the walk is symmetric, so spreading ranks is `walk @ ...`;
+            # the rank of dangling nodes restarts like the teleport
+            restart = 1 - alpha + alpha * rank[dangling].sum()
+            new_rank = alpha * (walk @ (rank * inv_degree)) + restart * seed
+            delta = np.abs(new_rank - rank).sum()
+            rank = new_rank
+            if delta < tol:
+                return rank, i
+        return rank, max_iter
+
+    def rank_candidates(self,
+                        candidate_ids: Iterable[int],
+                        ratio: float = 0.9,
+                        alpha: float = 0.85,
+                        tol: float = 1e-10,
+                        max_iter: int = 100) -> List[TweeterScore]:
+        """candidates about as close to the wumaos as a typical wumao, by the
+        degree-normalized rank of `SparseGraph.personalized_pagerank`, which
+        does not favour hubs
+
+        a tweeter whose neighbors are all typical wumaos converges to `alpha`
+        times their normalized rank, as the restart mass only goes to wumaos;
+        the threshold is `ratio` times that, and ranks within the error bound
+        of the converged iteration, `tol * alpha / (1 - alpha)`, are never
+        admitted, so that no candidate is admitted on numerical noise
+
+        :param candidate_ids: tweeter IDs, e.g. of `Dao.score`
+        :param ratio: fraction of the normalized rank of a tweeter surrounded
+        by typical wumaos to reach
+        :return: list of `TweeterScore` of the normalized ranks above the
+        threshold, highest first
+        """
+        rank, _ = self.personalized_pagerank(alpha, tol, max_iter)
+        _, degree = self._walk()
+        affinity = np.divide(rank,
+                             degree,
+                             out=np.zeros_like(rank),
+                             where=degree > 0)
+        wumao_affinity = affinity[self.is_wumao == 1]
+        if not len(wumao_affinity):
+            return []
+        threshold = ratio * alpha * float(np.median(wumao_affinity))
+        ids = np.fromiter(candidate_ids, dtype=np.int64)
+        idx = self._index(ids[np.isin(ids, self.nodes)])
+        mask = ((affinity[idx] >= threshold) & (rank[idx] > tol * alpha /
+                                                (1 - alpha)) &
+                (self.is_wumao[idx] == 0))
+        idx = idx[mask][np.argsort(-affinity[idx][mask], kind='stable')]
+        return [
+            TweeterScore(*row)
+            for row in zip(self.nodes[idx].tolist(), affinity[idx].tolist())
+        ]
+
+
+class GraphCache:
+    """'friendship' kept in memory between scoring passes: read once, then
+    extended by the edges `Dao` inserts, so that a pass only reads table
+    'wumao' again; the adjacency matrix is rebuilt only if edges were added
+    or a new wumao is not a node yet
+    """
+    __slots__ = ['_edges', '_pending', '_graph']
+
+    def __init__(self, session: Session):
+        """
+        :param session: DAO session
+        """
+        self._edges = _fetch(session, _EDGES_SQL, 2, np.int64)
+        # (author_id, follower_id) inserted since the graph was built
+        self._pending: List[Tuple[int, int]] = []
+        self._graph: Optional[SparseGraph] = None
+
+    def add_edges(self, edges: Iterable[Tuple[int, int]]) -> None:
+        """record edges inserted into 'friendship'
+
+        :param edges: new (author_id, follower_id) pairs
+        """
+        self._pending.extend(edges)
+
+    def graph(self, session: Session) -> SparseGraph:
+        """the graph of the cached edges and the current wumaos
+
+        :param session: DAO session
+        :return: a `SparseGraph` instance, shared until the next call
+        """
+        wumaos = _load_wumaos(session)
+        if self._pending:
+            self._edges = np.concatenate([
+                self._edges,
+                np.array(self._pending, dtype=np.int64).reshape(-1, 2)
+            ])
+            self._pending = []
+            self._graph = None
+        if self._graph is None or not self._graph.set_wumaos(*wumaos):
+            self._graph = SparseGraph(self._edges[:, 0], self._edges[:, 1],
+                                      *wumaos)
+        return self._graph
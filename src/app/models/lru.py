@@ -0,0 +1,71 @@
+"""bounded least-recently-used cache"""
+from collections import OrderedDict
+from typing import Any
+from typing import Hashable
+
+__all__ = ['LruCache']
+
+
+class LruCache:
+    """bounded mapping evicting the least recently used entry, counting hits
+    and misses of lookups; not thread-safe, like the session of `Dao`
+    """
+    __slots__ = ['maxsize', 'hits', 'misses', '_data']
+
+    def __init__(self, maxsize: int):
+        """
+        :param maxsize: maximum number of entries
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """look up an entry and mark it as recently used
+
+        :param key:
+        :param default: returned if the key is not cached
+        :return:
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """add or replace an entry, evicting the least recently used one if
+        full
+        """
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """remove an entry
+
+        :return: value of the entry, or default if not cached
+        """
+        return self._data.pop(key, default)
+
+    def clear(self):
+        """remove all entries, counters are kept"""
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """hit / miss counters, hit rate and number of entries"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'size': len(self._data),
+        }
@@ -0,0 +1,176 @@
+"""multi-process scoring engine
+
+table 'friendship' is split into ranges of follower_id and of author_id;
+worker processes aggregate one range at a time on their own read-only
+connection to the SQLite file and the parent merges the partial sums, which
+never overlap within one pass; as every range runs the whole join, it only
+beats the single SQL query with many cores and a large graph
+"""
+import multiprocessing
+import os
+import pathlib
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from .records import CenterScore
+from .records import TweeterScore
+
+__all__ = ['ParallelScorer']
+
+# weighted wumao friends of non-wumao followers in [?, ?]
+_FRIEND_SCORE = '''
+SELECT f.follower_id, SUM(a1.weight)
+FROM friendship f
+JOIN wumao a1 ON f.author_id = a1.tweeter_id
+LEFT JOIN wumao a2 ON f.follower_id = a2.tweeter_id
+WHERE a2.tweeter_id IS NULL AND f.follower_id BETWEEN ? AND ?
+GROUP BY f.follower_id
+'''
+
+# weighted wumao followers of non-wumao authors in [?, ?]
+_FOLLOWER_SCORE = '''
+SELECT f.author_id, SUM(a1.weight)
+FROM friendship f
+JOIN wumao a1 ON f.follower_id = a1.tweeter_id
+LEFT JOIN wumao a2 ON f.author_id = a2.tweeter_id
+WHERE a2.tweeter_id IS NULL AND f.author_id BETWEEN ? AND ?
+GROUP BY f.author_id
+'''
+
+# wumao friends of wumao followers in [?, ?]
+_FRIEND_COUNT = '''
+SELECT f.follower_id, COUNT(*)
+FROM friendship f
+JOIN wumao a1 ON f.author_id = a1.tweeter_id
+JOIN wumao a2 ON f.follower_id = a2.tweeter_id
+WHERE f.follower_id BETWEEN ? AND ?
+GROUP BY f.follower_id
+'''
+
+# wumao followers of wumao authors in [?, ?]
+_FOLLOWER_COUNT = '''
+SELECT f.author_id, COUNT(*)
+FROM friendship f
+JOIN wumao a1 ON f.author_id = a1.tweeter_id
+JOIN wumao a2 ON f.follower_id = a2.tweeter_id
+WHERE f.author_id BETWEEN ? AND ?
+GROUP BY f.author_id
+'''
+
+# read-only connections of the current process, by SQLite file path
+_CONNECTIONS: Dict[str, sqlite3.Connection] = {}
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = _CONNECTIONS.get(db_path)
+    if conn is None:
+        uri = pathlib.Path(db_path).absolute().as_uri() + '?mode=ro'
+        conn = _CONNECTIONS[db_path] = sqlite3.connect(uri, uri=True)
+    return conn
+
+
+def _aggregate(db_path: str, sql: str, low: int,
+               high: int) -> List[Tuple[int, float]]:
+    """run a partial aggregation in a worker process"""
+    return _connect(db_path).execute(sql, (low, high)).fetchall()
+
+
+def _ranges(low: int, high: int, parts: int) -> Iterator[Tuple[int, int]]:
+    """split [low, high] into at most `parts` contiguous ranges"""
+    step = -(-(high - low + 1) // parts)
+    for start in range(low, high + 1, step):
+        yield start, min(start + step - 1, high)
+
+
+class ParallelScorer:
+    """`Dao.score` and `Dao.center_score` aggregated by a process pool
+
+    workers read the SQLite file, so only committed rows are scored; the pool
+    is started on first use and kept until `ParallelScorer.close`
+    """
+    __slots__ = ['db_path', 'workers', '_pool']
+
+    # ranges per worker, smaller ranges even out skewed degrees
+    PARTS_PER_WORKER = 4
+
+    def __init__(self, db_path: str, workers: Optional[int] = None):
+        """
+        :param db_path: SQLite file path
+        :param workers: number of processes, default the number of CPUs
+        """
+        self.db_path = db_path
+        self.workers = workers or os.cpu_count() or 1
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def close(self):
+        """shut the process pool down"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        conn = _CONNECTIONS.pop(self.db_path, None)
+        if conn is not None:
+            conn.close()
+
+    def _id_range(self, column: str) -> Tuple[Optional[int], Optional[int]]:
+        return _connect(self.db_path).execute(
+            f'SELECT MIN({column}), MAX({column}) FROM friendship').fetchone()
+
+    def _partials(self, sql: str, column: str) -> Iterator[Tuple[int, float]]:
+        """run an aggregation over every range of `column` in the pool"""
+        low, high = self._id_range(column)
+        if low is None:
+            return
+        if self._pool is None:
+            # workers do not inherit the connections of the parent
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'))
+        futures = [
+            self._pool.submit(_aggregate, self.db_path, sql, lo, hi)
+            for lo, hi in _ranges(low, high, self.workers *
+                                  self.PARTS_PER_WORKER)
+        ]
+        for future in futures:
+            yield from future.result()
+
+    def score(self) -> List[TweeterScore]:
+        """`Dao.score`: friend scores by follower_id ranges plus follower
+        scores by author_id ranges
+
+        :return: list of `TweeterScore`, ordered by tweeter ID
+        """
+        friend_scores = dict(self._partials(_FRIEND_SCORE, 'follower_id'))
+        follower_scores = dict(self._partials(_FOLLOWER_SCORE, 'author_id'))
+        res = []
+        for tweeter_id in sorted(friend_scores.keys()
+                                 & follower_scores.keys()):
+            friend = friend_scores[tweeter_id]
+            follower = follower_scores[tweeter_id]
+            # NULL weights propagate as in SQL
+            score = None if None in (friend, follower) else friend + follower
+            res.append(TweeterScore(tweeter_id, score))
+        return res
+
+    def center_score(self) -> List[CenterScore]:
+        """`Dao.center_score`: wumao friend counts by follower_id ranges plus
+        wumao follower counts by author_id ranges
+
+        :return: list of `CenterScore`, ordered by tweeter ID
+        """
+        counts: Counter = Counter()
+        for tweeter_id, count in self._partials(_FRIEND_COUNT, 'follower_id'):
+            counts[tweeter_id] += count
+        for tweeter_id, count in self._partials(_FOLLOWER_COUNT, 'author_id'):
+            counts[tweeter_id] += count
+        wumaos = _connect(self.db_path).execute(
+            'SELECT id, tweeter_id FROM wumao ORDER BY tweeter_id')
+        return [
+            CenterScore(wumao_id, tweeter_id, counts[tweeter_id])
+            for wumao_id, tweeter_id in wumaos if counts[tweeter_id] > 0
+        ]
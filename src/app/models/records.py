@@ -0,0 +1,57 @@
+"""compact row records of the Core-level ingest path, written without
+building ORM instances, and of the scoring engines
+"""
+from typing import NamedTuple
+
+__all__ = [
+    'CenterScore', 'EdgeRecord', 'FrontierRecord', 'TweeterRecord',
+    'TweeterScore', 'WumaoRecord'
+]
+
+
+class TweeterRecord(NamedTuple):
+    """a 'tweeter' row without primary key, fields in column order"""
+    user_id: int
+    screen_name: str
+    name: str
+    description: str
+    # ISO date as stored by SQLite, e.g. '2011-03-29'
+    created_at: str
+    follower_count: int
+    friend_count: int
+
+
+class WumaoRecord(NamedTuple):
+    """a 'wumao' row without primary key"""
+    tweeter_id: int
+    is_new: int
+    weight: float
+
+
+class EdgeRecord(NamedTuple):
+    """a 'friendship' row"""
+    author_id: int
+    follower_id: int
+
+
+class TweeterScore(NamedTuple):
+    """candidate score, same fields as a `Dao.score` row"""
+    tweeter_id: int
+    score: float
+
+
+class CenterScore(NamedTuple):
+    """wumao center score, same fields as a `Dao.center_score` row"""
+    id: int
+    tweeter_id: int
+    score: int
+
+
+class FrontierRecord(NamedTuple):
+    """new wumao to crawl, a `Dao.frontier_candidates` row"""
+    tweeter_id: int
+    friend_count: int
+    follower_count: int
+    weight: float
+    # known wumaos among the saved friends & followers
+    overlap: int
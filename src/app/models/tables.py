@@ -94,3 +94,55 @@ class Track(Base):
         self.tweeter_id = tweeter_id
         self.method = method
         self.cursor = cursor
+
+
+class ScoreCard(Base):
+    """per-tweeter accumulators of wumao friends & followers, maintained
+    incrementally by the DAO on every edge / wumao change
+    """
+    __tablename__ = 'score_card'
+
+    tweeter_id = sa.Column(sa.Integer,
+                           ForeignKey('tweeter.id',
+                                      onupdate='CASCADE',
+                                      ondelete='CASCADE'),
+                           primary_key=True)
+    friend_count = sa.Column(sa.Integer, default=0)
+    follower_count = sa.Column(sa.Integer, default=0)
+    friend_score = sa.Column(sa.Float, default=0)
+    follower_score = sa.Column(sa.Float, default=0)
+
+    def __init__(self,
+                 tweeter_id: int,
+                 friend_count: int = 0,
+                 follower_count: int = 0,
+                 friend_score: float = 0.0,
+                 follower_score: float = 0.0):
+        self.tweeter_id = tweeter_id
+        self.friend_count = friend_count
+        self.follower_count = follower_count
+        self.friend_score = friend_score
+        self.follower_score = follower_score
+
+
+class Sample(Base):
+    """fractions of friends & followers seen of wumaos crawled with a page
+    cap, refer to `Saver.search`
+    """
+    __tablename__ = 'sample'
+
+    tweeter_id = sa.Column(sa.Integer,
+                           ForeignKey('tweeter.id',
+                                      onupdate='CASCADE',
+                                      ondelete='CASCADE'),
+                           primary_key=True)
+    friend_fraction = sa.Column(sa.Float, default=1)
+    follower_fraction = sa.Column(sa.Float, default=1)
+
+    def __init__(self,
+                 tweeter_id: int,
+                 friend_fraction: float = 1.0,
+                 follower_fraction: float = 1.0):
+        self.tweeter_id = tweeter_id
+        self.friend_fraction = friend_fraction
+        self.follower_fraction = follower_fraction
@@ -3,6 +3,7 @@ from .cmd import add_seed
 from .cmd import calculate
 from .cmd import export
 from .cmd import reset
+from .cmd import stats
 from .cmd import update_params
 
 __all__ = [
@@ -10,5 +11,6 @@ __all__ = [
     'calculate',
     'export',
     'reset',
+    'stats',
     'update_params',
 ]
@@ -0,0 +1,188 @@
+"""on-disk cache of paged twitter API responses"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from twitter.models import User
+
+LOGGER = logging.getLogger(__name__)
+
+__all__ = ['PageCache']
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS page ('
+    'endpoint TEXT NOT NULL, user_id INTEGER NOT NULL, '
+    'cursor INTEGER NOT NULL, count INTEGER NOT NULL, '
+    'next_cursor INTEGER NOT NULL, previous_cursor INTEGER NOT NULL, '
+    'users BLOB NOT NULL, size INTEGER NOT NULL, '
+    'created_at REAL NOT NULL, accessed_at REAL NOT NULL, '
+    'PRIMARY KEY (endpoint, user_id, cursor, count))',
+    'CREATE INDEX IF NOT EXISTS page_accessed_at ON page (accessed_at)',
+)
+
+
+def _dump(users: List[Union[User, int]]) -> bytes:
+    """serialize twitter users, or user IDs, to compressed JSON"""
+    rows = []
+    for user in users:
+        if isinstance(user, int):
+            rows.append(user)
+            continue
+        row = user.AsDict()
+        # `AsDict` drops falsy values, e.g. zero counts or protected=False
+        row.update((k, getattr(user, k)) for k in user.param_defaults
+                   if getattr(user, k) in (0, False, ''))
+        rows.append(row)
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode())
+
+
+def _load(blob: bytes) -> List[Union[User, int]]:
+    return [
+        d if isinstance(d, int) else User.NewFromJsonDict(d)
+        for d in json.loads(zlib.decompress(blob))
+    ]
+
+
+class PageCache:
+    """paged twitter API responses in a SQLite file, keyed by endpoint, user
+    ID, cursor and page size
+
+    pages expire after `ttl` seconds; once the stored pages exceed `max_bytes`
+    the least recently used ones are evicted down to 90% of it; hit and miss
+    counters tell how many API calls are saved
+    """
+    __slots__ = [
+        'ttl', 'max_bytes', 'hits', 'misses', 'evictions', '_conn', '_lock',
+        '_clock', '_size'
+    ]
+
+    def __init__(self,
+                 path: str,
+                 ttl: float = 7 * 24 * 3600,
+                 max_bytes: int = 1024**3,
+                 clock: Callable[[], float] = time.time):
+        """
+        :param path: SQLite file path
+        :param ttl: seconds a page stays valid
+        :param max_bytes: maximum compressed size of stored pages
+        :param clock: current epoch seconds
+        """
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        # pages are fetched by worker threads
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        for stmt in _SCHEMA:
+            self._conn.execute(stmt)
+        self._conn.commit()
+        self._size = self._total_size()
+
+    def _total_size(self) -> int:
+        return self._conn.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM page').fetchone()[0]
+
+    def get(self, endpoint: str, user_id: int, cursor: int,
+            count: int) -> Optional[Tuple[int, int, List[User]]]:
+        """look up a page
+
+        :param endpoint: rate limit resource, e.g. '/followers/list'
+        :param user_id: twitter user ID
+        :param cursor: paged search cursor
+        :param count: page size
+        :return: tuple of next cursor, previous cursor, list of twitter users
+        or user IDs; None if not cached or expired
+        """
+        key = (endpoint, user_id, cursor, count)
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT next_cursor, previous_cursor, users, created_at '
+                'FROM page WHERE endpoint = ? AND user_id = ? AND cursor = ? '
+                'AND count = ?', key).fetchone()
+            now = self._clock()
+            if row is None or row[3] + self.ttl <= now:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                'UPDATE page SET accessed_at = ? WHERE endpoint = ? AND '
+                'user_id = ? AND cursor = ? AND count = ?', (now, *key))
+            self._conn.commit()
+            self.hits += 1
+        return row[0], row[1], _load(row[2])
+
+    def put(self, endpoint: str, user_id: int, cursor: int, count: int,
+            page: Tuple[int, int, List[User]]):
+        """store a page, evicting old ones if the size limit is exceeded
+
+        :param endpoint: rate limit resource
+        :param user_id: twitter user ID
+        :param cursor: paged search cursor
+        :param count: page size
+        :param page: tuple of next cursor, previous cursor, list of twitter
+        users or user IDs as returned by the paged API
+        """
+        next_cursor, previous_cursor, users = page
+        blob = _dump(users)
+        key = (endpoint, user_id, cursor, count)
+        with self._lock:
+            old = self._conn.execute(
+                'SELECT size FROM page WHERE endpoint = ? AND user_id = ? '
+                'AND cursor = ? AND count = ?', key).fetchone()
+            now = self._clock()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO page VALUES (?, ?, ?, ?, ?, ?, ?, ?, '
+                '?, ?)', (*key, next_cursor, previous_cursor, blob, len(blob),
+                          now, now))
+            self._size += len(blob) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """delete expired pages, then least recently used ones down to 90% of
+        the size limit; the caller holds the lock
+        """
+        self.evictions += self._conn.execute(
+            'DELETE FROM page WHERE created_at <= ?',
+            (now - self.ttl, )).rowcount
+        self._size = self._total_size()
+        excess = self._size - int(self.max_bytes * 0.9)
+        victims = []
+        for rowid, size in self._conn.execute(
+                'SELECT rowid, size FROM page ORDER BY accessed_at'):
+            if excess <= 0:
+                break
+            victims.append((rowid, ))
+            excess -= size
+            self._size -= size
+        self._conn.executemany('DELETE FROM page WHERE rowid = ?', victims)
+        self.evictions += len(victims)
+        LOGGER.info(f'{self.evictions} pages evicted from cache')
+
+    def stats(self) -> dict:
+        """hit / miss / eviction counters and stored size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'bytes': self._size,
+            }
+
+    def close(self):
+        """close the SQLite connection"""
+        with self._lock:
+            self._conn.close()
@@ -1,6 +1,17 @@
 """all commands"""
+import os
+from typing import List
+
 import click
 
+from .. import metrics
+from ..models.dao import ENGINES
+from ..models.dao import EXPORT_ENGINES
+from ..models.export import COMPRESSIONS
+from ..models.export import FORMAT_COMPRESSIONS
+from ..models.export import FORMATS
+from .pool import Credential
+from .saver import RANKINGS
 from .saver import Saver
 
 
@@ -8,26 +19,30 @@ from .saver import Saver
 @click.option(
     "--consumer-key",
     type=click.STRING,
-    help='consumer key',
+    help='consumer key, repeat to register more sets of keys',
     required=True,
+    multiple=True,
 )
 @click.option(
     "--consumer-secret",
     type=click.STRING,
-    help='consumer secret',
+    help='consumer secret, one per consumer key',
     required=True,
+    multiple=True,
 )
 @click.option(
     "--access-token",
     type=click.STRING,
-    help='access token',
+    help='access token, one per consumer key',
     required=True,
+    multiple=True,
 )
 @click.option(
     "--access-token-secret",
     type=click.STRING,
-    help='access token secret',
+    help='access token secret, one per consumer key',
     required=True,
+    multiple=True,
 )
 @click.option(
     "--project-path",
@@ -43,25 +58,47 @@ def update_params(
     project_path,
 ):
     """add seed"""
+    keys = (consumer_key, consumer_secret, access_token, access_token_secret)
+    if len(set(map(len, keys))) != 1:
+        raise click.BadParameter('every set of keys must be complete')
+    credentials = [Credential(*c) for c in zip(*keys)]
     return Saver.update_params(
-        consumer_key,
-        consumer_secret,
-        access_token,
-        access_token_secret,
+        *credentials[0],
         project_path,
+        credentials[1:],
     )
 
 
+def _read_seeds(path: str) -> List[str]:
+    """seeds of a file, one per line, skipping blank lines and comments"""
+    with open(path, encoding='utf8') as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith('#')]
+
+
 @click.command()
 @click.option(
     "--seed",
     '-s',
     type=click.STRING,
     multiple=True,
+    help='twitter user ID, or screen name, repeatable',
+)
+@click.option(
+    "--seed-file",
+    type=click.Path(exists=True, dir_okay=False),
+    help='file of seeds, one per line; blank lines and lines starting with '
+    '"#" are skipped',
 )
-def add_seed(seed):
+def add_seed(seed, seed_file):
     """add seed"""
-    return Saver().seeds(*seed)
+    seeds = list(seed)
+    if seed_file:
+        seeds.extend(_read_seeds(seed_file))
+    unresolved = Saver().seeds(*seeds)
+    for s in unresolved:
+        click.echo(f'unresolved seed: {s}', err=True)
+    return unresolved
 
 
 @click.command()
@@ -71,18 +108,153 @@ def reset():
 
 
 @click.command()
-def calculate():
+@click.option(
+    "--engine",
+    type=click.Choice(ENGINES),
+    default='sql',
+    help='scoring engine, "sparse" requires numpy and scipy, "duckdb" '
+    'requires duckdb',
+)
+@click.option(
+    "--ranking",
+    type=click.Choice(RANKINGS),
+    default='score',
+    help='"score" enlists the top-scored candidates each crawl round, "ppr" '
+    'every candidate ranked high by personalized PageRank at once, requires '
+    'numpy and scipy',
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    help='number of scoring processes of engine "parallel", default the '
+    'number of CPUs',
+)
+@click.option(
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=1,
+    help='number of accounts crawled at the same time',
+)
+@click.option(
+    "--budget",
+    type=click.IntRange(min=1),
+    help='maximum number of API requests of friends & followers pages and '
+    'user lookups in this run, pages served from the cache excluded, default '
+    'no limit; new wumaos are crawled by expected yield per page',
+)
+@click.option(
+    "--sample-pages",
+    type=click.IntRange(min=2),
+    help='crawl at most this many pages of each new wumao and enlist by '
+    'estimated score first, then crawl the enlisted wumaos completely; '
+    'requires engine "sql"',
+)
+@click.option(
+    "--ids/--no-ids",
+    default=False,
+    help='page friend & follower IDs, 5000 per request, and look up only '
+    'users not saved yet, 100 per request, instead of paging users',
+)
+@click.option(
+    "--cache/--no-cache",
+    default=False,
+    help='serve friends & followers pages already fetched from an on-disk '
+    'cache in the project folder',
+)
+@click.option(
+    "--cache-ttl",
+    type=click.FloatRange(min=0),
+    default=168,
+    help='hours a cached page stays valid',
+)
+@click.option(
+    "--cache-size",
+    type=click.IntRange(min=1),
+    default=1024,
+    help='maximum cache size in MiB',
+)
+@click.option(
+    "--metrics-interval",
+    type=click.FloatRange(min=1),
+    default=15,
+    help='seconds between metrics snapshots written to metrics.prom of the '
+    'project folder, refer to command "stats"',
+)
+def calculate(engine, ranking, workers, concurrency, budget, sample_pages, ids,
+              cache, cache_ttl, cache_size, metrics_interval):
     """calculate"""
-    return Saver().search()
+    saver = Saver()
+    if cache:
+        saver.enable_cache(cache_ttl * 3600, cache_size * 1024**2)
+    with metrics.TextfileExporter(saver.metrics_file(), metrics_interval):
+        return saver.search(engine, concurrency, workers, ranking, budget,
+                            sample_pages, ids)
 
 
 @click.command()
 @click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False),
+    help='metrics snapshot path, default metrics.prom of the project folder',
+)
+@click.option(
+    "--raw/--no-raw",
+    default=False,
+    help='print the snapshot in the Prometheus text format as is',
+)
+def stats(metrics_file, raw):
+    """print the latest metrics snapshot written by calculate"""
+    path = metrics_file or Saver.metrics_file()
+    if not os.path.exists(path):
+        raise click.ClickException(f'no metrics snapshot at {path}')
+    with open(path, encoding='utf8') as f:
+        text = f.read()
+    if raw:
+        click.echo(text, nl=False)
+        return
+    for line in metrics.summarize(text):
+        click.echo(line)
+
+
+@click.command()
+@click.option(
+    "--output",
     "--csv-path",
     type=click.STRING,
-    help='path of output csv file',
+    help='path of output account file, the friendship among the accounts is '
+    'written next to it with suffix "_edges"',
     required=True,
 )
-def export(csv_path):
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(FORMATS),
+    default='csv',
+    help='output format, "parquet" requires pyarrow',
+)
+@click.option(
+    "--compression",
+    type=click.Choice(COMPRESSIONS),
+    help='gzip, bz2 or xz for csv and jsonl; snappy (default), gzip, zstd, '
+    'brotli or lz4 for parquet',
+)
+@click.option(
+    "--engine",
+    type=click.Choice(EXPORT_ENGINES),
+    default='sql',
+    help='export engine, "duckdb" requires duckdb',
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=10000,
+    help='rows held in memory at a time, i.e. rows per parquet row group',
+)
+def export(output, fmt, compression, engine, batch_size):
     """export"""
-    return Saver().export(csv_path)
+    if compression is not None and compression not in FORMAT_COMPRESSIONS[fmt]:
+        raise click.BadParameter(
+            f'{compression} is not available for {fmt}, choose from '
+            f'{", ".join(FORMAT_COMPRESSIONS[fmt])}',
+            param_hint="'--compression'")
+    return Saver().export(output, fmt, compression, engine, batch_size)
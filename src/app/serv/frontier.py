@@ -0,0 +1,177 @@
+"""crawl frontier of new wumaos and API call budget"""
+import heapq
+import math
+import threading
+from typing import Iterable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from ..models.records import FrontierRecord
+
+__all__ = ['Budget', 'BudgetExhausted', 'Frontier', 'PageSample']
+
+
+class BudgetExhausted(Exception):
+    """raised instead of requesting a page when no API call remains"""
+
+
+class Budget:
+    """API calls allowed for one `Saver.search` run, shared by crawler
+    threads; a call is taken before its page is requested, pages served from
+    the page cache take none, and a request retried on rate limit or
+    connection errors counts once
+    """
+    __slots__ = ['limit', 'calls', '_lock']
+
+    def __init__(self, limit: Optional[int] = None):
+        """
+        :param limit: maximum number of calls, None for no limit
+        """
+        self.limit = limit
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        """no call remains"""
+        return self.limit is not None and self.calls >= self.limit
+
+    def take(self) -> bool:
+        """take one call
+
+        :return: False if no call remains
+        """
+        with self._lock:
+            if self.exhausted:
+                return False
+            self.calls += 1
+            return True
+
+    def spend(self, calls: int = 1):
+        """count calls made whether or not any remains, e.g. user lookups
+        of a page already fetched
+        """
+        with self._lock:
+            self.calls += calls
+
+    def refund(self, calls: int = 1):
+        """give back calls taken or spent for requests to be retried, e.g.
+        while every key exceeds the rate limit
+        """
+        with self._lock:
+            self.calls -= calls
+
+
+class Frontier:
+    """new wumaos ordered by expected yield per API call
+
+    the yield of an account grows with its wumao weight and with the number
+    of known wumaos among its saved friends & followers, i.e. accounts of a
+    dense wumao cluster first; the cost is the number of pages of its friends
+    and followers, so that giant accounts wait
+    """
+    __slots__ = ['page_count', '_heap']
+
+    def __init__(self, page_count: int,
+                 records: Iterable[FrontierRecord] = ()):
+        """
+        :param page_count: users per page of the paged API
+        :param records: candidates, refer to `Dao.frontier_candidates`
+        """
+        self.page_count = page_count
+        self._heap: List[Tuple[float, int]] = []
+        self.extend(records)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def cost(self, record: FrontierRecord) -> int:
+        """expected API calls to save all friends & followers, at least one
+        page of each
+        """
+        pages = 0
+        for count in (record.friend_count, record.follower_count):
+            pages += max(math.ceil((count or 0) / self.page_count), 1)
+        return pages
+
+    def priority(self, record: FrontierRecord) -> float:
+        """expected yield per API call"""
+        weight = 1.0 if record.weight is None else record.weight
+        return weight * (1 + record.overlap) / self.cost(record)
+
+    def extend(self, records: Iterable[FrontierRecord]):
+        """add candidates"""
+        for r in records:
+            # ties broken by tweeter ID for a reproducible order
+            heapq.heappush(self._heap, (-self.priority(r), r.tweeter_id))
+
+    def pop(self) -> Optional[int]:
+        """'tweeter' ID of the highest priority, None if empty"""
+        if not self._heap:
+            return None
+        return heapq.heappop(self._heap)[1]
+
+
+class PageSample:
+    """pages of one account crawled with a page cap
+
+    the cap is split between friends and followers in proportion to their
+    number of pages, at least one page each; cursors are opaque, so the pages
+    sampled are the head of each cursor chain, i.e. the latest friends and
+    followers; lists are indexed 0 for friends and 1 for followers
+    """
+    __slots__ = ['counts', 'caps', 'pages', 'seen', 'truncated']
+
+    def __init__(self, pages: int, friend_count: Optional[int],
+                 follower_count: Optional[int], page_count: int):
+        """
+        :param pages: maximum number of pages of the account, at least 2
+        :param friend_count: number of friends reported by twitter
+        :param follower_count: number of followers reported by twitter
+        :param page_count: users per page of the paged API
+        """
+        if pages < 2:
+            raise ValueError('at least one page of friends and of followers')
+        self.counts = (friend_count or 0, follower_count or 0)
+        caps = [max(math.ceil(c / page_count), 1) for c in self.counts]
+        if sum(caps) > pages:
+            friend_pages = round(pages * caps[0] / sum(caps))
+            friend_pages = min(max(friend_pages, 1), pages - 1)
+            caps = [friend_pages, pages - friend_pages]
+        self.caps: Tuple[int, int] = (caps[0], caps[1])
+        self.pages = [0, 0]
+        self.seen = [0, 0]
+        self.truncated = [False, False]
+
+    def cut(self, followers: bool, next_cursor: int, users: int) -> int:
+        """count a fetched page
+
+        :param followers: whether the page is of followers or of friends
+        :param next_cursor: next cursor returned along with the page
+        :param users: number of users of the page
+        :return: the next cursor, 0 once the cap of its list is reached
+        """
+        i = int(followers)
+        self.pages[i] += 1
+        self.seen[i] += users
+        if next_cursor != 0 and self.pages[i] >= self.caps[i]:
+            self.truncated[i] = True
+            return 0
+        return next_cursor
+
+    def fractions(self) -> Optional[Tuple[float, float]]:
+        """fractions of friends and of followers seen, None if both lists
+        are complete
+        """
+        if not any(self.truncated):
+            return None
+        res = []
+        for i in (0, 1):
+            if not self.truncated[i]:
+                res.append(1.0)
+                continue
+            # the count saved along with the account may be outdated
+            seen = max(self.seen[i], 1)
+            res.append(seen / max(self.counts[i], seen))
+        return res[0], res[1]
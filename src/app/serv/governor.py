@@ -0,0 +1,111 @@
+"""rate limit governor and connection error backoff"""
+import random
+import threading
+import time
+from typing import Callable
+from typing import Dict
+from typing import List
+
+__all__ = ['Backoff', 'RateGovernor']
+
+
+class RateGovernor:
+    """per-endpoint rate limit windows of one API key
+
+    windows are fed by the `x-rate-limit-*` response headers, and a call is
+    reserved before it is sent, so that concurrent requests never exceed the
+    remaining calls of a window; endpoints never reported are not limited
+    """
+    __slots__ = ['_windows', '_clock', '_lock']
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        # endpoint -> [limit, remaining, reset epoch seconds]
+        self._windows: Dict[str, List[float]] = {}
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def _window(self, endpoint: str) -> List[float]:
+        window = self._windows.get(endpoint)
+        if window is not None and window[2] <= self._clock():
+            # the window has been reset
+            window[1] = window[0]
+        return window
+
+    def wait_time(self, endpoint: str) -> float:
+        """seconds to wait before the endpoint can be called
+
+        :param endpoint: rate limit resource, e.g. '/followers/list'
+        :return: 0 if a call remains in the current window, else the seconds
+        until the window resets
+        """
+        with self._lock:
+            window = self._window(endpoint)
+            if window is None or window[1] > 0:
+                return 0
+            return window[2] - self._clock()
+
+    def reserve(self, endpoint: str) -> bool:
+        """take one call of the current window
+
+        :param endpoint: rate limit resource
+        :return: False if no call remains
+        """
+        with self._lock:
+            window = self._window(endpoint)
+            if window is None:
+                return True
+            if window[1] <= 0:
+                return False
+            window[1] -= 1
+            return True
+
+    def record(self, endpoint: str, limit: int, remaining: int, reset: float):
+        """update a window by the rate limit headers of a response
+
+        :param endpoint: rate limit resource
+        :param limit: `x-rate-limit-limit`
+        :param remaining: `x-rate-limit-remaining`
+        :param reset: `x-rate-limit-reset`, epoch seconds
+        """
+        if not reset:
+            # no header reported
+            return
+        with self._lock:
+            window = self._windows.get(endpoint)
+            if window is None or reset > window[2]:
+                self._windows[endpoint] = [limit, remaining, reset]
+            else:
+                # calls still in flight are not counted by the headers yet
+                window[1] = min(window[1], remaining)
+
+    def reset_at(self, endpoint: str) -> float:
+        """reset time of the endpoint window, 0 if unknown"""
+        with self._lock:
+            window = self._windows.get(endpoint)
+            return 0 if window is None else window[2]
+
+
+class Backoff:
+    """capped exponential backoff with full jitter"""
+    __slots__ = ['base', 'cap', '_random']
+
+    def __init__(self,
+                 base: float = 5,
+                 cap: float = 300,
+                 rand: Callable[[], float] = random.random):
+        """
+        :param base: delay ceiling of the first retry in seconds
+        :param cap: maximum delay in seconds
+        :param rand: random number generator in [0, 1)
+        """
+        self.base = base
+        self.cap = cap
+        self._random = rand
+
+    def delay(self, attempt: int) -> float:
+        """seconds to wait before a retry
+
+        :param attempt: number of failed attempts so far, from 0
+        :return: random delay between 0 and min(cap, base * 2 ** attempt)
+        """
+        return self._random() * min(self.cap, self.base * 2**attempt)
@@ -0,0 +1,157 @@
+"""twitter API credential pool"""
+import logging
+import threading
+import time
+from typing import Callable
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+
+import twitter
+
+from .. import metrics
+from .governor import RateGovernor
+
+LOGGER = logging.getLogger(__name__)
+
+__all__ = ['Credential', 'PoolExhausted', 'TokenPool', 'is_rate_limited']
+
+
+def is_rate_limited(e: twitter.error.TwitterError) -> bool:
+    """check if a twitter error is caused by exceeding rate limit"""
+    return e.message == [{'message': 'Rate limit exceeded', 'code': 88}]
+
+
+class Credential(NamedTuple):
+    """a set of twitter application keys"""
+    consumer_key: str
+    consumer_secret: str
+    access_token: str
+    access_token_secret: str
+
+
+class PoolExhausted(twitter.error.TwitterError):
+    """rate limit of an endpoint is exceeded by every key of the pool"""
+
+    def __init__(self, endpoint: str, reset_at: float):
+        super().__init__(f'rate limit of {endpoint} exceeded by all keys')
+        self.endpoint = endpoint
+        self.reset_at = reset_at
+
+
+class _Key:
+    """a `twitter.Api` instance and its usage"""
+    __slots__ = ['api', 'name', 'calls', 'governor']
+
+    def __init__(self, credential: Credential, clock: Callable[[], float]):
+        self.api = twitter.Api(
+            consumer_key=credential.consumer_key,
+            consumer_secret=credential.consumer_secret,
+            access_token_key=credential.access_token,
+            access_token_secret=credential.access_token_secret,
+        )
+        # never log secrets
+        self.name = credential.access_token.split('-')[0] or 'anonymous'
+        self.calls: Dict[str, int] = {}
+        self.governor = RateGovernor(clock)
+
+
+class TokenPool:
+    """pool of twitter API keys
+
+    requests stick to the current key until it has no call left in the rate
+    limit window of an endpoint, as reported by the response headers, then
+    rotate to the key whose window of the endpoint resets first;
+    `PoolExhausted` is raised only if no key can call the endpoint
+    """
+    __slots__ = ['_keys', '_current', '_lock', '_clock']
+
+    # rate limit window length, used if twitter does not report a reset time
+    WINDOW = 15 * 60
+
+    def __init__(self,
+                 credentials: Iterable[Credential],
+                 clock: Callable[[], float] = time.time):
+        self._keys = [_Key(c, clock) for c in credentials]
+        if not self._keys:
+            raise ValueError('at least one credential is required')
+        self._current = 0
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def api(self) -> twitter.Api:
+        """`twitter.Api` instance of the current key"""
+        return self._keys[self._current].api
+
+    def _acquire(self, endpoint: str) -> _Key:
+        with self._lock:
+            key = self._keys[self._current]
+            if not key.governor.reserve(endpoint):
+                self._current = min(
+                    range(len(self._keys)),
+                    key=lambda i: self._keys[i].governor.wait_time(endpoint))
+                key = self._keys[self._current]
+                if not key.governor.reserve(endpoint):
+                    raise PoolExhausted(
+                        endpoint,
+                        self._clock() + key.governor.wait_time(endpoint))
+                LOGGER.info(f'rotate to key {key.name} for {endpoint}')
+            key.calls[endpoint] = key.calls.get(endpoint, 0) + 1
+            return key
+
+    def _record(self, key: _Key, endpoint: str, exhausted: bool = False):
+        """feed the rate limit headers of the last response to the governor
+
+        :param key: key of the last request
+        :param endpoint: rate limit resource
+        :param exhausted: whether the request failed for exceeding rate limit
+        """
+        limit = key.api.rate_limit.get_limit(endpoint)
+        if not exhausted:
+            key.governor.record(endpoint, *limit)
+            return
+        now = self._clock()
+        reset = limit.reset if limit.reset > now else now + self.WINDOW
+        key.governor.record(endpoint, limit.limit, 0, reset)
+
+    def execute(self, endpoint: str, method: str, **kwargs):
+        """call a `twitter.Api` method, rotating keys on rate limit
+
+        :param endpoint: rate limit resource of the method, e.g.
+        '/followers/list'
+        :param method: name of the `twitter.Api` method
+        :param kwargs: keyword arguments of the method
+        :return: result of the method
+        """
+        while True:
+            key = self._acquire(endpoint)
+            metrics.API_CALLS.inc(endpoint=endpoint)
+            try:
+                with metrics.API_CALL_SECONDS.time(endpoint=endpoint):
+                    res = getattr(key.api, method)(**kwargs)
+            except twitter.error.TwitterError as e:
+                if not is_rate_limited(e):
+                    raise e
+                LOGGER.info(f'key {key.name} exceeds rate limit of {endpoint}')
+                metrics.API_RATE_LIMITED.inc(endpoint=endpoint)
+                self._record(key, endpoint, exhausted=True)
+            else:
+                self._record(key, endpoint)
+                return res
+
+    def stats(self) -> List[dict]:
+        """per-key call counters
+
+        :return: list of dict of key name, total calls and calls per endpoint
+        """
+        with self._lock:
+            return [{
+                'key': key.name,
+                'calls': sum(key.calls.values()),
+                'endpoints': dict(key.calls),
+            } for key in self._keys]
@@ -1,69 +1,108 @@
 """record saver"""
+import importlib.util
 import logging
 import math
 import os
+import queue
 import shutil
+import threading
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
 from datetime import date
 from datetime import datetime
 from functools import wraps
+from itertools import chain
 from time import sleep
+from time import time
+from typing import Dict
+from typing import Iterable
+from typing import List
 from typing import NoReturn
 from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
 
 import requests
-import twitter.error
 from twitter.models import User
 
+from .. import cfg
+from .. import metrics
 from ..models.dao import Dao
 from ..singleton import SingletonMeta
+from .cache import PageCache
+from .frontier import Budget
+from .frontier import BudgetExhausted
+from .frontier import Frontier
+from .frontier import PageSample
+from .governor import Backoff
+from .pool import Credential
+from .pool import PoolExhausted
 from .tweet import Tweet
 
 LOGGER = logging.getLogger(__name__)
 
-__all__ = ['Saver']
+__all__ = ['RANKINGS', 'Saver']
+
+# admission policies of `Saver.search`
+RANKINGS = ('score', 'ppr')
+
+_BACKOFF = Backoff()
 
 
 def _sleep(fn):
 
     @wraps(fn)
     def helper(*args, **kwargs):
+        attempt = 0
         while True:
             try:
-                res = fn(*args, **kwargs)
-                break
-            except (twitter.error.TwitterError,
-                    requests.exceptions.ConnectionError) as e:
-                if isinstance(e, requests.exceptions.ConnectionError):
-                    # sleep 5 min if connection reset by peer
-                    LOGGER.info("connection error, sleep...")
-                    sleep(300)
-                elif e.message == [{
-                        'message': 'Rate limit exceeded',
-                        'code': 88
-                }]:
-                    # sleep 6 min if exceeds limit
-                    LOGGER.info("exceeds rate limit, sleep...")
-                    sleep(360)
-                else:
-                    # else raise error
-                    raise e
-        return res
+                return fn(*args, **kwargs)
+            except requests.exceptions.ConnectionError:
+                # capped exponential backoff if connection reset by peer
+                delay = _BACKOFF.delay(attempt)
+                attempt += 1
+                LOGGER.info(f"connection error, sleep {delay:.0f}s...")
+                metrics.SLEEP_SECONDS.inc(delay, reason='connection_error')
+                sleep(delay)
+            except PoolExhausted as e:
+                # sleep until the earliest reset if all keys exceed limit
+                delay = max(e.reset_at - time(), 0)
+                LOGGER.info(
+                    f"all keys exceed rate limit, sleep {delay:.0f}s...")
+                metrics.SLEEP_SECONDS.inc(delay, reason='rate_limit')
+                sleep(delay)
 
     return helper
 
 
 class Saver(metaclass=SingletonMeta):
     """dao / tweet wrapper to save records"""
-    __slots__ = ['dao', 'tweet']
+    __slots__ = ['dao', 'tweet', '_rejected', '_accepted', '_lookup_lock']
 
     PAGE_COUNT = 200
+    # user IDs per page of the paged IDs API, refer to `Saver.add_friendship`
+    ID_PAGE_COUNT = 5000
+    # users per request of the users lookup API
+    LOOKUP_COUNT = 100
+    # pages fetched ahead of the one being saved
+    PREFETCH = 2
+    # pages of an account saved per DB commit
+    PAGES_PER_COMMIT = 10
+    # ranking 'ppr', refer to `SparseGraph.rank_candidates`
+    PPR_RATIO = 0.9
+    PPR_ALPHA = 0.85
     CONSUMER_KEY = ''
     CONSUMER_SECRET = ''
     ACCESS_TOKEN = ''
     ACCESS_TOKEN_SECRET = ''
+    EXTRA_CREDENTIALS: List[Credential] = []
     PROJECT_DIR = ''
     _APP_DB = 'app.db'
     _BAK_DB = 'app.db.bak'
+    _CACHE_DB = 'cache.db'
+    _METRICS_FILE = 'metrics.prom'
 
     def __init__(self):
         self.dao = Dao(self.app_db())
@@ -72,7 +111,14 @@ class Saver(metaclass=SingletonMeta):
             self.CONSUMER_SECRET,
             self.ACCESS_TOKEN,
             self.ACCESS_TOKEN_SECRET,
+            self.EXTRA_CREDENTIALS,
         )
+        # user IDs looked up but not potential wumaos, never looked up again
+        self._rejected: Set[int] = set()
+        # potential wumaos looked up by user ID, until their page is committed
+        self._accepted: Dict[int, User] = {}
+        # both shared by the crawler threads hydrating pages of user IDs
+        self._lookup_lock = threading.Lock()
 
     @classmethod
     def app_db(cls):
@@ -84,20 +130,36 @@ class Saver(metaclass=SingletonMeta):
         """backup database path"""
         return os.path.join(cls.PROJECT_DIR, cls._BAK_DB)
 
+    @classmethod
+    def cache_db(cls):
+        """API response cache database path"""
+        return os.path.join(cls.PROJECT_DIR, cls._CACHE_DB)
+
+    @classmethod
+    def metrics_file(cls):
+        """metrics snapshot path, refer to `metrics.TextfileExporter`"""
+        return os.path.join(cls.PROJECT_DIR, cls._METRICS_FILE)
+
     @classmethod
     def update_params(
-        cls,
-        consumer_key: str,
-        consumer_secret: str,
-        access_token: str,
-        access_token_secret: str,
-        project_path: str,
+            cls,
+            consumer_key: str,
+            consumer_secret: str,
+            access_token: str,
+            access_token_secret: str,
+            project_path: str,
+            extra_credentials: Iterable[Credential] = (),
     ) -> NoReturn:
-        """update token and secret"""
+        """update token and secret
+
+        :param extra_credentials: more sets of keys, rotated to when the rate
+        limit is exceeded
+        """
         cls.CONSUMER_KEY = consumer_key
         cls.CONSUMER_SECRET = consumer_secret
         cls.ACCESS_TOKEN = access_token
         cls.ACCESS_TOKEN_SECRET = access_token_secret
+        cls.EXTRA_CREDENTIALS = list(extra_credentials)
         cls.PROJECT_DIR = project_path
 
     def reset(self):
@@ -105,15 +167,88 @@ class Saver(metaclass=SingletonMeta):
         shutil.rmtree(self.app_db(), ignore_errors=True)
         self.dao.reset_db()
 
-    def seeds(self, *args: int):
-        """add seeds"""
-        seed_users = [self.tweet.get_user(i) for i in args]
-        tweeter_ids = self.dao.bulk_save_tweeter(seed_users)
-        self.dao.bulk_save_wumao(list(tweeter_ids), new=True)
+    def enable_cache(self, ttl: float, max_bytes: int) -> NoReturn:
+        """serve friends & followers pages from an on-disk cache, kept even
+        if the DB is reset
 
-    def export(self, csv_path: str):
-        """export to csv"""
-        self.dao.wumao_to_csv(csv_path)
+        :param ttl: seconds a cached page stays valid
+        :param max_bytes: maximum size of the cache
+        """
+        self.tweet.cache = PageCache(self.cache_db(), ttl, max_bytes)
+
+    def resolve_seeds(self,
+                      seeds: Iterable[str]) -> Tuple[List[User], List[str]]:
+        """look up seeds `Saver.LOOKUP_COUNT` at a time
+
+        :param seeds: twitter user IDs, or screen names optionally prefixed
+        by '@'; a numeric seed is taken as a user ID
+        :return: tuple of twitter users, seeds not resolved, e.g. of
+        suspended or deleted accounts
+        """
+        # lookup key -> seed as provided
+        user_ids, screen_names = {}, {}
+        for seed in dict.fromkeys(s.strip() for s in seeds):
+            if seed.isdigit():
+                user_ids[int(seed)] = seed
+            elif seed.lstrip('@'):
+                screen_names[seed.lstrip('@').lower()] = seed
+        found = []
+        keys = list(user_ids)
+        for i in range(0, len(keys), self.LOOKUP_COUNT):
+            found.extend(
+                self._lookup_users(user_ids=keys[i:i + self.LOOKUP_COUNT]))
+        keys = list(screen_names)
+        for i in range(0, len(keys), self.LOOKUP_COUNT):
+            found.extend(
+                self._lookup_users(screen_names=keys[i:i + self.LOOKUP_COUNT]))
+        users, resolved = {}, set()
+        for user in found:
+            users[user.id] = user
+            resolved.add(user_ids.get(user.id))
+            resolved.add(screen_names.get(user.screen_name.lower()))
+        unresolved = [
+            s for s in chain(user_ids.values(), screen_names.values())
+            if s not in resolved
+        ]
+        return list(users.values()), unresolved
+
+    def seeds(self, *args: str) -> List[str]:
+        """add seeds as new wumaos, in one transaction
+
+        :param args: twitter user IDs or screen names, refer to
+        `Saver.resolve_seeds`
+        :return: seeds not resolved
+        """
+        users, unresolved = self.resolve_seeds(args)
+        with self.dao.transaction():
+            tweeter_ids = self.dao.bulk_save_tweeter(users, return_all=True)
+            self.dao.bulk_save_wumao(list(tweeter_ids), new=True)
+        LOGGER.info(f'{len(users)} seeds added')
+        if unresolved:
+            LOGGER.warning(f'{len(unresolved)} seeds not resolved: '
+                           f'{", ".join(unresolved)}')
+        return unresolved
+
+    def export(self,
+               path: str,
+               fmt: str = 'csv',
+               compression: Optional[str] = None,
+               engine: str = 'sql',
+               batch: int = 10000):
+        """export wumao accounts and the friendship among them
+
+        :param path: path of the account table, refer to `Dao.export_wumao`
+        :param fmt: 'csv', 'jsonl' or 'parquet'
+        :param compression: refer to `export.write_table`
+        :param engine: export engine, refer to `Dao.export_wumao`
+        :param batch: number of rows per batch
+        """
+        accounts, edges = self.dao.export_wumao(path,
+                                                fmt,
+                                                compression,
+                                                engine=engine,
+                                                batch=batch)
+        LOGGER.info(f'{accounts} wumao accounts and {edges} edges exported')
 
     @staticmethod
     def _is_potential_wumao(user: User) -> bool:
@@ -141,124 +276,515 @@ class Saver(metaclass=SingletonMeta):
         return True
 
     @staticmethod
-    def _next_func_name(fn_name: str = None) -> Optional[str]:
+    def _next_func_name(fn_name: str = None,
+                        ids: bool = False) -> Optional[str]:
         """get the next function name
 
         :param fn_name:
+        :param ids: whether the first function pages user IDs
         :return:
         """
         if not fn_name:
-            return 'get_following_paged'
+            return 'get_following_ids_paged' if ids else 'get_following_paged'
         if fn_name == 'get_following_paged':
             return 'get_followers_paged'
-        if fn_name == 'get_followers_paged':
+        if fn_name == 'get_following_ids_paged':
+            return 'get_followers_ids_paged'
+        if fn_name in ('get_followers_paged', 'get_followers_ids_paged'):
             return None
         raise ValueError('invalid function name')
 
-    def _search_params(self, tweeter_id):
+    @staticmethod
+    def _is_followers(func_name: str) -> bool:
+        """whether a paged function fetches followers, or friends"""
+        return func_name.startswith('get_followers')
+
+    @staticmethod
+    def _is_ids(func_name: str) -> bool:
+        """whether a paged function fetches user IDs, or twitter users"""
+        return func_name.endswith('_ids_paged')
+
+    def _search_params(self, tweeter_id, ids: bool = False):
         """return parameters for twitter friends & followers searching
 
         :param tweeter_id: 'tweeter' primary key
-        :return: tuple of user_id, cursor, paged function, is followers flag
+        :param ids: whether to page user IDs if the search is not tracked
+        :return: tuple of user_id, cursor, paged function name
         """
-
-        def _is_follower(fn_name: str):
-            """check if the function returns a follower list
-
-            :param fn_name: twitter paged function name
-            :return:
-            """
-            if fn_name == 'get_followers_paged':
-                return True
-            return False
-
         # raise exception if ID not exist
         self.dao.constrain_tweeter_exist(tweeter_id)
-        user_id = self.dao.lookup_tweeter(tweeter_id).user_id
-        last_search = self.dao.lookup_track(tweeter_id)
+        user_id = self.dao.lookup_user_id(tweeter_id)
+        last_search = self.dao.track_cursor(tweeter_id)
         if not last_search:
-            cursor = -1
-            func_name = self._next_func_name()
-        else:
-            cursor = last_search.cursor
-            func_name = last_search.method
-        is_followers = _is_follower(func_name)
-        return user_id, cursor, getattr(Tweet, func_name), is_followers
+            return user_id, -1, self._next_func_name(ids=ids)
+        method, cursor = last_search
+        return user_id, cursor, method
+
+    @classmethod
+    def _next_params(cls, func_name: str,
+                     next_cursor: int) -> Optional[Tuple[str, int]]:
+        """get the paged function name and cursor of the next page
 
-    def _save_db(self, tweeter_id: int, seq: list, followers: bool):
+        :param func_name: twitter paged function name of the current page
+        :param next_cursor: next cursor returned along with the current page
+        :return: tuple of function name, cursor; None if it is the last page
+        """
+        # search with the same function but next cursor
+        if next_cursor != 0:
+            return func_name, next_cursor
+        # search with next paged function
+        next_func_name = cls._next_func_name(func_name)
+        if next_func_name is None:
+            return None
+        return next_func_name, -1
+
+    @_sleep
+    def _lookup_users(self,
+                      user_ids: Sequence[int] = (),
+                      screen_names: Sequence[str] = (),
+                      budget: Optional[Budget] = None) -> List[User]:
+        """look up one batch of users, refer to `Tweet.lookup_users`"""
+        return self.tweet.lookup_users(user_ids, screen_names, budget)
+
+    def _hydrate(self, user_ids: List[int],
+                 budget: Optional[Budget]) -> Tuple[List[int], List[User]]:
+        """split a page of user IDs into saved users and the others, looked
+        up `Saver.LOOKUP_COUNT` at a time unless looked up before; no DB
+        writes, so that it runs in the fetching thread
+
+        :param user_ids: twitter user IDs
+        :param budget: API calls left, one spent per lookup, even if none is
+        left, so that a fetched page is saved whole
+        :return: tuple of 'tweeter' primary keys of saved users, list of
+        twitter users looked up
+        """
+        known = self.dao.read_tweeter_ids(user_ids)
+        with self._lookup_lock:
+            for i in known:
+                self._accepted.pop(i, None)
+            # looked up for a page not committed yet
+            users = [
+                self._accepted[i] for i in user_ids if i in self._accepted
+            ]
+            unknown = [
+                i for i in user_ids if i not in known
+                and i not in self._rejected and i not in self._accepted
+            ]
+        for i in range(0, len(unknown), self.LOOKUP_COUNT):
+            batch = unknown[i:i + self.LOOKUP_COUNT]
+            found = self._lookup_users(batch, budget=budget)
+            users.extend(found)
+            with self._lookup_lock:
+                # suspended or deleted ones are missing
+                self._rejected.update(set(batch) - {u.id for u in found})
+                for u in found:
+                    if self._is_potential_wumao(u):
+                        self._accepted[u.id] = u
+                    else:
+                        self._rejected.add(u.id)
+        LOGGER.info(f"#Saved: {len(known)}, #Looked up: {len(unknown)}")
+        return list(known.values()), users
+
+    def _release(self, pages: Iterable[list]) -> NoReturn:
+        """drop the users of committed pages from `Saver._accepted`, as they
+        are read from the DB from then on
+
+        :param pages: lists of twitter users
+        """
+        with self._lookup_lock:
+            for seq in pages:
+                for u in seq:
+                    self._accepted.pop(u.id, None)
+
+    def _save_db(self,
+                 tweeter_id: int,
+                 seq: list,
+                 followers: bool,
+                 known: Iterable[int] = ()):
+        """
+        :param known: 'tweeter' primary keys of saved users not in `seq`
+        """
         wumaos = [u for u in seq if self._is_potential_wumao(u)]
+        metrics.USERS_FILTERED.inc(len(wumaos), result='potential')
+        metrics.USERS_FILTERED.inc(len(seq) - len(wumaos), result='rejected')
         # save to 'tweeter'
         wumao_tweeter_ids = self.dao.bulk_save_tweeter(wumaos, return_all=True)
         LOGGER.info(f"#Wumao: {len(wumaos)}")
+        wumao_tweeter_ids = set(wumao_tweeter_ids).union(known)
         # save to friendship
         if followers:
-            self.dao.bulk_attract(tweeter_id, wumao_tweeter_ids)
+            new_edges = self.dao.bulk_attract(tweeter_id, wumao_tweeter_ids)
         else:
-            self.dao.bulk_follow(tweeter_id, wumao_tweeter_ids)
+            new_edges = self.dao.bulk_follow(tweeter_id, wumao_tweeter_ids)
+        LOGGER.info(f"#New friendship: {new_edges}")
 
     @_sleep
-    def _add_friendship(self, tweeter_id: int):
-        """add friends & followers of a twitter account in 'tweeter' table
-
-        :param tweeter_id:
-        :return:
+    def _fetch_page(self,
+                    user_id: int,
+                    cursor: int,
+                    func_name: str,
+                    budget: Optional[Budget] = None) -> Tuple[int, list]:
+        """fetch one page of friends or followers, no DB access so that it
+        can run in a worker thread
+
+        :param user_id: twitter user ID
+        :param cursor: paged search cursor
+        :param func_name: twitter paged function name
+        :param budget: API calls left, one taken unless the page is cached,
+        refer to `Tweet._paged`
+        :return: tuple of next cursor, list of twitter users or user IDs
         """
-        user_id, cursor, paged_method, is_followers = self._search_params(
-            tweeter_id)
-        LOGGER.info(
-            f"start saving {paged_method.__name__} from cursor {cursor}")
-        next_cursor, _, seq = paged_method(
-            self.tweet,
+        LOGGER.info(f"start fetching {func_name} from cursor {cursor}")
+        next_cursor, _, seq = getattr(self.tweet, func_name)(
             user_id=user_id,
             cursor=cursor,
-            count=self.PAGE_COUNT,
+            count=self.ID_PAGE_COUNT
+            if self._is_ids(func_name) else self.PAGE_COUNT,
+            budget=budget,
         )
+        metrics.PAGES_FETCHED.inc(function=func_name)
+        return next_cursor, seq
+
+    def _fetch_users(
+            self,
+            user_id: int,
+            cursor: int,
+            func_name: str,
+            budget: Optional[Budget] = None,
+            sample: Optional[PageSample] = None
+    ) -> Tuple[int, list, List[int]]:
+        """fetch one page of friends or followers, cut by the page cap, and
+        hydrate it if it is of user IDs; no DB writes, so that it can run in
+        a worker thread
+
+        :param user_id: twitter user ID
+        :param cursor: paged search cursor
+        :param func_name: twitter paged function name
+        :param budget: API calls left
+        :param sample: page cap of the account, default no cap
+        :return: tuple of next cursor, list of twitter users, 'tweeter'
+        primary keys of saved users of a page of user IDs
+        """
+        next_cursor, seq = self._fetch_page(user_id, cursor, func_name, budget)
+        if sample is not None:
+            next_cursor = sample.cut(self._is_followers(func_name),
+                                     next_cursor, len(seq))
+        known = []
+        if self._is_ids(func_name):
+            known, seq = self._hydrate(seq, budget)
+        return next_cursor, seq, known
+
+    def _ingest_page(self,
+                     tweeter_id: int,
+                     func_name: str,
+                     next_cursor: int,
+                     seq: list,
+                     known: Iterable[int] = ()) -> bool:
+        """save a fetched page, and move the 'track' cursor forward
 
-        self._save_db(tweeter_id, seq, is_followers)
+        :param tweeter_id: 'tweeter' primary key
+        :param func_name: twitter paged function name the page is fetched by
+        :param next_cursor: next cursor returned along with the page
+        :param seq: list of twitter users
+        :param known: 'tweeter' primary keys of saved users of a page of user
+        IDs, refer to `Saver._fetch_users`
+        :return: True if all friends & followers of the account are saved
+        """
+        self._save_db(tweeter_id, seq, self._is_followers(func_name), known)
 
         # all finished for one wumao account
         #   1. set is_new = 0 in table 'wumao'
         #   2. delete record in 'track'
-        if next_cursor == 0 and self._next_func_name(
-                paged_method.__name__) is None:
+        if next_cursor == 0 and self._next_func_name(func_name) is None:
             self.dao.upsert_wumao(tweeter_id, False)
             self.dao.delete_track(tweeter_id)
-            LOGGER.info("friendship saving for {tweeter_id} completed")
-        # search with next paged function
-        if next_cursor == 0:
-            next_func_name = self._next_func_name(paged_method.__name__)
-            real_next_cursor = -1
-        # search with the same function but next cursor
-        else:
-            next_func_name = paged_method.__name__
-            real_next_cursor = next_cursor
-
+            LOGGER.info(f"friendship saving for {tweeter_id} completed")
+            return True
+        next_func_name, real_next_cursor = self._next_params(
+            func_name, next_cursor)
         self.dao.upsert_track(tweeter_id, next_func_name, real_next_cursor)
-        return self._add_friendship(tweeter_id)
+        return False
+
+    def _prefetch(self,
+                  user_id: int,
+                  cursor: int,
+                  func_name: str,
+                  pages: queue.Queue,
+                  stop: threading.Event,
+                  budget: Budget,
+                  sample: Optional[PageSample] = None) -> NoReturn:
+        """fetch pages of an account one after another into a bounded queue,
+        blocking while it is full, until the API call budget is exhausted;
+        no DB access
+
+        :param user_id: twitter user ID
+        :param cursor: paged search cursor of the first page
+        :param func_name: twitter paged function name of the first page
+        :param pages: queue of (function name, next cursor, list of twitter
+        users, list of saved 'tweeter' primary keys), None once the budget is
+        exhausted, or the exception that stops fetching
+        :param stop: set by the consumer to stop fetching
+        :param budget: API calls left, one taken per page requested
+        :param sample: page cap of the account, default no cap
+        :return:
+        """
+
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
 
-    def add_friendship(self) -> NoReturn:
-        """add friendship"""
+        params = func_name, cursor
+        try:
+            while params is not None:
+                func_name, cursor = params
+                next_cursor, seq, known = self._fetch_users(
+                    user_id, cursor, func_name, budget, sample)
+                if not put((func_name, next_cursor, seq, known)):
+                    return
+                params = self._next_params(func_name, next_cursor)
+        except BudgetExhausted:
+            put(None)
+        except Exception as e:  # pylint: disable=broad-except
+            put(e)
+
+    def _record_sample(self, tweeter_id: int,
+                       sample: Optional[PageSample]) -> NoReturn:
+        """save the fractions seen of an account crawled with a page cap"""
+        fractions = None if sample is None else sample.fractions()
+        if fractions is not None:
+            self.dao.upsert_sample(tweeter_id, *fractions)
+
+    def _page_sample(self, tweeter_id: int, sample_pages: Optional[int],
+                     ids: bool) -> Optional[PageSample]:
+        """page cap of an account, refer to `PageSample`"""
+        if sample_pages is None:
+            return None
+        tweeter = self.dao.lookup_tweeter(tweeter_id)
+        return PageSample(sample_pages, tweeter.friend_count,
+                          tweeter.follower_count,
+                          self.ID_PAGE_COUNT if ids else self.PAGE_COUNT)
+
+    def _add_friendship(self,
+                        tweeter_id: int,
+                        budget: Budget,
+                        sample: Optional[PageSample] = None,
+                        ids: bool = False) -> bool:
+        """add friends & followers of a twitter account in 'tweeter' table;
+        a worker thread fetches the next pages while this thread saves the
+        current one, so the 'track' cursor only moves past saved pages;
+        pages already fetched are saved in one transaction, at most
+        `Saver.PAGES_PER_COMMIT` of them, along with the 'track' cursor after
+        them
+
+        :param tweeter_id:
+        :param budget: API calls left
+        :param sample: page cap of the account, default no cap
+        :param ids: whether to page user IDs, unless resumed from a track
+        :return: False if the budget is exhausted before the last page
+        """
+        user_id, cursor, func_name = self._search_params(tweeter_id, ids)
+        pages = queue.Queue(maxsize=self.PREFETCH)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._prefetch,
+                                    args=(user_id, cursor, func_name, pages,
+                                          stop, budget, sample),
+                                    name=f'prefetch-{tweeter_id}',
+                                    daemon=True)
+        producer.start()
+        try:
+            done, error = False, None
+            while not (done or error):
+                # wait for the producer outside any transaction, so that the
+                # write lock is not held while it waits on the network
+                page = pages.get()
+                saved = []
+                try:
+                    with self.dao.transaction():
+                        for i in range(self.PAGES_PER_COMMIT):
+                            if i:
+                                try:
+                                    page = pages.get_nowait()
+                                except queue.Empty:
+                                    # commit the pages ready so far
+                                    break
+                            if page is None:
+                                # the 'track' cursor resumes it on the next run
+                                return False
+                            if isinstance(page, Exception):
+                                # keep the pages saved before the failed one
+                                error = page
+                                break
+                            saved.append(page[2])
+                            done = self._ingest_page(tweeter_id, *page)
+                            if done:
+                                break
+                finally:
+                    self._release(saved)
+            if error is not None:
+                raise error
+            self._record_sample(tweeter_id, sample)
+            return True
+        finally:
+            # the producer may be sleeping on rate limit, never wait for it
+            stop.set()
+
+    def _add_friendship_concurrent(self,
+                                   concurrency: int,
+                                   frontier: Frontier,
+                                   budget: Budget,
+                                   sample_pages: Optional[int] = None,
+                                   ids: bool = False) -> bool:
+        """add friendship of several accounts at once: worker threads fetch
+        pages and look up the users of pages of user IDs, while this thread
+        is the only one writing to the DB, saving each page and moving the
+        account's own 'track' cursor forward before its next page is
+        requested
+
+        :param concurrency: number of accounts crawled at the same time
+        :param frontier: new wumaos to crawl after the tracked ones
+        :param budget: API calls left
+        :param sample_pages: page cap of each new wumao, default no cap
+        :param ids: whether to page user IDs of new wumaos
+        :return: False if the budget is exhausted before the last page
+        """
+        # page caps of new wumaos, tracked ones are crawled completely
+        samples = {}
+        with ThreadPoolExecutor(max_workers=concurrency,
+                                thread_name_prefix='crawler') as pool:
+            running = {}
+
+            def submit(tweeter_id: int):
+                user_id, cursor, func_name = self._search_params(
+                    tweeter_id, ids)
+                # the page cap is only cut by the one future of its account
+                future = pool.submit(self._fetch_users, user_id,
+                                     cursor, func_name, budget,
+                                     samples.get(tweeter_id))
+                running[future] = (tweeter_id, func_name)
+
+            complete = True
+            while True:
+                if complete:
+                    crawling = set(t for t, _ in running.values())
+                    pending = self.dao.tracked_tweeter_ids(
+                        concurrency - len(running), crawling)
+                    while (len(pending) < concurrency - len(running)
+                           and frontier):
+                        tweeter_id = frontier.pop()
+                        samples[tweeter_id] = self._page_sample(
+                            tweeter_id, sample_pages, ids)
+                        pending.append(tweeter_id)
+                    for tweeter_id in pending:
+                        submit(tweeter_id)
+                        LOGGER.info(f'searching account: {tweeter_id}')
+                if not running:
+                    return complete
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                # pages completed at the same time are saved in one commit
+                saved = []
+                try:
+                    with self.dao.transaction():
+                        for future in done:
+                            tweeter_id, func_name = running.pop(future)
+                            try:
+                                next_cursor, seq, known = future.result()
+                            except BudgetExhausted:
+                                # the 'track' cursor resumes it on the next run
+                                complete = False
+                                continue
+                            saved.append(seq)
+                            if self._ingest_page(tweeter_id, func_name,
+                                                 next_cursor, seq, known):
+                                self._record_sample(
+                                    tweeter_id, samples.pop(tweeter_id, None))
+                            else:
+                                submit(tweeter_id)
+                finally:
+                    self._release(saved)
+
+    def _add_friendship_sequential(self,
+                                   frontier: Frontier,
+                                   budget: Budget,
+                                   sample_pages: Optional[int] = None,
+                                   ids: bool = False) -> bool:
+        """add friendship of one account after another
+
+        :param frontier: new wumaos to crawl after the tracked ones
+        :param budget: API calls left
+        :param sample_pages: page cap of each new wumao, default no cap
+        :param ids: whether to page user IDs of new wumaos
+        :return: False if the budget is exhausted before the last page
+        """
         while True:
             last_search = self.dao.any_track()
             if last_search is not None:
-                self._add_friendship(last_search.tweeter_id)
+                # resumed after a crash or an exhausted budget, completely
+                tweeter_id, sample = last_search.tweeter_id, None
             else:
-                wumao = self.dao.any_wumao(True)
-                if wumao is None:
-                    break
-                LOGGER.info(f'searching account: {wumao.tweeter_id}')
-                self._add_friendship(wumao.tweeter_id)
+                tweeter_id = frontier.pop()
+                if tweeter_id is None:
+                    return True
+                LOGGER.info(f'searching account: {tweeter_id}')
+                sample = self._page_sample(tweeter_id, sample_pages, ids)
+            if not self._add_friendship(tweeter_id, budget, sample, ids):
+                return False
+
+    def add_friendship(self,
+                       concurrency: int = 1,
+                       budget: Optional[Budget] = None,
+                       sample_pages: Optional[int] = None,
+                       ids: bool = False) -> bool:
+        """add friendship of the tracked accounts first, then of the new
+        wumaos by expected yield per API call, refer to `Frontier`
+
+        :param concurrency: number of accounts crawled at the same time,
+        default 1
+        :param budget: API calls left, default no limit
+        :param sample_pages: maximum number of pages of each new wumao, refer
+        to `PageSample`, default no cap; the fractions of friends & followers
+        seen of an account cut short are saved for `Dao.score` estimates
+        :param ids: whether to page user IDs of new wumaos,
+        `Saver.ID_PAGE_COUNT` at a time, and look up only the users neither
+        saved nor rejected before, instead of paging twitter users
+        :return: False if the budget is exhausted before all friendship of
+        new wumaos is added
+        """
+        if budget is None:
+            budget = Budget()
+        frontier = Frontier(self.ID_PAGE_COUNT if ids else self.PAGE_COUNT,
+                            self.dao.frontier_candidates())
+        with self.dao.storage_profile(cfg.CRAWL_STORAGE_PROFILE):
+            if concurrency > 1:
+                complete = self._add_friendship_concurrent(
+                    concurrency, frontier, budget, sample_pages, ids)
+            else:
+                complete = self._add_friendship_sequential(
+                    frontier, budget, sample_pages, ids)
+        if not complete:
+            LOGGER.info(f'API call budget of {budget.limit} exhausted')
+            return False
         LOGGER.info('all friendship of new wumaos has been added')
+        return True
 
-    def enlist_wumao(self, lower_bound: float = 0) -> int:
+    def enlist_wumao(self,
+                     lower_bound: float = 0,
+                     engine: str = 'sql',
+                     estimate: bool = False) -> int:
         """save to wumao list tweeters with the highest wumao score, if the
         score is higher than or equal to the provided lower bound, and refresh
         wumao weight using their internal connection score
 
         :param lower_bound: lower bound of the highest score, default 0
+        :param engine: scoring engine, refer to `Dao.score`
+        :param estimate: whether to score by estimates, refer to `Dao.score`
         :return: current highest wumao score, -1 if no candidate selected
         """
-        score_card = self.dao.score()
+        score_card = self.dao.score(engine, estimate)
 
         if not score_card:
             return -1
@@ -273,10 +799,54 @@ class Saver(metaclass=SingletonMeta):
             LOGGER.info(f'tweeter IDs to save: {new_wumao_tweeter_ids}')
             self.dao.bulk_save_wumao(new_wumao_tweeter_ids, new=True)
             # refresh weight after adding new wumaos
-            self.dao.refresh_wumao_score()
+            self.dao.refresh_wumao_score(engine)
         return max_score
 
-    def search(self) -> NoReturn:
+    def enlist_ranked(self,
+                      engine: str = 'sql',
+                      estimate: bool = False) -> int:
+        """save to wumao list, in one go, the candidates of `Dao.score` ranked
+        close to the current wumaos by personalized PageRank, refer to
+        `SparseGraph.rank_candidates`, and refresh wumao weight; requires
+        numpy and scipy
+
+        of these, the best scored ones are enlisted as long as their score
+        stays above the lower bound of `Saver.search`, half the number of
+        wumaos, counting the enlisted ones
+
+        :param engine: scoring engine, refer to `Dao.score`
+        :param estimate: whether to score by estimates, refer to `Dao.score`
+        :return: number of new wumaos
+        """
+        score_card = self.dao.score(engine, estimate)
+        if not score_card:
+            return 0
+        scores = {r.tweeter_id: r.score for r in score_card}
+        ranked = self.dao.sparse_graph().rank_candidates(
+            scores, self.PPR_RATIO, self.PPR_ALPHA)
+        ranked.sort(key=lambda r: scores[r.tweeter_id], reverse=True)
+        wumao_count = len(self.dao.all_wumao_tweeter_id())
+        new_wumao_tweeter_ids = []
+        for r in ranked:
+            if scores[r.tweeter_id] < (wumao_count +
+                                       len(new_wumao_tweeter_ids) + 1) / 2:
+                break
+            new_wumao_tweeter_ids.append(r.tweeter_id)
+        if not new_wumao_tweeter_ids:
+            return 0
+        LOGGER.info(f'tweeter IDs to save: {new_wumao_tweeter_ids}')
+        self.dao.bulk_save_wumao(new_wumao_tweeter_ids, new=True)
+        self.dao.refresh_wumao_score(engine)
+        return len(new_wumao_tweeter_ids)
+
+    def search(self,
+               engine: str = 'sql',
+               concurrency: int = 1,
+               workers: Optional[int] = None,
+               ranking: str = 'score',
+               budget: Optional[int] = None,
+               sample_pages: Optional[int] = None,
+               ids: bool = False) -> NoReturn:
         """wumao calculation and searching
         finish if no wumao is enlisted after an adding friendship process
 
@@ -284,14 +854,76 @@ class Saver(metaclass=SingletonMeta):
         the threshold is assumed to always increase as new wuamos are
         continuously added; assigned to half of total #wumao
 
+        :param engine: scoring engine, refer to `Dao.score`
+        :param concurrency: number of accounts crawled at the same time
+        :param workers: number of scoring processes of engine 'parallel',
+        default the number of CPUs
+        :param ranking: 'score' to enlist the candidates tied at the floor of
+        the highest score, one tie per crawl round; 'ppr' to enlist every
+        candidate ranked high enough by personalized PageRank at once, refer
+        to `Saver.enlist_ranked`
+        :param budget: maximum number of API requests in this run, pages
+        served from the page cache excluded, default no limit; once
+        exhausted, candidates are enlisted one last time and the crawl
+        resumes on the next run
+        :param sample_pages: crawl new wumaos with this page cap each and
+        enlist candidates by estimated score until none is enlisted, refer to
+        `Saver.add_friendship`, then crawl the sampled wumaos completely and
+        search on as usual; requires engine 'sql'
+        :param ids: whether to page user IDs and look up unknown users only,
+        refer to `Saver.add_friendship`
         :return:
         """
-        while True:
-            threshold = len(self.dao.all_wumao_tweeter_id()) / 2
-            self.add_friendship()
-            new_max_score = self.enlist_wumao(threshold)
-            LOGGER.info(f'current maximum score: {threshold}')
-            if new_max_score < threshold:
+        if ranking not in RANKINGS:
+            raise ValueError('invalid ranking')
+        if ((ranking == 'ppr' or engine == 'sparse')
+                and importlib.util.find_spec('scipy') is None):
+            # fail before the crawl spends the rate limit
+            raise ImportError(
+                'ranking "ppr" and engine "sparse" require numpy '
+                'and scipy, install the "graph" extra')
+        if sample_pages is not None and engine != 'sql':
+            raise ValueError('sampled crawl requires engine "sql"')
+        if engine == 'incremental':
+            self.dao.ensure_score_card()
+        if engine == 'parallel':
+            self.dao.parallel_scorer(workers)
+        api_budget = Budget(budget)
+        rounds = enlisted = 0
+        for pages in ((sample_pages, None) if sample_pages else (None, )):
+            estimate = pages is not None
+            if not estimate:
+                requeued = self.dao.requeue_sampled_wumao()
+                if requeued:
+                    LOGGER.info(f'{requeued} sampled wumaos to crawl again')
+            while True:
+                rounds += 1
+                threshold = len(self.dao.all_wumao_tweeter_id()) / 2
+                complete = self.add_friendship(concurrency, api_budget, pages,
+                                               ids)
+                if ranking == 'ppr':
+                    new_wumaos = self.enlist_ranked(engine, estimate)
+                    enlisted += new_wumaos
+                    if new_wumaos == 0 or not complete:
+                        break
+                    continue
+                new_max_score = self.enlist_wumao(threshold, engine, estimate)
+                LOGGER.info(f'current maximum score: {threshold}')
+                if new_max_score < threshold or not complete:
+                    break
+            if not complete:
                 break
-        LOGGER.info(
-            f'all wumaos are found, job done! last max score: {threshold}')
+        if complete:
+            last = (f'{enlisted} wumaos enlisted'
+                    if ranking == 'ppr' else f'last max score: {threshold}')
+            LOGGER.info(
+                f'all wumaos are found in {rounds} rounds, job done! {last}')
+        else:
+            LOGGER.info(f'search stopped after {rounds} rounds and '
+                        f'{api_budget.calls} API calls, run again to resume')
+        for stats in self.tweet.pool.stats():
+            LOGGER.info(f"key {stats['key']}: {stats['calls']} calls, "
+                        f"{stats['endpoints']}")
+        if self.tweet.cache is not None:
+            LOGGER.info(f'page cache: {self.tweet.cache.stats()}')
+        LOGGER.info(f'DAO caches: {self.dao.cache_stats()}')
@@ -3,14 +3,23 @@ import datetime
 import time
 from functools import wraps
 from typing import Any
+from typing import Iterable
 from typing import List
 from typing import Optional
+from typing import Sequence
 from typing import Tuple
 
+import requests
 import twitter
 from twitter.models import User
 
 from ..singleton import SingletonMeta
+from .cache import PageCache
+from .frontier import Budget
+from .frontier import BudgetExhausted
+from .pool import Credential
+from .pool import PoolExhausted
+from .pool import TokenPool
 
 __all__ = ['Tweet']
 
@@ -43,21 +52,32 @@ def _catcher(default: Any):
 
 class Tweet(metaclass=SingletonMeta):
     """tweet API class"""
-    __slots__ = ['api']
+    __slots__ = ['pool', 'cache']
 
     def __init__(
-        self,
-        consumer_key: str,
-        consumer_secret: str,
-        access_token: str,
-        access_token_secret: str,
+            self,
+            consumer_key: str,
+            consumer_secret: str,
+            access_token: str,
+            access_token_secret: str,
+            extra_credentials: Iterable[Credential] = (),
     ):
-        self.api = twitter.Api(
-            consumer_key=consumer_key,
-            consumer_secret=consumer_secret,
-            access_token_key=access_token,
-            access_token_secret=access_token_secret,
-        )
+        """
+        :param extra_credentials: more sets of keys to rotate to when the rate
+        limit is exceeded
+        """
+        self.pool = TokenPool([
+            Credential(consumer_key, consumer_secret, access_token,
+                       access_token_secret),
+            *extra_credentials,
+        ])
+        # paged responses are served from here if set
+        self.cache: Optional[PageCache] = None
+
+    @property
+    def api(self) -> twitter.Api:
+        """`twitter.Api` instance of the current key"""
+        return self.pool.api
 
     @staticmethod
     def parse_date(timestamp: str) -> datetime.date:
@@ -69,6 +89,54 @@ class Tweet(metaclass=SingletonMeta):
         ts = time.strptime(timestamp, '%a %b %d %H:%M:%S +0000 %Y')
         return datetime.date(ts.tm_year, ts.tm_mon, ts.tm_mday)
 
+    def _execute(self, budget: Optional[Budget], endpoint: str, method: str,
+                 **kwargs):
+        """call a `twitter.Api` method through the key pool, and give the call
+        back to the budget if it fails in a way the caller retries, refer to
+        `saver._sleep`, so that retries are not counted
+
+        :param budget: API calls left, the call already taken or spent
+        :param endpoint: rate limit resource of the method
+        :param method: name of the `twitter.Api` method
+        :param kwargs: keyword arguments of the method
+        :return: result of the method
+        """
+        try:
+            return self.pool.execute(endpoint, method, **kwargs)
+        except (PoolExhausted, requests.exceptions.ConnectionError):
+            if budget is not None:
+                budget.refund()
+            raise
+
+    def _paged(self, endpoint: str, method: str, user_id: int, cursor: int,
+               count: int, budget: Optional[Budget],
+               **kwargs) -> Tuple[int, int, List[User]]:
+        """call a paged `twitter.Api` method through the page cache if set
+
+        :param endpoint: rate limit resource of the method
+        :param method: name of the `twitter.Api` method
+        :param budget: API calls left, one taken unless the page is cached,
+        default no limit
+        :param kwargs: other keyword arguments of the method
+        :return: tuple of next cursor, previous cursor, list of twitter users
+        """
+        if self.cache is not None:
+            page = self.cache.get(endpoint, user_id, cursor, count)
+            if page is not None:
+                return page
+        if budget is not None and not budget.take():
+            raise BudgetExhausted()
+        page = self._execute(budget,
+                             endpoint,
+                             method,
+                             user_id=user_id,
+                             cursor=cursor,
+                             count=count,
+                             **kwargs)
+        if self.cache is not None:
+            self.cache.put(endpoint, user_id, cursor, count, page)
+        return page
+
     @_catcher((0, -1, []))
     def get_followers_paged(
         self,
@@ -77,14 +145,17 @@ class Tweet(metaclass=SingletonMeta):
         count: int = 200,
         skip_status: bool = True,
         include_user_entities: bool = False,
+        budget: Optional[Budget] = None,
     ) -> Tuple[int, int, List[User]]:
         """get followers paged"""
-        return self.api.GetFollowersPaged(
-            user_id=user_id,
-            cursor=cursor,
-            count=count,
-            skip_status=skip_status,
-            include_user_entities=include_user_entities)
+        return self._paged('/followers/list',
+                           'GetFollowersPaged',
+                           user_id,
+                           cursor,
+                           count,
+                           budget,
+                           skip_status=skip_status,
+                           include_user_entities=include_user_entities)
 
     @_catcher((0, -1, []))
     def get_following_paged(
@@ -94,14 +165,68 @@ class Tweet(metaclass=SingletonMeta):
         count: int = 200,
         skip_status: bool = True,
         include_user_entities: bool = False,
+        budget: Optional[Budget] = None,
     ) -> Tuple[int, int, List[User]]:
         """get following paged"""
-        return self.api.GetFriendsPaged(
-            user_id=user_id,
-            cursor=cursor,
-            count=count,
-            skip_status=skip_status,
-            include_user_entities=include_user_entities)
+        return self._paged('/friends/list',
+                           'GetFriendsPaged',
+                           user_id,
+                           cursor,
+                           count,
+                           budget,
+                           skip_status=skip_status,
+                           include_user_entities=include_user_entities)
+
+    @_catcher((0, -1, []))
+    def get_followers_ids_paged(
+            self,
+            user_id: int,
+            cursor: int = -1,
+            count: int = 5000,
+            budget: Optional[Budget] = None) -> Tuple[int, int, List[int]]:
+        """get follower IDs paged"""
+        return self._paged('/followers/ids', 'GetFollowerIDsPaged', user_id,
+                           cursor, count, budget)
+
+    @_catcher((0, -1, []))
+    def get_following_ids_paged(
+            self,
+            user_id: int,
+            cursor: int = -1,
+            count: int = 5000,
+            budget: Optional[Budget] = None) -> Tuple[int, int, List[int]]:
+        """get following IDs paged"""
+        return self._paged('/friends/ids', 'GetFriendIDsPaged', user_id,
+                           cursor, count, budget)
+
+    def lookup_users(self,
+                     user_ids: Sequence[int] = (),
+                     screen_names: Sequence[str] = (),
+                     budget: Optional[Budget] = None) -> List[User]:
+        """look up users by ID or screen name, at most 100 of both; suspended
+        or deleted users are missing from the result
+
+        :param user_ids: twitter user IDs
+        :param screen_names: twitter screen names
+        :param budget: API calls left, one spent even if none is left,
+        default no limit
+        :return: list of twitter users
+        """
+        if budget is not None:
+            budget.spend()
+        try:
+            return self._execute(budget,
+                                 '/users/lookup',
+                                 'UsersLookup',
+                                 user_id=list(user_ids) or None,
+                                 screen_name=list(screen_names) or None,
+                                 include_entities=False)
+        except twitter.error.TwitterError as e:
+            # none of the users exists
+            if isinstance(e.message, list) and any(
+                    m.get('code') == 17 for m in e.message):
+                return []
+            raise e
 
     @_catcher([])
     def get_followers(self,
@@ -136,4 +261,4 @@ class Tweet(metaclass=SingletonMeta):
     @_catcher(None)
     def get_user(self, user_id: int) -> Optional[User]:
         """add user"""
-        return self.api.GetUser(user_id=user_id)
+        return self.pool.execute('/users/show/:id', 'GetUser', user_id=user_id)
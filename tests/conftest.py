@@ -0,0 +1,23 @@
+"""fixtures shared by the test modules"""
+import pytest
+
+
+class FakeClock:
+    """manually advanced clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_clock(request) -> FakeClock:
+    """a `FakeClock`, also set as attribute `clock` of a `unittest.TestCase`
+    before its `setUp`, e.g. via `pytest.mark.usefixtures('fake_clock')`
+    """
+    clock = FakeClock()
+    if request.instance is not None:
+        request.instance.clock = clock
+    return clock
@@ -0,0 +1,135 @@
+"""test PageCache and cached paged search of Tweet"""
+import os
+import tempfile
+import unittest
+
+import pytest
+from twitter.models import User
+
+from app.serv.cache import PageCache
+from app.serv.frontier import Budget
+from app.serv.frontier import BudgetExhausted
+from app.serv.pool import PoolExhausted
+from app.serv.tweet import Tweet
+
+
+class FakePool:
+    """`TokenPool` stand-in serving one page per call"""
+
+    def __init__(self):
+        self.calls = 0
+        # raised once instead of answering, e.g. `PoolExhausted`
+        self.error = None
+
+    def execute(self, endpoint, method, **kwargs):
+        """a page of one user, whose ID is the cursor"""
+        # pylint: disable=unused-argument
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+        self.calls += 1
+        return 0, -1, [_user(kwargs['cursor'])]
+
+
+def _user(user_id: int) -> User:
+    return User(id=user_id,
+                screen_name=f'user_{user_id}',
+                name=f'name {user_id}',
+                description='',
+                created_at='Tue Mar 29 08:11:25 +0000 2020',
+                followers_count=0,
+                friends_count=10,
+                protected=False)
+
+
+@pytest.mark.usefixtures('fake_clock')
+class TestCache(unittest.TestCase):
+    """test page cache"""
+    ENDPOINT = '/followers/list'
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = PageCache(os.path.join(self.tmp.name, 'cache.db'),
+                               ttl=60,
+                               clock=self.clock)
+
+    def tearDown(self):
+        self.cache.close()
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        """users are restored with falsy fields, counters updated"""
+        self.assertIsNone(self.cache.get(self.ENDPOINT, 1, -1, 200))
+        self.cache.put(self.ENDPOINT, 1, -1, 200, (5, 0, [_user(2)]))
+        next_cursor, previous_cursor, users = self.cache.get(
+            self.ENDPOINT, 1, -1, 200)
+        self.assertEqual((5, 0, [_user(2)]),
+                         (next_cursor, previous_cursor, users))
+        self.assertIs(False, users[0].protected)
+        self.assertEqual(0, users[0].followers_count)
+        # a different page size is a different page
+        self.assertIsNone(self.cache.get(self.ENDPOINT, 1, -1, 100))
+        self.assertEqual((1, 2), (self.cache.hits, self.cache.misses))
+        # pages of user IDs
+        self.cache.put('/followers/ids', 1, -1, 5000, (0, 0, [2, 3]))
+        self.assertEqual((0, 0, [2, 3]),
+                         self.cache.get('/followers/ids', 1, -1, 5000))
+
+    def test_ttl(self):
+        """expired pages are missed"""
+        self.cache.put(self.ENDPOINT, 1, -1, 200, (0, 0, [_user(2)]))
+        self.clock.now += 60
+        self.assertIsNone(self.cache.get(self.ENDPOINT, 1, -1, 200))
+
+    def test_evict(self):
+        """least recently used pages are evicted beyond the size limit"""
+        for cursor in range(3):
+            self.clock.now += 1
+            self.cache.put(self.ENDPOINT, 1, cursor, 200,
+                           (0, 0, [_user(cursor)]))
+        self.clock.now += 1
+        self.assertIsNotNone(self.cache.get(self.ENDPOINT, 1, 0, 200))
+        self.cache.max_bytes = self.cache.stats()['bytes']
+        self.clock.now += 1
+        self.cache.put(self.ENDPOINT, 1, 3, 200, (0, 0, [_user(3)]))
+        self.assertIsNone(self.cache.get(self.ENDPOINT, 1, 1, 200))
+        self.assertIsNotNone(self.cache.get(self.ENDPOINT, 1, 0, 200))
+        self.assertIsNotNone(self.cache.get(self.ENDPOINT, 1, 3, 200))
+        self.assertLessEqual(self.cache.stats()['bytes'], self.cache.max_bytes)
+
+    def test_tweet(self):
+        """paged search of `Tweet` is served from the cache"""
+        tweet = Tweet('', '', '', '')
+        pool, cache = tweet.pool, tweet.cache
+        tweet.pool, tweet.cache = FakePool(), self.cache
+        try:
+            for _ in range(2):
+                self.assertEqual([_user(7)],
+                                 tweet.get_followers_paged(1, cursor=7)[2])
+                self.assertEqual([_user(7)],
+                                 tweet.get_following_paged(1, cursor=7)[2])
+            self.assertEqual(2, tweet.pool.calls)
+            self.assertEqual(2, self.cache.hits)
+            # cached pages take no API call of a budget
+            budget = Budget(1)
+            tweet.get_followers_paged(1, cursor=7, budget=budget)
+            self.assertEqual(0, budget.calls)
+            tweet.get_followers_paged(1, cursor=8, budget=budget)
+            with self.assertRaises(BudgetExhausted):
+                tweet.get_followers_paged(1, cursor=9, budget=budget)
+            self.assertEqual((1, 3), (budget.calls, tweet.pool.calls))
+            # calls failing to be retried are given back
+            budget = Budget(1)
+            tweet.pool.error = PoolExhausted(self.ENDPOINT, 0)
+            with self.assertRaises(PoolExhausted):
+                tweet.get_followers_paged(1, cursor=10, budget=budget)
+            tweet.pool.error = PoolExhausted('/users/lookup', 0)
+            with self.assertRaises(PoolExhausted):
+                tweet.lookup_users([1], budget=budget)
+            self.assertEqual(0, budget.calls)
+        finally:
+            tweet.pool, tweet.cache = pool, cache
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
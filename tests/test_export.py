@@ -0,0 +1,109 @@
+"""test streaming export writers"""
+import csv
+import gzip
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+from datetime import date
+
+import sqlalchemy as sa
+
+from app.models.export import Field
+from app.models.export import batched
+from app.models.export import edges_path
+from app.models.export import write_table
+
+
+class TestExport(unittest.TestCase):
+    """test export formats"""
+    FIELDS = [
+        Field('ID', sa.BigInteger()),
+        Field('Name', sa.String()),
+        Field('Creation Date', sa.Date()),
+        Field('Score', sa.Float()),
+    ]
+    ROWS = [
+        (1, 'a, "b"\nc', date(2020, 3, 29), 1.5),
+        (2, None, None, None),
+        (3, '中文', date(2011, 1, 1), 0.0),
+    ]
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name: str) -> str:
+        """path in the temporary folder"""
+        return os.path.join(self.tmp.name, name)
+
+    def test_helpers(self):
+        """batches and edge list path"""
+        self.assertEqual([[0, 1], [2, 3], [4]], list(batched(range(5), 2)))
+        self.assertEqual([], list(batched([], 2)))
+        self.assertEqual(os.path.join('out', 'wumao_edges.csv.gz'),
+                         edges_path(os.path.join('out', 'wumao.csv.gz')))
+
+    def test_csv(self):
+        """gzip csv with header"""
+        path = self.path('out.csv.gz')
+        self.assertEqual(
+            3,
+            write_table(path, 'csv', self.FIELDS, batched(self.ROWS, 2),
+                        'gzip'))
+        with gzip.open(path, mode='rt', encoding='UTF-8', newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(['ID', 'Name', 'Creation Date', 'Score'], rows[0])
+        self.assertEqual(['1', 'a, "b"\nc', '2020-03-29', '1.5'], rows[1])
+        self.assertEqual(['2', '', '', ''], rows[2])
+        # the header is written when nothing matches
+        write_table(path, 'csv', self.FIELDS, [])
+        with open(path, encoding='UTF-8', newline='') as f:
+            self.assertEqual('ID,Name,Creation Date,Score\r\n', f.read())
+
+    def test_jsonl(self):
+        """one object per line"""
+        path = self.path('out.jsonl')
+        write_table(path, 'jsonl', self.FIELDS, batched(self.ROWS, 2))
+        with open(path, encoding='UTF-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(
+            {
+                'ID': 1,
+                'Name': 'a, "b"\nc',
+                'Creation Date': '2020-03-29',
+                'Score': 1.5
+            }, rows[0])
+        self.assertEqual(3, len(rows))
+        self.assertIsNone(rows[1]['Name'])
+
+    @unittest.skipIf(
+        importlib.util.find_spec('pyarrow') is None, 'pyarrow not installed')
+    def test_parquet(self):
+        """one row group per batch, typed columns"""
+        # pylint: disable=import-outside-toplevel
+        from pyarrow import parquet as pq
+        path = self.path('out.parquet')
+        write_table(path, 'parquet', self.FIELDS, batched(self.ROWS, 2),
+                    'zstd')
+        parquet = pq.ParquetFile(path)
+        self.assertEqual(2, parquet.num_row_groups)
+        table = parquet.read()
+        self.assertEqual(['ID', 'Name', 'Creation Date', 'Score'],
+                         table.column_names)
+        self.assertEqual(self.ROWS,
+                         [tuple(r.values()) for r in table.to_pylist()])
+
+    def test_invalid(self):
+        """unknown format or compression of the format"""
+        with self.assertRaises(ValueError):
+            write_table(self.path('out'), 'xml', self.FIELDS, [])
+        with self.assertRaises(ValueError):
+            write_table(self.path('out'), 'csv', self.FIELDS, [], 'zstd')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,68 @@
+"""test crawl frontier and API call budget"""
+import unittest
+
+from app.models.records import FrontierRecord
+from app.serv.frontier import Budget
+from app.serv.frontier import Frontier
+from app.serv.frontier import PageSample
+
+
+class TestFrontier(unittest.TestCase):
+    """test frontier"""
+
+    def test_cost(self):
+        """pages of friends plus pages of followers, at least one each"""
+        frontier = Frontier(200)
+        self.assertEqual(2, frontier.cost(FrontierRecord(1, 0, None, 1, 0)))
+        self.assertEqual(3, frontier.cost(FrontierRecord(1, 200, 201, 1, 0)))
+
+    def test_order(self):
+        """highest expected yield per API call first"""
+        frontier = Frontier(
+            200,
+            [
+                # giant account, 50 pages
+                FrontierRecord(1, 5000, 5000, 1.0, 0),
+                # small account, 2 pages
+                FrontierRecord(2, 10, 10, 1.0, 0),
+                # 3 known wumaos among friends & followers, 3 pages
+                FrontierRecord(3, 300, 100, 1.0, 3),
+                # central wumao
+                FrontierRecord(4, 10, 10, 2.0, 0),
+            ])
+        frontier.extend([FrontierRecord(0, 10, 10, None, 0)])
+        self.assertEqual(5, len(frontier))
+        self.assertEqual([3, 4, 0, 2, 1], [frontier.pop() for _ in range(5)])
+        self.assertIsNone(frontier.pop())
+
+    def test_budget(self):
+        """calls taken until the limit"""
+        budget = Budget(2)
+        self.assertEqual([True, True, False],
+                         [budget.take() for _ in range(3)])
+        self.assertEqual(2, budget.calls)
+        self.assertTrue(budget.exhausted)
+        budget = Budget()
+        self.assertTrue(all(budget.take() for _ in range(100)))
+        self.assertFalse(budget.exhausted)
+
+    def test_page_sample(self):
+        """page cap split between friends and followers"""
+        self.assertEqual((3, 1), PageSample(4, 1000, 10, 200).caps)
+        # both lists fit, nothing cut
+        sample = PageSample(4, 200, 10, 200)
+        self.assertEqual((1, 1), sample.caps)
+        self.assertEqual(0, sample.cut(False, 0, 200))
+        self.assertIsNone(sample.fractions())
+        # at least one page each
+        sample = PageSample(2, 10**6, 0, 200)
+        self.assertEqual((1, 1), sample.caps)
+        self.assertEqual(0, sample.cut(False, 7, 200))
+        self.assertEqual(0, sample.cut(True, 0, 0))
+        self.assertEqual((200 / 10**6, 1.0), sample.fractions())
+        with self.assertRaises(ValueError):
+            PageSample(1, 10, 10, 200)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
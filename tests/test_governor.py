@@ -0,0 +1,66 @@
+"""test RateGovernor and Backoff"""
+import unittest
+
+import pytest
+
+from app.serv.governor import Backoff
+from app.serv.governor import RateGovernor
+
+
+@pytest.mark.usefixtures('fake_clock')
+class TestGovernor(unittest.TestCase):
+    """test rate governor"""
+    ENDPOINT = '/followers/list'
+
+    def setUp(self):
+        self.governor = RateGovernor(self.clock)
+
+    def test_unknown(self):
+        """endpoints without reported headers are not limited"""
+        self.assertEqual(0, self.governor.wait_time(self.ENDPOINT))
+        self.assertTrue(self.governor.reserve(self.ENDPOINT))
+        # python-twitter reports reset 0 before any response
+        self.governor.record(self.ENDPOINT, 15, 15, 0)
+        self.assertEqual(0, self.governor.reset_at(self.ENDPOINT))
+
+    def test_window(self):
+        """calls are reserved until none remains, then wait for reset"""
+        self.governor.record(self.ENDPOINT, 15, 2, self.clock() + 60)
+        self.assertTrue(self.governor.reserve(self.ENDPOINT))
+        self.assertTrue(self.governor.reserve(self.ENDPOINT))
+        self.assertFalse(self.governor.reserve(self.ENDPOINT))
+        self.assertEqual(60, self.governor.wait_time(self.ENDPOINT))
+        self.clock.now += 60
+        self.assertEqual(0, self.governor.wait_time(self.ENDPOINT))
+        self.assertTrue(self.governor.reserve(self.ENDPOINT))
+
+    def test_in_flight(self):
+        """late headers of the same window never raise remaining calls"""
+        reset = self.clock() + 60
+        self.governor.record(self.ENDPOINT, 15, 3, reset)
+        self.governor.reserve(self.ENDPOINT)
+        self.governor.reserve(self.ENDPOINT)
+        # response of a request sent before both reservations
+        self.governor.record(self.ENDPOINT, 15, 2, reset)
+        self.assertTrue(self.governor.reserve(self.ENDPOINT))
+        self.assertFalse(self.governor.reserve(self.ENDPOINT))
+        # a new window replaces the old one
+        self.governor.record(self.ENDPOINT, 15, 14, reset + 900)
+        self.assertTrue(self.governor.reserve(self.ENDPOINT))
+        self.assertEqual(reset + 900, self.governor.reset_at(self.ENDPOINT))
+
+
+class TestBackoff(unittest.TestCase):
+    """test backoff"""
+
+    def test_delay(self):
+        """delay doubles per attempt up to the cap, scaled by jitter"""
+        backoff = Backoff(base=5, cap=300, rand=lambda: 1.0)
+        self.assertEqual([5, 10, 20, 40, 80, 160, 300, 300],
+                         [backoff.delay(i) for i in range(8)])
+        backoff = Backoff(base=5, cap=300, rand=lambda: 0.5)
+        self.assertEqual(150, backoff.delay(10))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,208 @@
+"""test scoring engines"""
+import importlib.util
+import os
+import tempfile
+import unittest
+
+from twitter.models import User
+
+from app.models.dao import Dao
+from app.models.parallel import _ranges
+
+
+class TestGraph(unittest.TestCase):
+    """compare scoring engines against the SQL path"""
+    dao = None
+    USERS = [
+        User(id=23456789000 + i,
+             screen_name=f'user_{i}',
+             name=f'name {i}',
+             description='' if i % 2 else f'line, "{i}"\nnext line',
+             created_at='Tue Mar 29 08:11:25 +0000 2020',
+             followers_count=i,
+             friends_count=i) for i in range(8)
+    ]
+    # (follower, author) index pairs into USERS
+    EDGES = ((3, 0), (3, 1), (0, 3), (4, 0), (1, 5), (6, 2), (2, 6), (1, 6),
+             (0, 1), (1, 2), (2, 0), (2, 1))
+    ENGINES = ('sparse', 'incremental', 'parallel') + (
+        ('duckdb', ) if importlib.util.find_spec('duckdb') else ())
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.dao = Dao('./app.db')
+        cls.dao.reset_db()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.dao.reset_db()
+
+    def setUp(self):
+        """8 tweeters, the first three are wumaos"""
+        self.dao.bulk_save_tweeter(self.USERS)
+        self.tweeter_ids = sorted(
+            self.dao.all_tweeter_id([u.id for u in self.USERS]))
+        self.dao.bulk_save_wumao(self.tweeter_ids[:3])
+        for follower, author in self.EDGES:
+            self.dao.follow(self.tweeter_ids[follower],
+                            self.tweeter_ids[author])
+
+    def tearDown(self):
+        self.dao.reset_db()
+
+    def assert_same_scores(self):
+        """all engines agree with the SQL path"""
+        sql_score = {r.tweeter_id: r.score for r in self.dao.score()}
+        sql_center = {(r.id, r.tweeter_id): r.score
+                      for r in self.dao.center_score()}
+        for engine in self.ENGINES:
+            with self.subTest(engine=engine):
+                score = {
+                    r.tweeter_id: r.score
+                    for r in self.dao.score(engine)
+                }
+                self.assertEqual(sql_score.keys(), score.keys())
+                for tweeter_id, value in sql_score.items():
+                    self.assertAlmostEqual(value, score[tweeter_id])
+                self.assertEqual(
+                    sql_center, {(r.id, r.tweeter_id): r.score
+                                 for r in self.dao.center_score(engine)})
+
+    def test_score(self):
+        """candidates and wumao centers"""
+        self.assertEqual({self.tweeter_ids[3], self.tweeter_ids[6]},
+                         {r.tweeter_id
+                          for r in self.dao.score()})
+        self.assert_same_scores()
+
+    def test_weighted_score(self):
+        """scores after wumao weights are refreshed"""
+        self.dao.refresh_wumao_score()
+        self.assert_same_scores()
+
+    def test_score_card(self):
+        """incremental scores follow edge, wumao and tweeter changes"""
+        self.assertEqual(set(), self.dao.check_score_card())
+        self.dao.bulk_save_wumao(self.tweeter_ids[3:4])
+        self.dao.un_follow(self.tweeter_ids[2], self.tweeter_ids[6])
+        self.dao.bulk_attract(self.tweeter_ids[7], self.tweeter_ids[:2])
+        self.dao.bulk_follow(self.tweeter_ids[7], self.tweeter_ids[3:5])
+        self.dao.upsert_wumao(self.tweeter_ids[4], True)
+        self.assertEqual(set(), self.dao.check_score_card())
+        self.dao.refresh_wumao_score('incremental')
+        self.dao.delete_tweeter(self.tweeter_ids[0])
+        self.assertEqual(set(), self.dao.check_score_card())
+        self.assert_same_scores()
+
+    def test_graph_cache(self):
+        """the cached sparse graph and DuckDB mirror follow edge and wumao
+        changes
+        """
+        self.dao.score('sparse')
+        graph = self.dao.sparse_graph()
+        self.dao.refresh_wumao_score()
+        self.assertIs(graph, self.dao.sparse_graph())
+        self.assert_same_scores()
+        self.dao.bulk_attract(self.tweeter_ids[7], self.tweeter_ids[:2])
+        self.dao.follow(self.tweeter_ids[5], self.tweeter_ids[4])
+        self.assert_same_scores()
+        self.dao.bulk_save_wumao(self.tweeter_ids[7:])
+        self.dao.un_follow(self.tweeter_ids[2], self.tweeter_ids[6])
+        self.assert_same_scores()
+        with self.assertRaises(ValueError):
+            with self.dao.transaction():
+                # followed by wumao 1, now following wumao 0
+                self.dao.bulk_follow(self.tweeter_ids[5],
+                                     self.tweeter_ids[:1])
+                for engine in set(self.ENGINES) & {'sparse', 'duckdb'}:
+                    self.assertIn(self.tweeter_ids[5],
+                                  {r.tweeter_id
+                                   for r in self.dao.score(engine)})
+                raise ValueError()
+        self.assert_same_scores()
+
+    def test_rebuild_score_card(self):
+        """full rebuild matches the incremental state"""
+        before = {r.tweeter_id: r.score for r in self.dao.score('incremental')}
+        self.dao.rebuild_score_card()
+        self.assertEqual(before, {
+            r.tweeter_id: r.score
+            for r in self.dao.score('incremental')
+        })
+        self.assertEqual(set(), self.dao.check_score_card())
+
+    @unittest.skipIf(
+        importlib.util.find_spec('duckdb') is None, 'duckdb not installed')
+    def test_export(self):
+        """DuckDB writes the same csv as SQLite"""
+        self.dao.refresh_wumao_score()
+        with tempfile.TemporaryDirectory() as tmp:
+            contents = []
+            for engine in ('sql', 'duckdb'):
+                path = os.path.join(tmp, f'{engine}.csv')
+                self.dao.wumao_to_csv(path, weight=0, engine=engine)
+                with open(path, encoding='UTF-8') as f:
+                    contents.append(f.read())
+        self.assertEqual(contents[0], contents[1])
+        # header, 3 wumaos, 2 of which have a line break in the description
+        self.assertEqual(6, contents[0].count('\n'))
+
+    def test_export_wumao(self):
+        """accounts and the friendship among them, same with every engine"""
+        engines = ('sql', 'duckdb') if 'duckdb' in self.ENGINES else ('sql', )
+        with tempfile.TemporaryDirectory() as tmp:
+            for engine in engines:
+                path = os.path.join(tmp, f'{engine}.jsonl')
+                self.assertEqual((3, 4),
+                                 self.dao.export_wumao(path,
+                                                       'jsonl',
+                                                       weight=0,
+                                                       engine=engine,
+                                                       batch=2))
+                with open(os.path.join(tmp, f'{engine}_edges.jsonl'),
+                          encoding='UTF-8') as f:
+                    edges = f.read()
+                self.assertEqual(
+                    '{"Author ID": 23456789000, "Follower ID": 23456789002}',
+                    edges.splitlines()[0])
+            if len(engines) > 1:
+                for suffix in ('', '_edges'):
+                    with open(os.path.join(tmp, f'sql{suffix}.jsonl'),
+                              encoding='UTF-8') as f1, open(
+                                  os.path.join(tmp, f'duckdb{suffix}.jsonl'),
+                                  encoding='UTF-8') as f2:
+                        self.assertEqual(f1.read(), f2.read())
+
+    def test_parallel_workers(self):
+        """one tweeter per range, and a restarted pool"""
+        for workers in (2, 1):
+            with self.subTest(workers=workers):
+                self.assertEqual(workers,
+                                 self.dao.parallel_scorer(workers).workers)
+                self.assert_same_scores()
+        self.assertEqual([(1, 3), (4, 6), (7, 7)], list(_ranges(1, 7, 3)))
+
+    def test_rank_candidates(self):
+        """personalized PageRank converges, candidates exclude wumaos"""
+        graph = self.dao.sparse_graph()
+        rank, iterations = graph.personalized_pagerank(tol=1e-12)
+        self.assertLess(iterations, 100)
+        self.assertAlmostEqual(1.0, rank.sum())
+        ranked = graph.rank_candidates(self.tweeter_ids, ratio=0)
+        # every connected non-wumao, the isolated tweeter 7 is not a node
+        self.assertEqual({self.tweeter_ids[i]
+                          for i in (3, 4, 5, 6)},
+                         {r.tweeter_id
+                          for r in ranked})
+        self.assertEqual(sorted((r.score for r in ranked), reverse=True),
+                         [r.score for r in ranked])
+        self.assertEqual([], graph.rank_candidates(self.tweeter_ids, ratio=2))
+
+    def test_invalid_engine(self):
+        """unknown engine name"""
+        with self.assertRaises(ValueError):
+            self.dao.score('unknown')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,29 @@
+"""test LruCache"""
+import unittest
+
+from app.models.lru import LruCache
+
+
+class TestLru(unittest.TestCase):
+    """test LRU cache"""
+
+    def test_evict(self):
+        """the least recently used entry is evicted, lookups counted"""
+        cache = LruCache(2)
+        cache.put(1, 'a')
+        cache.put(2, 'b')
+        self.assertEqual('a', cache.get(1))
+        cache.put(3, 'c')
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(('a', 'c'), (cache.get(1), cache.get(3)))
+        self.assertEqual('c', cache.pop(3))
+        self.assertEqual({
+            'hits': 3,
+            'misses': 1,
+            'hit_rate': 0.75,
+            'size': 1
+        }, cache.stats())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,95 @@
+"""test metrics and their text exposition"""
+import os
+import tempfile
+import unittest
+
+from app import metrics
+from app.models.dao import Dao
+
+
+class TestMetrics(unittest.TestCase):
+    """test metrics"""
+
+    def test_render(self):
+        """counters and cumulative histogram buckets in the text format"""
+        registry = metrics.Registry()
+        calls = registry.counter('calls_total', 'calls', ['endpoint'])
+        calls.inc(endpoint='/friends/list')
+        calls.inc(2, endpoint='/followers/list')
+        latency = registry.histogram('latency_seconds', 'latency', [],
+                                     (0.1, 1))
+        latency.observe(0.05)
+        latency.observe(0.5)
+        self.assertIs(calls,
+                      registry.counter('calls_total', 'calls', ['endpoint']))
+        self.assertEqual(
+            '# HELP calls_total calls\n'
+            '# TYPE calls_total counter\n'
+            'calls_total{endpoint="/followers/list"} 2\n'
+            'calls_total{endpoint="/friends/list"} 1\n'
+            '# HELP latency_seconds latency\n'
+            '# TYPE latency_seconds histogram\n'
+            'latency_seconds_bucket{le="0.1"} 1\n'
+            'latency_seconds_bucket{le="1"} 2\n'
+            'latency_seconds_bucket{le="+Inf"} 2\n'
+            'latency_seconds_sum 0.55\n'
+            'latency_seconds_count 2\n', registry.render())
+        with self.assertRaises(ValueError):
+            calls.inc(endpoint='/friends/list', key='k1')
+        with self.assertRaises(ValueError):
+            calls.inc(-1, endpoint='/friends/list')
+        with self.assertRaises(ValueError):
+            registry.gauge('calls_total', 'calls')
+
+    def test_parse(self):
+        """snapshots read back, escaped label values included"""
+        registry = metrics.Registry()
+        registry.counter('users_total', 'users',
+                         ['result']).inc(3, result='a "b"\n')
+        registry.histogram('commit_seconds', 'commits').observe(2)
+        registry.counter('edges_total', 'edges')
+        registry.gauge(metrics.SNAPSHOT_TIMESTAMP, 'now').set(100)
+        text = registry.render()
+        types, samples = metrics.parse_text(text)
+        self.assertEqual('histogram', types['commit_seconds'])
+        self.assertIn(
+            metrics.Sample('users_total', {'result': 'a "b"\n'}, 3.0), samples)
+        self.assertEqual([
+            'snapshot taken 20s ago',
+            'edges_total 0',
+            'users_total{result="a \\"b\\"\\n"} 3',
+            'commit_seconds count=1 sum=2.000 mean=2.000000',
+        ], metrics.summarize(text, now=120))
+
+    def test_exporter(self):
+        """snapshots written periodically and once more when stopped"""
+        registry = metrics.Registry()
+        pages = registry.counter('pages_total', 'pages')
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metrics.prom')
+            with metrics.TextfileExporter(path, 0.01, registry):
+                pages.inc()
+            self.assertEqual(['metrics.prom'], os.listdir(tmp))
+            with open(path, encoding='utf8') as f:
+                _, samples = metrics.parse_text(f.read())
+        self.assertIn(metrics.Sample('pages_total', {}, 1.0), samples)
+        self.assertIn(metrics.SNAPSHOT_TIMESTAMP, {s.name for s in samples})
+
+    def test_dao(self):
+        """commits and scoring passes are timed"""
+        dao = Dao('./app.db')
+        dao.reset_db()
+        commits = metrics.COMMIT_SECONDS.count()
+        scores = metrics.SCORE_SECONDS.count(method='score', engine='sql')
+        with dao.transaction():
+            dao.ingest_edges([])
+        dao.score()
+        self.assertEqual(commits + 1, metrics.COMMIT_SECONDS.count())
+        self.assertEqual(
+            scores + 1,
+            metrics.SCORE_SECONDS.count(method='score', engine='sql'))
+        dao.reset_db()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,9 +1,16 @@
 """test models"""
+import csv
+import gzip
+import os
+import tempfile
 import unittest
 
+from sqlalchemy import event
+from sqlalchemy import text
 from twitter.models import User
 
 from app.models.dao import Dao
+from app.models.records import TweeterRecord
 from app.models.tables import Track
 
 
@@ -104,11 +111,58 @@ class TestModel(unittest.TestCase):
         methods:
           * dao.bulk_save
           * dao.bulk_save_tweeter
+          * dao.bulk_save_wumao
         :return:
         """
         self.assertEqual(set(), self.dao.bulk_save_tweeter(self.USERS))
         self.assertEqual(set(),
                          self.dao.bulk_save_wumao(self.old_wumao_tweeter_ids))
+        self.assertEqual(
+            set(self.dao.all_wumao_id()),
+            self.dao.bulk_save_wumao(self.old_wumao_tweeter_ids +
+                                     self.new_wumao_tweeter_ids,
+                                     return_all=True))
+        # existing tweeters are refreshed
+        user = self.USERS[0]
+        renamed = User(id=user.id,
+                       screen_name='renamed',
+                       name=user.name,
+                       description=user.description,
+                       created_at=user.created_at,
+                       followers_count=user.followers_count + 1,
+                       friends_count=user.friends_count + 1)
+        tweeter_ids = self.dao.bulk_save_tweeter([renamed], return_all=True)
+        tweeter = self.dao.lookup_tweeter(tweeter_ids.pop())
+        self.assertEqual(
+            ('renamed', user.followers_count + 1, user.friends_count + 1),
+            (tweeter.screen_name, tweeter.follower_count,
+             tweeter.friend_count))
+
+    def test_records(self):
+        """Core-level upsert of row records
+
+        methods:
+          * dao.bulk_save_tweeter_records
+          * dao.ingest_edges
+        :return:
+        """
+        record = TweeterRecord(12345678906, 'user_6', 'name 6', '',
+                               '2020-03-29', 10, 20)
+        tweeter_id, = self.dao.bulk_save_tweeter_records([record])
+        tweeter = self.dao.lookup_tweeter(tweeter_id)
+        self.assertEqual(record,
+                         (tweeter.user_id, tweeter.screen_name, tweeter.name,
+                          tweeter.description, tweeter.created_at.isoformat(),
+                          tweeter.follower_count, tweeter.friend_count))
+        # the same users as records or `twitter.User` instances
+        # pylint: disable=protected-access
+        self.assertEqual(
+            self.dao.all_tweeter_id(self.USER_IDS),
+            self.dao.bulk_save_tweeter_records(
+                [Dao._twitter_user_record(u) for u in self.USERS],
+                return_all=True))
+        self.assertEqual(
+            1, self.dao.ingest_edges([(tweeter_id, self.tweeters[0].id)]))
 
     def test_tweeter(self):
         """checks DAO methods on table 'tweeter'
@@ -134,6 +188,7 @@ class TestModel(unittest.TestCase):
           * dao.follow
           * dao.bulk_follow
           * dao.bulk_attract
+          * dao.ingest_edges
           * dao.friend_count
           * dao.follower_count
           * dao.delete_tweeter
@@ -143,8 +198,19 @@ class TestModel(unittest.TestCase):
         (tweeter_id_1, tweeter_id_2, tweeter_id_3, tweeter_id_4,
          tweeter_id_5) = (u.id for u in self.tweeters)
         self.dao.follow(tweeter_id_5, tweeter_id_1)
-        self.dao.bulk_follow(tweeter_id_1, [tweeter_id_2, tweeter_id_3])
-        self.dao.bulk_attract(tweeter_id_4, [tweeter_id_1])
+        self.assertEqual(
+            2, self.dao.bulk_follow(tweeter_id_1,
+                                    [tweeter_id_2, tweeter_id_3]))
+        self.assertEqual(1, self.dao.bulk_attract(tweeter_id_4,
+                                                  [tweeter_id_1]))
+        # existing edges are skipped
+        self.assertEqual(
+            0, self.dao.bulk_follow(tweeter_id_1,
+                                    [tweeter_id_2, tweeter_id_4]))
+        self.assertEqual(
+            1,
+            self.dao.ingest_edges([(tweeter_id_2, tweeter_id_5),
+                                   (tweeter_id_2, tweeter_id_5)]))
         self.assertEqual(True, self.dao.is_following(tweeter_id_1,
                                                      tweeter_id_2))
         self.assertEqual(True, self.dao.is_following(tweeter_id_1,
@@ -169,6 +235,138 @@ class TestModel(unittest.TestCase):
                          self.dao.friends_id(tweeter_id_1))
         self.assertEqual([tweeter_id_5], self.dao.followers_id(tweeter_id_1))
 
+    def test_id_batches(self):
+        """ID collections larger than one IN list, and than the temp table
+        threshold
+
+        methods:
+          * dao.all_tweeter_id
+          * dao.constrain_tweeters_exist
+          * dao.friend_count
+        :return:
+        """
+        tweeter_ids = [u.id for u in self.tweeters]
+        self.dao.bulk_follow(tweeter_ids[0], tweeter_ids[1:])
+        expected = (self.dao.all_tweeter_id(self.USER_IDS),
+                    self.dao.friend_count(tweeter_ids[0], tweeter_ids))
+        defaults = Dao.IN_CHUNK, Dao.TEMP_TABLE_SIZE
+        for in_chunk, temp_table_size in ((2, 10), (2, 3)):
+            Dao.IN_CHUNK, Dao.TEMP_TABLE_SIZE = in_chunk, temp_table_size
+            # query instead of hitting the identity cache
+            self.dao.clear_cache()
+            try:
+                self.assertEqual(
+                    expected,
+                    (self.dao.all_tweeter_id(self.USER_IDS),
+                     self.dao.friend_count(tweeter_ids[0], tweeter_ids)))
+                self.dao.constrain_tweeters_exist(tweeter_ids)
+                with self.assertRaises(ValueError):
+                    self.dao.constrain_tweeters_exist([*tweeter_ids, -1])
+            finally:
+                Dao.IN_CHUNK, Dao.TEMP_TABLE_SIZE = defaults
+
+    def test_cache(self):
+        """identities and tracks are served from the cache, and invalidated
+        on writes
+
+        methods:
+          * dao.all_tweeter_id
+          * dao.lookup_user_id
+          * dao.track_cursor
+          * dao.cache_stats
+        :return:
+        """
+        statements = []
+        engine = self.dao.session.get_bind()
+
+        def count(*_):
+            statements.append(1)
+
+        tweeter_ids = self.dao.bulk_save_tweeter(self.USERS, return_all=True)
+        tracked_id = self.tracks[0].tweeter_id
+        self.dao.upsert_track(tracked_id, self.METHODS[1], 1)
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            self.assertEqual(tweeter_ids,
+                             self.dao.all_tweeter_id(self.USER_IDS))
+            self.dao.constrain_tweeters_exist(tweeter_ids)
+            self.assertEqual(set(self.USER_IDS),
+                             {self.dao.lookup_user_id(i)
+                              for i in tweeter_ids})
+            self.assertEqual((self.METHODS[1], 1),
+                             self.dao.track_cursor(tracked_id))
+            self.assertEqual([], statements)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+        self.assertLess(0, self.dao.cache_stats()['user_id']['hits'])
+        # deleted tweeters and tracks are not served anymore
+        self.dao.delete_track(tracked_id)
+        self.assertIsNone(self.dao.track_cursor(tracked_id))
+        self.dao.delete_tweeter(tracked_id)
+        self.assertIsNone(self.dao.lookup_user_id(tracked_id))
+        with self.assertRaises(ValueError):
+            self.dao.constrain_tweeter_exist(tracked_id)
+        self.assertEqual(tweeter_ids - {tracked_id},
+                         self.dao.all_tweeter_id(self.USER_IDS))
+
+    def test_transaction(self):
+        """writes within a transaction are committed or rolled back together
+
+        methods:
+          * dao.transaction
+        :return:
+        """
+        commits = []
+        engine = self.dao.session.get_bind()
+
+        def count(*_):
+            commits.append(1)
+
+        tweeter_id_1, tweeter_id_2 = [u.id for u in self.tweeters][:2]
+        event.listen(engine, 'commit', count)
+        try:
+            with self.dao.transaction():
+                self.dao.follow(tweeter_id_1, tweeter_id_2)
+                with self.dao.transaction():
+                    self.dao.upsert_track(tweeter_id_1, self.METHODS[0], 7)
+                self.assertEqual([], commits)
+            self.assertEqual([1], commits)
+        finally:
+            event.remove(engine, 'commit', count)
+        with self.assertRaises(ValueError):
+            with self.dao.transaction():
+                self.dao.un_follow(tweeter_id_1, tweeter_id_2)
+                self.dao.upsert_track(tweeter_id_1, self.METHODS[1], 8)
+                self.dao.follow(tweeter_id_1, -1)
+        self.assertFalse(self.dao.in_transaction)
+        self.assertTrue(self.dao.is_following(tweeter_id_1, tweeter_id_2))
+        self.assertEqual((self.METHODS[0], 7),
+                         self.dao.track_cursor(tweeter_id_1))
+
+    def test_storage_profile(self):
+        """pragmas of the storage profile are set on connections
+
+        methods:
+          * dao.storage_profile
+        :return:
+        """
+
+        def pragma(name):
+            res = self.dao.session.execute(text(f'PRAGMA {name}')).scalar()
+            self.dao.session.commit()
+            return res
+
+        # 'safe' by default, NORMAL is 1 and FULL is 2
+        self.assertEqual(('wal', 2),
+                         (pragma('journal_mode'), pragma('synchronous')))
+        with self.dao.storage_profile('bulk'):
+            self.assertEqual(1, pragma('synchronous'))
+            self.assertEqual(-256 * 1024, pragma('cache_size'))
+        self.assertEqual(2, pragma('synchronous'))
+        with self.assertRaises(ValueError):
+            with self.dao.storage_profile('fast'):
+                pass
+
     def test_wumao(self):
         """checks DAO methods of table 'wumao' and its 'on-delete' constrain
 
@@ -201,6 +399,34 @@ class TestModel(unittest.TestCase):
         # self.assertEqual(True, self.dao.lookup_wumao(old_wumao_1.id).is_new)
         # self.assertEqual(False, self.dao.lookup_wumao(new_wumao_2.id).is_new)
 
+    def test_wumao_to_csv(self):
+        """streamed export: gzip, batches, header only if nothing matches"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'wumao.csv.gz')
+            self.assertEqual(
+                4, self.dao.wumao_to_csv(path, compression='gzip', batch=3))
+            with gzip.open(path, mode='rt', encoding='UTF-8', newline='') as f:
+                rows = list(csv.reader(f))
+            self.assertEqual([
+                'ID', 'Screen Name', 'Nick Name', 'Description',
+                'Creation Date', '#Follower', '#Following', 'Wumao Score'
+            ], rows[0])
+            self.assertEqual(set(self.USER_IDS[:4]),
+                             {int(r[0])
+                              for r in rows[1:]})
+            self.assertIn([
+                str(self.USER_IDS[2]), self.SCREEN_NAMES[2], self.NAMES[2],
+                self.DESCRIPTIONS[2], '2020-03-29',
+                str(self.FOLLOWER_COUNTS[2]),
+                str(self.FRIEND_COUNTS[2]), '1.0'
+            ], rows)
+            # an existing file is overwritten
+            path = os.path.join(tmp, 'wumao.csv')
+            self.assertEqual(4, self.dao.wumao_to_csv(path))
+            self.assertEqual(0, self.dao.wumao_to_csv(path, weight=2))
+            with open(path, encoding='UTF-8') as f:
+                self.assertEqual(1, len(f.readlines()))
+
     def test_track(self):
         """checks DAO methods of table 'track'
 
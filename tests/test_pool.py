@@ -0,0 +1,121 @@
+"""test TokenPool"""
+import unittest
+from typing import Callable
+
+import pytest
+from twitter.error import TwitterError
+from twitter.ratelimit import RateLimit
+
+from app import metrics
+from app.serv.pool import Credential
+from app.serv.pool import PoolExhausted
+from app.serv.pool import TokenPool
+
+
+class FakeApi:
+    """`twitter.Api` stand-in allowing a fixed number of calls per window"""
+    ENDPOINT = '/users/show/:id'
+
+    def __init__(self,
+                 clock: Callable[[], float],
+                 limit: int,
+                 reset_after: int,
+                 headers: bool = False):
+        """
+        :param headers: report rate limit headers on every response, not
+        only on failures
+        """
+        self.clock = clock
+        self.limit = limit
+        self.remaining = limit
+        self.reset_after = reset_after
+        self.headers = headers
+        self.rate_limited = 0
+        self.rate_limit = RateLimit()
+
+    def GetUser(self, user_id):  # pylint: disable=invalid-name
+        """count down the calls left, report reset time when none left"""
+        if self.remaining == 0:
+            self.rate_limited += 1
+            self.rate_limit.set_limit(self.ENDPOINT, self.limit, 0,
+                                      self.clock() + self.reset_after)
+            raise TwitterError([{
+                'message': 'Rate limit exceeded',
+                'code': 88
+            }])
+        self.remaining -= 1
+        if self.headers:
+            self.rate_limit.set_limit(self.ENDPOINT, self.limit,
+                                      self.remaining,
+                                      self.clock() + self.reset_after)
+        return user_id
+
+
+@pytest.mark.usefixtures('fake_clock')
+class TestPool(unittest.TestCase):
+    """test token pool"""
+
+    def setUp(self):
+        self.pool = TokenPool([
+            Credential('k1', 's1', '1-t', 'ts1'),
+            Credential('k2', 's2', '2-t', 'ts2')
+        ], self.clock)
+        # pylint: disable=protected-access
+        keys = self.pool._keys
+        keys[0].api = FakeApi(self.clock, 2, 300)
+        keys[1].api = FakeApi(self.clock, 1, 100)
+
+    def get_user(self, user_id):
+        """call through the pool"""
+        return self.pool.execute(FakeApi.ENDPOINT, 'GetUser', user_id=user_id)
+
+    def test_rotate(self):
+        """rotate on rate limit, raise when all keys are exhausted"""
+        calls = metrics.API_CALLS.value(endpoint=FakeApi.ENDPOINT)
+        limited = metrics.API_RATE_LIMITED.value(endpoint=FakeApi.ENDPOINT)
+        self.assertEqual([1, 2, 3], [self.get_user(i) for i in (1, 2, 3)])
+        with self.assertRaises(PoolExhausted) as ctx:
+            self.get_user(4)
+        # the second key resets first
+        self.assertEqual(self.clock() + 100, ctx.exception.reset_at)
+        self.assertEqual([3, 2], [s['calls'] for s in self.pool.stats()])
+        self.assertEqual(['1', '2'], [s['key'] for s in self.pool.stats()])
+        # every request is counted, refused ones included
+        self.assertEqual(
+            (5, 2),
+            (metrics.API_CALLS.value(endpoint=FakeApi.ENDPOINT) - calls,
+             metrics.API_RATE_LIMITED.value(endpoint=FakeApi.ENDPOINT) -
+             limited))
+
+    def test_reset(self):
+        """keys are usable again after their window resets"""
+        for i in (1, 2, 3):
+            self.get_user(i)
+        with self.assertRaises(PoolExhausted):
+            self.get_user(4)
+        self.clock.now += 100
+        # pylint: disable=protected-access
+        self.pool._keys[1].api.remaining = 1
+        self.assertEqual(5, self.get_user(5))
+        self.assertIs(self.pool._keys[1].api, self.pool.api)
+
+    def test_headers(self):
+        """keys reporting headers are rotated before exceeding rate limit"""
+        # pylint: disable=protected-access
+        keys = self.pool._keys
+        keys[0].api = FakeApi(self.clock, 2, 300, headers=True)
+        keys[1].api = FakeApi(self.clock, 1, 100, headers=True)
+        self.assertEqual([1, 2, 3], [self.get_user(i) for i in (1, 2, 3)])
+        with self.assertRaises(PoolExhausted) as ctx:
+            self.get_user(4)
+        self.assertEqual(self.clock() + 100, ctx.exception.reset_at)
+        self.assertEqual([0, 0], [k.api.rate_limited for k in keys])
+
+    def test_empty(self):
+        """a pool needs keys"""
+        with self.assertRaises(ValueError):
+            TokenPool([])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,428 @@
+"""test Saver crawling against a fake twitter API"""
+import re
+import threading
+import time
+import unittest
+from unittest import mock
+
+from sqlalchemy import event
+from twitter.models import User
+
+from app import metrics
+from app.models.dao import Dao
+from app.models.tables import Friendship
+from app.serv.frontier import Budget
+from app.serv.frontier import BudgetExhausted
+from app.serv.saver import Saver
+
+
+class FakePool:
+    """`TokenPool` stand-in without keys"""
+
+    def stats(self):
+        """no key statistics"""
+        return []
+
+
+class FakeTweet:
+    """in-memory stand-in of `Tweet` serving a fixed follower graph"""
+
+    def __init__(self, users, edges):
+        """
+        :param users: list of twitter users
+        :param edges: (follower user_id, author user_id) pairs
+        """
+        self.users = {u.id: u for u in users}
+        self.following = {u.id: [] for u in users}
+        self.followers = {u.id: [] for u in users}
+        for follower, author in edges:
+            self.following[follower].append(self.users[author])
+            self.followers[author].append(self.users[follower])
+        self.calls = 0
+        # user IDs looked up, in order, and the threads looking them up
+        self.looked_up = []
+        self.lookup_threads = set()
+        # fail the call of this number, to simulate a crash
+        self.fail_at = None
+        # called with the number of every page call before it is served
+        self.hook = None
+        self.pool = FakePool()
+        self.cache = None
+
+    def _paged(self, seq, cursor, count, budget):
+        # like `Tweet._paged`, without a page cache
+        if budget is not None and not budget.take():
+            raise BudgetExhausted()
+        self.calls += 1
+        if self.calls == self.fail_at:
+            raise RuntimeError('crashed')
+        if self.hook is not None:
+            self.hook(self.calls)
+        start = max(cursor, 0)
+        end = start + count
+        return (end if end < len(seq) else 0), cursor, seq[start:end]
+
+    def get_following_paged(self, user_id, cursor=-1, count=200, budget=None):
+        """paged friends"""
+        return self._paged(self.following[user_id], cursor, count, budget)
+
+    def get_followers_paged(self, user_id, cursor=-1, count=200, budget=None):
+        """paged followers"""
+        return self._paged(self.followers[user_id], cursor, count, budget)
+
+    def get_following_ids_paged(self,
+                                user_id,
+                                cursor=-1,
+                                count=5000,
+                                budget=None):
+        """paged friend IDs"""
+        return self._paged([u.id for u in self.following[user_id]], cursor,
+                           count, budget)
+
+    def get_followers_ids_paged(self,
+                                user_id,
+                                cursor=-1,
+                                count=5000,
+                                budget=None):
+        """paged follower IDs"""
+        return self._paged([u.id for u in self.followers[user_id]], cursor,
+                           count, budget)
+
+    def lookup_users(self, user_ids=(), screen_names=(), budget=None):
+        """users by ID or screen name, missing ones skipped"""
+        if budget is not None:
+            budget.spend()
+        self.calls += 1
+        self.looked_up.extend(user_ids)
+        self.lookup_threads.add(threading.current_thread().name)
+        names = {u.screen_name.lower(): u for u in self.users.values()}
+        return [self.users[i] for i in user_ids if i in self.users
+                ] + [names[n.lower()] for n in screen_names if n in names]
+
+
+def _user(user_id: int, year: int = 2020) -> User:
+    return User(id=user_id,
+                screen_name=f'user_{user_id}',
+                name=f'name {user_id}',
+                description='',
+                created_at=f'Tue Mar 29 08:11:25 +0000 {year}',
+                followers_count=10,
+                friends_count=10)
+
+
+class TestSaver(unittest.TestCase):
+    """test saver"""
+    SEEDS = (1, 2, 3)
+    # 10 potential wumaos and 2 accounts created before 2011
+    USERS = [_user(i) for i in range(1, 11)]
+    USERS.extend((_user(11, 2009), _user(12, 2009)))
+    # (follower, author) user_id pairs: seed 1 follows everyone, everyone
+    # follows seed 2, and a few more
+    EDGES = [(1, i) for i in range(2, 13)]
+    EDGES.extend((i, 2) for i in range(3, 13))
+    EDGES.extend(((3, 1), (4, 3), (5, 3), (11, 3), (3, 12)))
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.dao = Dao('./app.db')
+        cls.saver = Saver()
+        cls.tweet = cls.saver.tweet
+        cls.page_count = Saver.PAGE_COUNT
+        Saver.PAGE_COUNT = 3
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.saver.tweet = cls.tweet
+        Saver.PAGE_COUNT = cls.page_count
+        cls.dao.reset_db()
+
+    def setUp(self):
+        self.dao.reset_db()
+        self.fake = FakeTweet(self.USERS, self.EDGES)
+        self.saver.tweet = self.fake
+        # users looked up by a previous test are looked up again
+        # pylint: disable=protected-access
+        self.saver._rejected.clear()
+        self.saver._accepted.clear()
+        seeds = [u for u in self.USERS if u.id in self.SEEDS]
+        self.dao.bulk_save_wumao(list(self.dao.bulk_save_tweeter(seeds)),
+                                 new=True)
+
+    def tearDown(self):
+        self.dao.reset_db()
+
+    def saved_edges(self):
+        """saved friendship as (follower user_id, author user_id) pairs"""
+        user_ids = {
+            i: self.dao.lookup_tweeter(i).user_id
+            for i in self.dao.all_tweeter_id()
+        }
+        return {(user_ids[f.follower_id], user_ids[f.author_id])
+                for f in self.dao.session.query(Friendship).all()}
+
+    def expected_edges(self):
+        """edges of seeds to potential wumaos"""
+        return {(f, a)
+                for f, a in self.EDGES
+                if (f in self.SEEDS or a in self.SEEDS) and f < 11 and a < 11}
+
+    def assert_crawled(self):
+        """all seeds completely crawled"""
+        self.assertEqual(self.expected_edges(), self.saved_edges())
+        self.assertIsNone(self.dao.any_track())
+        self.assertIsNone(self.dao.any_wumao(True))
+        self.assertEqual(set(range(1, 11)), {
+            self.dao.lookup_tweeter(i).user_id
+            for i in self.dao.all_tweeter_id()
+        })
+
+    def test_add_friendship(self):
+        """one account at a time"""
+        self.saver.add_friendship()
+        self.assert_crawled()
+
+    def test_metrics(self):
+        """pages, filtered users and inserted rows are counted"""
+        counters = (
+            lambda: metrics.PAGES_FETCHED.value(function='get_following_paged')
+            + metrics.PAGES_FETCHED.value(function='get_followers_paged'),
+            lambda: metrics.USERS_FILTERED.value(result='potential'),
+            lambda: metrics.USERS_FILTERED.value(result='rejected'),
+            metrics.TWEETERS_INSERTED.value,
+            metrics.EDGES_INSERTED.value,
+        )
+        before = [c() for c in counters]
+        self.saver.add_friendship()
+        # users 11 and 12 are rejected on every page they appear, 6 times
+        self.assertEqual(
+            [13, 24, 6, 7, len(self.expected_edges())],
+            [c() - b for c, b in zip(counters, before)])
+
+    def test_add_friendship_concurrent(self):
+        """several accounts at once, with the same result"""
+        self.saver.add_friendship(concurrency=2)
+        self.assert_crawled()
+
+    def test_resume(self):
+        """a crawl interrupted mid-account resumes from its track"""
+        tweeter_id = self.dao.all_tweeter_id([self.SEEDS[0]]).pop()
+        self.dao.upsert_track(tweeter_id, 'get_following_paged', 3)
+        self.saver.add_friendship()
+        # the first following page of seed 1 (users 2, 3 and 4) is skipped,
+        # only its edge to user 4 is not found via followers of seeds 2 & 3
+        self.assertEqual(self.expected_edges() - {(1, 4)}, self.saved_edges())
+
+    def test_group_commit(self):
+        """pages are saved several at a time"""
+        commits = []
+        engine = self.dao.session.get_bind()
+
+        def count(*_):
+            commits.append(1)
+
+        event.listen(engine, 'commit', count)
+        try:
+            self.saver.add_friendship()
+        finally:
+            event.remove(engine, 'commit', count)
+        self.assert_crawled()
+        # 13 pages of 3 accounts, pages ready together in one commit
+        self.assertEqual(13, self.fake.calls)
+        self.assertTrue(3 <= len(commits) <= 13)
+
+    def test_commit_while_waiting(self):
+        """no transaction is open while the producer waits on the network"""
+        in_transaction = []
+
+        def slow(call):
+            # the second page of seed 1 takes a while
+            if call == 2:
+                time.sleep(0.2)
+                in_transaction.append(self.dao.in_transaction)
+
+        self.fake.hook = slow
+        self.saver.add_friendship()
+        self.assert_crawled()
+        self.assertEqual([False], in_transaction)
+
+    def test_budget(self):
+        """the crawl stops at the API call budget and resumes from its track,
+        without fetching any page twice
+        """
+        pk = {
+            self.dao.lookup_tweeter(i).user_id: i
+            for i in self.dao.all_tweeter_id()
+        }
+        self.assertEqual({(pk[s], 10, 10, 1.0, 0)
+                          for s in self.SEEDS},
+                         set(self.dao.frontier_candidates()))
+        budget = Budget(3)
+        with self.assertLogs('app.serv.saver', 'INFO') as logs:
+            self.assertFalse(self.saver.add_friendship(budget=budget))
+        self.assertIn('budget of 3 exhausted', '\n'.join(logs.output))
+        self.assertEqual((3, 3), (self.fake.calls, budget.calls))
+        # seed 1 is tracked, seeds 2 and 3 are followed by it
+        self.assertEqual([pk[1]], self.dao.tracked_tweeter_ids(3))
+        self.assertEqual({(pk[2], 1), (pk[3], 1)},
+                         {(r.tweeter_id, r.overlap)
+                          for r in self.dao.frontier_candidates()})
+        self.assertFalse(
+            self.saver.add_friendship(concurrency=2, budget=Budget(4)))
+        self.assertEqual(7, self.fake.calls)
+        self.assertTrue(self.saver.add_friendship(concurrency=2))
+        self.assertEqual(13, self.fake.calls)
+        self.assert_crawled()
+
+    def assert_sampled(self, concurrency: int):
+        """a page cap per account, estimates scaled by the fractions seen,
+        then sampled seeds crawled completely
+        """
+        pk = {
+            self.dao.lookup_tweeter(i).user_id: i
+            for i in self.dao.all_tweeter_id()
+        }
+        self.assertTrue(self.saver.add_friendship(concurrency, sample_pages=2))
+        # one page of friends and one of followers per seed
+        self.assertEqual(6, self.fake.calls)
+        self.assertIsNone(self.dao.any_wumao(True))
+        self.assertEqual({pk[s]
+                          for s in self.SEEDS}, self.dao.sampled_tweeter_ids())
+        # user 4 follows and is followed by seeds seen at 3 of 10
+        scores = dict(self.dao.score())
+        estimates = dict(self.dao.score(estimate=True))
+        user_4 = self.dao.all_tweeter_id([4]).pop()
+        self.assertEqual(3, scores[user_4])
+        self.assertAlmostEqual(10, estimates[user_4])
+        # sampled seeds are crawled completely afterwards
+        self.assertEqual(3, self.dao.requeue_sampled_wumao())
+        self.assertEqual(set(), self.dao.sampled_tweeter_ids())
+        self.saver.add_friendship(concurrency)
+        self.assert_crawled()
+
+    def test_sample(self):
+        """a page cap per account, one account at a time"""
+        self.assert_sampled(1)
+        with self.assertRaises(ValueError):
+            self.dao.score('sparse', estimate=True)
+        with self.assertRaises(ValueError):
+            self.saver.search('sparse', sample_pages=2)
+
+    def test_sample_concurrent(self):
+        """a page cap per account, several accounts at once"""
+        self.assert_sampled(2)
+
+    def test_ids(self):
+        """pages of user IDs, only unknown users are looked up, once"""
+        with mock.patch.object(Saver, 'LOOKUP_COUNT', 2):
+            self.saver.add_friendship(ids=True)
+        self.assert_crawled()
+        # seeds are saved, users 11 and 12 are rejected once looked up
+        self.assertEqual(list(range(4, 13)), sorted(self.fake.looked_up))
+        # a page of friends and one of followers per seed, and 5 lookups of
+        # the friends of seed 1 other than seeds, 13 pages of users instead
+        self.assertEqual(6 + 5, self.fake.calls)
+        # looked up by the thread fetching the pages, not the DB thread
+        self.assertNotIn('MainThread', self.fake.lookup_threads)
+        # users looked up are read from the DB once their page is committed
+        # pylint: disable=protected-access
+        self.assertEqual({}, self.saver._accepted)
+
+    def test_ids_concurrent(self):
+        """pages of user IDs hydrated by the crawler threads"""
+        self.saver.add_friendship(concurrency=2, ids=True)
+        self.assert_crawled()
+        self.assertEqual(set(range(4, 13)), set(self.fake.looked_up))
+        self.assertNotIn('MainThread', self.fake.lookup_threads)
+        # pylint: disable=protected-access
+        self.assertEqual({}, self.saver._accepted)
+
+    def test_seeds(self):
+        """seeds resolved in batches, in one commit, unresolved reported"""
+        self.dao.reset_db()
+        commits = []
+        engine = self.dao.session.get_bind()
+
+        def count(*_):
+            commits.append(1)
+
+        event.listen(engine, 'commit', count)
+        try:
+            with mock.patch.object(Saver, 'LOOKUP_COUNT', 2):
+                unresolved = self.saver.seeds('1', '4', '99', '1', '@user_2',
+                                              'USER_3', '@user_4', '@nobody',
+                                              '')
+        finally:
+            event.remove(engine, 'commit', count)
+        self.assertEqual(['99', '@nobody'], unresolved)
+        # IDs 1, 4, 99 then names user_2, user_3, user_4, nobody
+        self.assertEqual((4, 1), (self.fake.calls, len(commits)))
+        self.assertEqual({1, 2, 3, 4}, {
+            self.dao.lookup_tweeter(i).user_id
+            for i in self.dao.all_wumao_tweeter_id()
+        })
+        self.assertEqual(4, len(self.dao.frontier_candidates()))
+
+    def test_search_ranking(self):
+        """personalized PageRank enlists the same wumaos in fewer rounds, as
+        does a sampled crawl followed by a complete one
+        """
+        # the seeds follow each other; 4, 5, 6 follow and are followed by
+        # every seed, 7 by two of them, 8 by one; 9 only knows 4 and 5
+        users = [_user(i) for i in range(1, 10)]
+        edges = [(a, b) for a in self.SEEDS for b in self.SEEDS if a != b]
+        for candidate in (4, 5, 6):
+            edges.extend((candidate, s) for s in self.SEEDS)
+            edges.extend((s, candidate) for s in self.SEEDS)
+        edges.extend(
+            ((7, 1), (7, 2), (1, 7), (2, 7), (8, 1), (1, 8), (9, 4), (5, 9)))
+        results = {}
+        for name, kwargs in (('score', {}), ('ppr', {
+                'ranking': 'ppr'
+        }), ('sample', {
+                'sample_pages': 2
+        })):
+            self.dao.reset_db()
+            self.saver.tweet = FakeTweet(users, edges)
+            seeds = [u for u in users if u.id in self.SEEDS]
+            self.dao.bulk_save_wumao(list(self.dao.bulk_save_tweeter(seeds)),
+                                     new=True)
+            with self.assertLogs('app.serv.saver', 'INFO') as logs:
+                self.saver.search(**kwargs)
+            rounds = re.search(r'found in (\d+) rounds',
+                               '\n'.join(logs.output))
+            wumaos = {
+                self.dao.lookup_tweeter(i).user_id
+                for i in self.dao.all_wumao_tweeter_id()
+            }
+            results[name] = (wumaos, int(rounds.group(1)))
+            if name == 'ppr':
+                self.assertIn('4 wumaos enlisted', '\n'.join(logs.output))
+        self.assertEqual(({1, 2, 3, 4, 5, 6, 7}, 3), results['score'])
+        self.assertEqual(({1, 2, 3, 4, 5, 6, 7}, 2), results['ppr'])
+        self.assertEqual({1, 2, 3, 4, 5, 6, 7}, results['sample'][0])
+        with self.assertRaises(ValueError):
+            self.saver.search(ranking='unknown')
+        # a missing extra fails before any page is requested
+        calls = self.saver.tweet.calls
+        with mock.patch('importlib.util.find_spec', return_value=None):
+            with self.assertRaises(ImportError):
+                self.saver.search(ranking='ppr')
+        self.assertEqual(calls, self.saver.tweet.calls)
+
+    def test_crash(self):
+        """a crash while prefetching keeps the track of the last saved page"""
+        self.fake.fail_at = 3
+        with self.assertRaises(RuntimeError):
+            self.saver.add_friendship()
+        # 2 of 4 following pages of seed 1 saved
+        tweeter_id = self.dao.all_tweeter_id([self.SEEDS[0]]).pop()
+        self.assertEqual([tweeter_id], self.dao.tracked_tweeter_ids(3))
+        self.assertEqual(('get_following_paged', 6),
+                         self.dao.track_cursor(tweeter_id))
+        self.fake.fail_at = None
+        self.saver.add_friendship()
+        self.assert_crawled()
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)